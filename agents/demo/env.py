@@ -1,26 +1,33 @@
+from functools import cache
 from pathlib import Path
-from typing import Optional
 
 from pydantic_settings import BaseSettings
 
-BASE_DIR = Path(__file__).resolve().parent
-
+from agents.utils.settings import LanggraphSettings, OpenAISettings, SummarySettings
 
-class OpenAISettings(BaseSettings):
-    OPENAI_API_KEY: str = ""
-    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
-    OPENAI_MODEL_NAME: str = "gpt-4o"
+BASE_DIR = Path(__file__).resolve().parent
 
 
-class LanggraphSettings(BaseSettings):
-    LANGSMITH_API_KEY: Optional[str] = None
+class DemoAgentSettings(BaseSettings):
+    # Let the model send all arithmetic steps as one plan, evaluated by the tool node in a
+    # single round trip, instead of one model call per step
+    PLANNER_MODE: bool = False
 
 
-class Settings(OpenAISettings, LanggraphSettings):
+class Settings(OpenAISettings, DemoAgentSettings, SummarySettings, LanggraphSettings):
     pass
 
     class Config:
         env_file = BASE_DIR / ".env"
 
 
-env = Settings()
+@cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Settings are read from the environment and .env on first access of `env`, not at import
+    if name == "env":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,59 +1,115 @@
-import operator
-from typing import Literal
+from functools import cache
+from typing import Literal, Optional
 
-from langchain.messages import AnyMessage, SystemMessage, ToolMessage
 from langchain.tools import tool
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import END, START, StateGraph
-from typing_extensions import Annotated, TypedDict
 
-from agents.demo.env import env
-from models.openai.langchain import create_openai_model
+from agents.demo.env import get_settings
+from agents.utils.checkpointer import create_checkpointer
+from agents.utils.instrumentation import instrument
+from agents.utils.prompts import Prompt
+from agents.utils.settings import model_config
+from agents.utils.state import WindowedMessagesState
+from agents.utils.summarization import ConversationSummarizer
+from agents.utils.tool_executor import ToolExecutor
+from agents.utils.tool_plan import ToolPlanExecutor
+from models.openai.langchain import create_openai_model, create_openai_model_with_tools
 from models.schema import OpenAIModelConfig
-from tools.math import tools
-
-TOOLS = [tool(math_tool) for math_tool in tools]
-TOOLS_BY_NAME = {tool_.name: tool_ for tool_ in TOOLS}
+from tools.math import batch_tools, tools
+
+# The batch tools cover element-wise operations on whole vectors in one call
+TOOLS = [tool(math_tool) for math_tool in tools + batch_tools]
+# In planner mode the model gets a single tool that takes the whole calculation as a DAG
+PLANNER_TOOLS = [ToolPlanExecutor(TOOLS).as_tool()]
+TOOL_EXECUTOR = ToolExecutor(TOOLS + PLANNER_TOOLS)
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant tasked with performing arithmetic on a set of inputs."
+)
+# The system prompt is built once and sent, after the tool schemas, ahead of the conversation
+PROMPT = Prompt("demo", SYSTEM_PROMPT, tools=TOOLS)
+PLANNER_PROMPT = Prompt(
+    "demo_planner",
+    f"""
+    {SYSTEM_PROMPT}
+    Work out every step of the calculation first, then send all of them in a single
+    `{PLANNER_TOOLS[0].name}` call and answer from its result.
+    """,
+    tools=PLANNER_TOOLS,
+)
+
+
+# Settings are read on the first model call, not when langgraph.json loads this module
+@cache
+def get_model_config() -> OpenAIModelConfig:
+    return model_config(get_settings())
+
+
+# Older messages of a thread are summarized between turns, see `ConversationSummarizer`
+@cache
+def get_summarizer() -> Optional[ConversationSummarizer]:
+    env = get_settings()
+    if not env.SUMMARIZATION:
+        return None
+    return ConversationSummarizer(
+        lambda: create_openai_model(get_model_config()),
+        name="demo",
+        trigger_tokens=env.SUMMARY_TRIGGER_TOKENS,
+        keep_tokens=env.SUMMARY_KEEP_TOKENS,
+    )
 
 
-class MessagesState(TypedDict):
-    messages: Annotated[list[AnyMessage], operator.add]
+class MessagesState(WindowedMessagesState):
     llm_calls: int
 
 
+def _prompt_and_model():
+    if get_settings().PLANNER_MODE:
+        prompt, bound_tools = PLANNER_PROMPT, PLANNER_TOOLS
+    else:
+        prompt, bound_tools = PROMPT, TOOLS
+    # The tool-bound model is cached in the model registry, so this is a lookup after the first step.
+    return prompt, create_openai_model_with_tools(get_model_config(), bound_tools)
+
+
+def _llm_messages(state: dict) -> list:
+    messages = state["messages"]
+    if (summarizer := get_summarizer()) is not None:
+        summary, messages = summarizer.context(messages)
+        messages = [summary, *messages] if summary else messages
+    return messages
+
+
+def _llm_result(state: dict, response) -> dict:
+    # An answer without tool calls ends the turn, the thread is summarized before the next one
+    if not response.tool_calls and (summarizer := get_summarizer()) is not None:
+        summarizer.schedule([*state["messages"], response])
+    return {"messages": [response], "llm_calls": state.get("llm_calls", 0) + 1}
+
+
 def llm_call(state: dict):
     """LLM decides whether to call a tool or not"""
-    config = OpenAIModelConfig(
-        model_name=env.OPENAI_MODEL_NAME,
-        api_key=env.OPENAI_API_KEY,
-        base_url=env.OPENAI_BASE_URL,
-    )
-    model = create_openai_model(config)
-    model_with_tools = model.bind_tools(tools=TOOLS)
-
-    return {
-        "messages": [
-            model_with_tools.invoke(
-                [
-                    SystemMessage(
-                        content="You are a helpful assistant tasked with performing arithmetic on a set of inputs."
-                    )
-                ]
-                + state["messages"]
-            )
-        ],
-        "llm_calls": state.get("llm_calls", 0) + 1,
-    }
+    prompt, model_with_tools = _prompt_and_model()
+    response = model_with_tools.invoke(prompt.format(_llm_messages(state)))
+    return _llm_result(state, prompt.record(response))
+
+
+async def allm_call(state: dict):
+    """LLM decides whether to call a tool or not, without taking an executor thread"""
+    prompt, model_with_tools = _prompt_and_model()
+    response = await model_with_tools.ainvoke(prompt.format(_llm_messages(state)))
+    return _llm_result(state, prompt.record(response))
 
 
 def tool_node(state: dict):
-    """Performs the tool call"""
+    """Performs the tool calls concurrently"""
+    return {"messages": TOOL_EXECUTOR.execute(state["messages"][-1].tool_calls)}
 
-    result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = TOOLS_BY_NAME[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
-        result.append(ToolMessage(content=observation, tool_call_id=tool_call["id"]))
-    return {"messages": result}
+
+async def atool_node(state: dict):
+    """Performs the tool calls concurrently without blocking the event loop"""
+    return {"messages": await TOOL_EXECUTOR.aexecute(state["messages"][-1].tool_calls)}
 
 
 def should_continue(state: MessagesState) -> Literal["tool_node", END]:
@@ -70,17 +126,40 @@ def should_continue(state: MessagesState) -> Literal["tool_node", END]:
     return END
 
 
-# Build workflow
-agent_builder = StateGraph(MessagesState)
+@cache
+def build_graph():
+    # Build workflow
+    agent_builder = StateGraph(MessagesState)
+
+    # Add nodes
+    agent_builder.add_node("llm_call", RunnableLambda(llm_call, afunc=allm_call))
+    agent_builder.add_node("tool_node", RunnableLambda(tool_node, afunc=atool_node))
+
+    # Add edges to connect nodes
+    agent_builder.add_edge(START, "llm_call")
+    agent_builder.add_conditional_edges("llm_call", should_continue, ["tool_node", END])
+    agent_builder.add_edge("tool_node", "llm_call")
+
+    # Compile the agent
+    env = get_settings()
+    graph = agent_builder.compile(
+        checkpointer=create_checkpointer(
+            env.CHECKPOINTER, env.CHECKPOINT_PATH, env.CHECKPOINT_COMPRESSION
+        )
+    )
+    return instrument(graph, env.OTEL_TRACING) if env.INSTRUMENTATION else graph
+
 
-# Add nodes
-agent_builder.add_node("llm_call", llm_call)
-agent_builder.add_node("tool_node", tool_node)
+def make_graph(config: Optional[RunnableConfig] = None):
+    """
+    Graph factory referenced by langgraph.json.
+    The server calls it per run, the graph is compiled on the first call and reused afterwards.
+    """
+    return build_graph()
 
-# Add edges to connect nodes
-agent_builder.add_edge(START, "llm_call")
-agent_builder.add_conditional_edges("llm_call", should_continue, ["tool_node", END])
-agent_builder.add_edge("tool_node", "llm_call")
 
-# Compile the agent
-agent = agent_builder.compile()
+def __getattr__(name: str):
+    # `agent` is compiled on first access
+    if name == "agent":
+        return make_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,556 @@
+import asyncio
+import random
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Iterator, Sequence
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    SerializerProtocol,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT NOT NULL,
+    checkpoint BLOB NOT NULL,
+    metadata_type TEXT NOT NULL,
+    metadata BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    base_version TEXT,
+    drop_count INTEGER NOT NULL DEFAULT 0,
+    blob BLOB NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL,
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT NOT NULL,
+    value BLOB NOT NULL,
+    task_path TEXT NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+"""
+
+
+class ZstdSerializer(SerializerProtocol):
+    """Compress the output of another serializer with zstd, payloads below `min_size` are kept as is."""
+
+    def __init__(self, serde: SerializerProtocol, level: int = 3, min_size: int = 256):
+        try:
+            import zstandard
+        except ImportError as e:
+            raise ImportError(
+                "zstandard is required for checkpoint compression, install it with `pip install zstandard`"
+            ) from e
+
+        self.serde = serde
+        self.level = level
+        self.min_size = min_size
+        self._zstandard = zstandard
+        # zstd contexts are not thread-safe, checkpoints are written from LangGraph's background threads
+        self._local = threading.local()
+
+    def _contexts(self):
+        if not hasattr(self._local, "compressor"):
+            self._local.compressor = self._zstandard.ZstdCompressor(level=self.level)
+            self._local.decompressor = self._zstandard.ZstdDecompressor()
+        return self._local.compressor, self._local.decompressor
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return typ, data
+        compressor, _ = self._contexts()
+        return f"{typ}+zstd", compressor.compress(data)
+
+    def loads_typed(self, data: tuple[str, bytes]) -> Any:
+        typ, payload = data
+        if typ.endswith("+zstd"):
+            _, decompressor = self._contexts()
+            return self.serde.loads_typed(
+                (typ[: -len("+zstd")], decompressor.decompress(payload))
+            )
+        return self.serde.loads_typed(data)
+
+
+@dataclass
+class CheckpointStats:
+    checkpoints: int = 0
+    transactions: int = 0
+    bytes_written: int = 0
+    snapshot_blobs: int = 0
+    delta_blobs: int = 0
+
+
+@dataclass
+class _LastValue:
+    version: str
+    value: list
+    depth: int
+
+
+def _list_delta(old: list, new: list) -> Optional[tuple[int, list]]:
+    """
+    Return `(drop, appended)` such that `new == old[drop:] + appended`, or None if `new` doesn't
+    continue `old`. This covers appends as well as windows that evict from the head.
+    """
+    if not new:
+        return len(old), []
+    first = new[0]
+    drop = next(
+        (i for i, item in enumerate(old) if item is first or item == first), None
+    )
+    if drop is None:
+        return None
+    kept = len(old) - drop
+    if kept > len(new):
+        return None
+    if all(a is b or a == b for a, b in zip(old[drop:], new)):
+        return drop, new[kept:]
+    return None
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    Checkpointer backed by a local SQLite database in WAL mode.
+
+    Like the Postgres saver, channel values are stored per channel version, so a checkpoint only
+    writes the channels that changed. List channels in `delta_channels` (the message history)
+    are stored as deltas against the previously written version: the number of items dropped
+    from the head and the appended items. A full snapshot is written every `snapshot_interval`
+    versions, and after a restart, to bound the chain that is replayed when reading.
+    The base of the next delta is the last written value, kept in memory for the
+    `max_cached_values` most recently used channels of all threads; a thread evicted from that
+    LRU writes a snapshot next.
+    Deltas rely on reducers returning new lists rather than mutating the stored items, which
+    is what LangGraph's reducers do.
+
+    Values are encoded with LangGraph's msgpack serializer, `compress=True` adds zstd.
+    Pending writes are buffered and committed with the next checkpoint, so each superstep is
+    one transaction. Writes of interrupts, errors and resumes are committed immediately.
+    """
+
+    def __init__(
+        self,
+        path: Union[str, Path] = ":memory:",
+        *,
+        serde: Optional[SerializerProtocol] = None,
+        compress: bool = False,
+        delta_channels: Sequence[str] = ("messages",),
+        snapshot_interval: int = 50,
+        max_cached_values: int = 1024,
+    ):
+        super().__init__(serde=serde)
+        if compress:
+            self.serde = ZstdSerializer(self.serde)
+        self.delta_channels = frozenset(delta_channels)
+        self.snapshot_interval = snapshot_interval
+        self.max_cached_values = max_cached_values
+        self.stats = CheckpointStats()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # In WAL mode, synchronous=NORMAL doesn't fsync on commit: a power loss can drop the last
+        # commits but never corrupts the database
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._lock = threading.Lock()
+        self._pending_writes: list[tuple] = []
+        # Last written value of recently used delta channels, the base of the next delta
+        self._last_values: OrderedDict[tuple[str, str, str], _LastValue] = OrderedDict()
+
+    def close(self) -> None:
+        with self._lock:
+            self._flush()
+            self._conn.close()
+
+    def _flush(self, *statements: tuple[str, list[tuple]]) -> None:
+        """Commit the buffered writes and `statements` in one transaction, the caller holds the lock."""
+        if not self._pending_writes and not statements:
+            return
+        with self._conn:
+            if self._pending_writes:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._pending_writes,
+                )
+            for sql, rows in statements:
+                self._conn.executemany(sql, rows)
+        self._pending_writes = []
+        self.stats.transactions += 1
+
+    def _last_value(self, key: tuple[str, str, str]) -> Optional[_LastValue]:
+        last = self._last_values.get(key)
+        if last is not None:
+            self._last_values.move_to_end(key)
+        return last
+
+    def _remember(self, key: tuple[str, str, str], last: _LastValue) -> None:
+        self._last_values[key] = last
+        self._last_values.move_to_end(key)
+        while len(self._last_values) > self.max_cached_values:
+            self._last_values.popitem(last=False)
+
+    def _dump(self, obj: Any) -> tuple[str, bytes]:
+        typ, data = self.serde.dumps_typed(obj)
+        self.stats.bytes_written += len(data)
+        return typ, data
+
+    def _blob_row(
+        self,
+        thread_id: str,
+        checkpoint_ns: str,
+        channel: str,
+        version: str,
+        values: dict,
+    ) -> tuple:
+        key = (thread_id, checkpoint_ns, channel)
+        if channel not in values:
+            self._last_values.pop(key, None)
+            return (*key, version, "empty", None, 0, b"")
+
+        value = values[channel]
+        if channel in self.delta_channels and isinstance(value, list):
+            last = self._last_value(key)
+            delta = None
+            if last is not None and last.depth < self.snapshot_interval:
+                delta = _list_delta(last.value, value)
+            if delta is not None:
+                drop, appended = delta
+                self._remember(key, _LastValue(version, list(value), last.depth + 1))
+                self.stats.delta_blobs += 1
+                typ, data = self._dump(appended)
+                return (*key, version, typ, last.version, drop, data)
+            self._remember(key, _LastValue(version, list(value), 0))
+
+        self.stats.snapshot_blobs += 1
+        typ, data = self._dump(value)
+        return (*key, version, typ, None, 0, data)
+
+    def _load_value(
+        self, thread_id: str, checkpoint_ns: str, channel: str, version: str
+    ) -> Any:
+        """Load a channel value, replaying deltas onto their snapshot. Returns `_MISSING` for empty channels."""
+        last = self._last_value((thread_id, checkpoint_ns, channel))
+        if last is not None and last.version == version:
+            return list(last.value)
+
+        chain = []
+        while True:
+            row = self._conn.execute(
+                "SELECT type, base_version, drop_count, blob FROM blobs "
+                "WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, version),
+            ).fetchone()
+            if row is None or row[0] == "empty":
+                return _MISSING
+            typ, base_version, drop, data = row
+            chain.append((drop, self.serde.loads_typed((typ, data))))
+            if base_version is None:
+                break
+            version = base_version
+
+        _, value = chain.pop()
+        for drop, appended in reversed(chain):
+            value = value[drop:] + appended
+        return value
+
+    def _load_tuple(self, row: tuple) -> CheckpointTuple:
+        (
+            thread_id,
+            checkpoint_ns,
+            checkpoint_id,
+            parent_checkpoint_id,
+            typ,
+            data,
+            metadata_type,
+            metadata,
+        ) = row
+        checkpoint: Checkpoint = self.serde.loads_typed((typ, data))
+        channel_values = {}
+        for channel, version in checkpoint["channel_versions"].items():
+            value = self._load_value(thread_id, checkpoint_ns, channel, str(version))
+            if value is not _MISSING:
+                channel_values[channel] = value
+        writes = self._conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ).fetchall()
+        writes.sort(key=lambda w: writes_sort_key(w[5], w[0], w[1]))
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint={**checkpoint, "channel_values": channel_values},
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_checkpoint_id)
+            if parent_checkpoint_id
+            else None,
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((typ, value)))
+                for task_id, _, channel, typ, value, _ in writes
+            ],
+        )
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?"
+        params: tuple = (thread_id, checkpoint_ns)
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params += (checkpoint_id,)
+        else:
+            query += " ORDER BY checkpoint_id DESC LIMIT 1"
+        with self._lock:
+            self._flush()
+            row = self._conn.execute(query, params).fetchone()
+            return self._load_tuple(row) if row else None
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        query, params = "SELECT * FROM checkpoints WHERE 1 = 1", []
+        if config:
+            query += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                query += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                query += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            query += " AND checkpoint_id < ?"
+            params.append(before_id)
+        query += " ORDER BY checkpoint_id DESC"
+
+        with self._lock:
+            self._flush()
+            rows = self._conn.execute(query, params).fetchall()
+
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            # Metadata is a msgpack blob, so filters are applied after decoding it
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            with self._lock:
+                item = self._load_tuple(row)
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values: dict[str, Any] = c.pop("channel_values")  # type: ignore[misc]
+        with self._lock:
+            blob_rows = [
+                self._blob_row(thread_id, checkpoint_ns, channel, str(version), values)
+                for channel, version in new_versions.items()
+            ]
+            checkpoint_row = (
+                thread_id,
+                checkpoint_ns,
+                checkpoint["id"],
+                config["configurable"].get("checkpoint_id"),
+                *self._dump(c),
+                *self._dump(get_checkpoint_metadata(config, metadata)),
+            )
+            try:
+                self._flush(
+                    (
+                        "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        blob_rows,
+                    ),
+                    (
+                        "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        [checkpoint_row],
+                    ),
+                )
+            except Exception:
+                # The delta bases were not written, the next versions start from a snapshot
+                self._last_values.clear()
+                raise
+            self.stats.checkpoints += 1
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = [
+            (
+                thread_id,
+                checkpoint_ns,
+                checkpoint_id,
+                task_id,
+                WRITES_IDX_MAP.get(channel, idx),
+                channel,
+                *self._dump(value),
+                task_path,
+            )
+            for idx, (channel, value) in enumerate(writes)
+        ]
+        with self._lock:
+            if not any(channel in WRITES_IDX_MAP for channel, _ in writes):
+                self._pending_writes += rows
+                return
+            # Interrupts and errors may end the run without another checkpoint, commit them now.
+            # Special writes (negative idx) replace earlier ones, regular writes are only written once.
+            self._flush(
+                (
+                    "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row for row in rows if row[4] < 0],
+                ),
+                (
+                    "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [row for row in rows if row[4] >= 0],
+                ),
+            )
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._pending_writes = [
+                w for w in self._pending_writes if w[0] != thread_id
+            ]
+            for key in [k for k in self._last_values if k[0] == thread_id]:
+                del self._last_values[key]
+            self._flush(
+                *(
+                    (f"DELETE FROM {table} WHERE thread_id = ?", [(thread_id,)])
+                    for table in ("checkpoints", "blobs", "writes")
+                )
+            )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for item in items:
+            yield item
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        return await asyncio.to_thread(
+            self.put, config, checkpoint, metadata, new_versions
+        )
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        # Even buffered writes are serialized and wait for the lock, which a commit in another
+        # thread may hold
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # The same versions as the in-memory saver: a zero-padded counter and a random suffix
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+
+_MISSING = object()
+
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> RunnableConfig:
+    return {
+        "configurable": {
+            "thread_id": thread_id,
+            "checkpoint_ns": checkpoint_ns,
+            "checkpoint_id": checkpoint_id,
+        }
+    }
+
+
+def create_checkpointer(
+    kind: Optional[str], path: Optional[str] = None, compress: bool = False
+) -> Optional[BaseCheckpointSaver]:
+    """
+    Resolve a checkpointer by name: None for no checkpointer, "memory" for LangGraph's
+    `InMemorySaver`, "sqlite" for `SQLiteCheckpointSaver` at `path`.
+    """
+    if not kind:
+        return None
+    if kind == "memory":
+        from langgraph.checkpoint.memory import InMemorySaver
+
+        return InMemorySaver()
+    if kind == "sqlite":
+        return SQLiteCheckpointSaver(path or "checkpoints.sqlite", compress=compress)
+    raise ValueError(f"Unknown checkpointer: {kind}")
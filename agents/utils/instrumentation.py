@@ -0,0 +1,293 @@
+import time
+from functools import cache
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.runnables.config import var_child_runnable_config
+from langgraph.errors import GraphBubbleUp
+
+from agents.utils.metrics import DEFAULT_BUCKETS, metrics
+from agents.utils.prompts import TOKEN_BUCKETS
+
+QUEUE_BUCKETS = (0.0005, 0.001, 0.0025) + DEFAULT_BUCKETS
+STEP_TAG_PREFIX = "graph:step:"
+
+node_duration = metrics.histogram(
+    "node_duration_seconds", "Wall time of a graph node, by node and status"
+)
+node_queue_time = metrics.histogram(
+    "node_queue_seconds",
+    "Time from the end of the previous graph step, or the start of the run, to the start of a node",
+    buckets=QUEUE_BUCKETS,
+)
+llm_duration = metrics.histogram(
+    "llm_call_seconds", "Wall time of a model call, by the node that made it"
+)
+llm_prompt_tokens = metrics.histogram(
+    "llm_prompt_tokens",
+    "Input tokens of a model call as reported by the provider",
+    buckets=TOKEN_BUCKETS,
+)
+llm_completion_tokens = metrics.histogram(
+    "llm_completion_tokens",
+    "Output tokens of a model call as reported by the provider",
+    buckets=(16, 32) + TOKEN_BUCKETS[:-4],
+)
+tool_duration = metrics.histogram(
+    "tool_call_seconds", "Wall time of a tool call, by tool, node and status"
+)
+cache_lookups = metrics.counter(
+    "cache_lookups_total", "Cache lookups in graph nodes, by cache, node and result"
+)
+
+
+def node_path(checkpoint_ns: str) -> str:
+    """Node names along a checkpoint namespace, e.g. "web_search_agent_node/tools" in a subgraph."""
+    return "/".join(part.partition(":")[0] for part in checkpoint_ns.split("|"))
+
+
+def current_node() -> str:
+    """Path of the graph node the caller runs in, "" outside of a graph run."""
+    config = var_child_runnable_config.get()
+    if not config:
+        return ""
+    return node_path(config.get("metadata", {}).get("langgraph_checkpoint_ns", ""))
+
+
+def record_cache_lookup(cache_name: str, hit: bool) -> None:
+    cache_lookups.inc(
+        cache=cache_name, node=current_node(), result="hit" if hit else "miss"
+    )
+
+
+class _Run:
+    __slots__ = ("parent", "started", "node", "name", "step", "span")
+
+    def __init__(
+        self, parent: Optional[UUID], started: float, node: str = "", name: str = ""
+    ):
+        self.parent = parent
+        self.started = started
+        # Set for node, model and tool runs, which are measured
+        self.node = node
+        self.name = name
+        self.step = 0
+        self.span = None
+
+
+class GraphInstrumentation(BaseCallbackHandler):
+    """
+    Callback handler that records, for every node of a graph run and its subgraphs, the node's wall
+    time and queue time, the duration and token usage of its model calls and the duration of its
+    tool calls as Prometheus-style histograms in `metrics`. Cache lookups are recorded by the caches
+    with `record_cache_lookup`.
+
+    Queue time is the delay between the end of the previous step of the graph (the start of the
+    run for the first step) and the start of the node: scheduling, checkpointing and waiting for
+    an executor thread. With a `tracer`, node, model and tool runs are also exported as
+    OpenTelemetry spans.
+
+    The handler runs inline with the graph and only does dictionary bookkeeping per event, see
+    `benchmarks/instrumentation.py` for its overhead budget.
+    """
+
+    run_inline = True
+
+    def __init__(self, tracer: Any = None):
+        self.tracer = tracer
+        self._runs: dict[UUID, _Run] = {}
+        # End of the latest node of each step, by graph run
+        self._step_ends: dict[UUID, dict[int, float]] = {}
+
+    def _start(
+        self,
+        run_id: UUID,
+        parent_run_id: Optional[UUID],
+        name: str,
+        metadata: Optional[dict],
+    ) -> _Run:
+        node = node_path((metadata or {}).get("langgraph_checkpoint_ns", ""))
+        run = self._runs[run_id] = _Run(parent_run_id, time.perf_counter(), node, name)
+        if self.tracer is not None:
+            run.span = self._start_span(name, parent_run_id, node)
+        return run
+
+    def _start_span(self, name: str, parent_run_id: Optional[UUID], node: str):
+        from opentelemetry import trace
+
+        parent = self._runs.get(parent_run_id)
+        while parent is not None and parent.span is None:
+            parent = self._runs.get(parent.parent)
+        context = trace.set_span_in_context(parent.span) if parent else None
+        return self.tracer.start_span(
+            name, context=context, attributes={"langgraph.node": node}
+        )
+
+    def _end(
+        self, run_id: UUID, error: Optional[BaseException] = None, **attributes: Any
+    ) -> Optional[_Run]:
+        run = self._runs.pop(run_id, None)
+        if run is not None and run.span is not None:
+            if error is not None and not isinstance(error, GraphBubbleUp):
+                run.span.record_exception(error)
+            run.span.set_attributes(attributes)
+            run.span.end()
+        return run
+
+    def on_chain_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        inputs: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        tags: Optional[list[str]] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        # LangGraph tags the run of each node with its step, nested runnables are tagged otherwise
+        step = next(
+            (
+                int(tag[len(STEP_TAG_PREFIX) :])
+                for tag in tags or ()
+                if tag.startswith(STEP_TAG_PREFIX)
+            ),
+            None,
+        )
+        if step is None:
+            # A graph run or a runnable inside a node, kept for queue times and span parents
+            run = self._runs[run_id] = _Run(parent_run_id, time.perf_counter())
+            if self.tracer is not None and parent_run_id is None:
+                run.span = self._start_span(kwargs.get("name") or "graph", None, "")
+            return
+
+        run = self._start(run_id, parent_run_id, kwargs.get("name") or "node", metadata)
+        run.step = step
+        graph = self._runs.get(parent_run_id)
+        ready = self._step_ends.get(parent_run_id, {}).get(step - 1)
+        if ready is None and graph is not None:
+            ready = graph.started
+        if ready is not None:
+            node_queue_time.observe(max(0.0, run.started - ready), node=run.node)
+
+    def _end_chain(self, run_id: UUID, error: Optional[BaseException] = None) -> None:
+        self._step_ends.pop(run_id, None)
+        run = self._end(run_id, error)
+        if run is None or not run.node:
+            return
+        now = time.perf_counter()
+        status = "ok" if error is None or isinstance(error, GraphBubbleUp) else "error"
+        node_duration.observe(now - run.started, node=run.node, status=status)
+        steps = self._step_ends.setdefault(run.parent, {})
+        steps[run.step] = max(steps.get(run.step, 0.0), now)
+
+    def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_chain(run_id)
+
+    def on_chain_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_chain(run_id, error)
+
+    def on_chat_model_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        messages: Any,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, kwargs.get("name") or "llm", metadata)
+
+    def on_llm_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        prompts: list[str],
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        self._start(run_id, parent_run_id, kwargs.get("name") or "llm", metadata)
+
+    def on_llm_end(self, response: LLMResult, *, run_id: UUID, **kwargs: Any) -> None:
+        usage = None
+        if response.generations and response.generations[0]:
+            message = getattr(response.generations[0][0], "message", None)
+            usage = getattr(message, "usage_metadata", None)
+        attributes = {}
+        if usage:
+            attributes = {
+                "gen_ai.usage.input_tokens": usage["input_tokens"],
+                "gen_ai.usage.output_tokens": usage["output_tokens"],
+            }
+        run = self._end(run_id, **attributes)
+        if run is None:
+            return
+        llm_duration.observe(time.perf_counter() - run.started, node=run.node)
+        if usage:
+            llm_prompt_tokens.observe(usage["input_tokens"], node=run.node)
+            llm_completion_tokens.observe(usage["output_tokens"], node=run.node)
+
+    def on_llm_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end(run_id, error)
+
+    def on_tool_start(
+        self,
+        serialized: Optional[dict[str, Any]],
+        input_str: str,
+        *,
+        run_id: UUID,
+        parent_run_id: Optional[UUID] = None,
+        metadata: Optional[dict[str, Any]] = None,
+        **kwargs: Any,
+    ) -> None:
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._start(run_id, parent_run_id, name, metadata)
+
+    def _end_tool(
+        self, run_id: UUID, status: str, error: Optional[BaseException] = None
+    ) -> None:
+        run = self._end(run_id, error)
+        if run is not None:
+            tool_duration.observe(
+                time.perf_counter() - run.started,
+                tool=run.name,
+                node=run.node,
+                status=status,
+            )
+
+    def on_tool_end(self, output: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        self._end_tool(run_id, "ok")
+
+    def on_tool_error(
+        self, error: BaseException, *, run_id: UUID, **kwargs: Any
+    ) -> None:
+        self._end_tool(run_id, "error", error)
+
+
+@cache
+def get_instrumentation(tracing: bool = False) -> GraphInstrumentation:
+    """The process-wide handler, exporting OpenTelemetry spans with `tracing`."""
+    if not tracing:
+        return GraphInstrumentation()
+    try:
+        from opentelemetry import trace
+    except ImportError as e:
+        raise ImportError(
+            "opentelemetry-api is required for tracing, "
+            "install it with `pip install opentelemetry-api`"
+        ) from e
+    return GraphInstrumentation(trace.get_tracer("agents"))
+
+
+def instrument(graph, tracing: bool = False):
+    """Return `graph` with the instrumentation callback bound, still a compiled graph."""
+    return graph.with_config(callbacks=[get_instrumentation(tracing)])
@@ -0,0 +1,192 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Generic, Optional, Sequence, TypeVar
+
+from langchain_core.embeddings import Embeddings
+
+from agents.utils.instrumentation import record_cache_lookup
+
+T = TypeVar("T")
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_messages(messages: Sequence[Any]) -> str:
+    """
+    Normalize a message window into a cache key.
+    Content is lowercased with punctuation and repeated whitespace removed, so trivially different turns share a key.
+    Accepts message objects as well as `{"type": ..., "content": ...}` dicts.
+    """
+    lines = []
+    for msg in messages:
+        if isinstance(msg, dict):
+            role, content = msg.get("type", ""), msg.get("content", "")
+        else:
+            role, content = msg.type, msg.content
+        if not isinstance(content, str):
+            content = " ".join(
+                part.get("text", "") for part in content if isinstance(part, dict)
+            )
+        content = _WHITESPACE.sub(" ", _PUNCTUATION.sub("", content.lower())).strip()
+        lines.append(f"{role}:{content}")
+    return "\n".join(lines)
+
+
+@dataclass
+class CacheStats:
+    exact_hits: int = 0
+    semantic_hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.exact_hits + self.semantic_hits + self.misses
+        return (self.exact_hits + self.semantic_hits) / total if total else 0.0
+
+
+@dataclass
+class _Entry(Generic[T]):
+    value: T
+    expires_at: float
+    vector: Optional[list[float]] = None
+
+
+class ClassificationCache(Generic[T]):
+    """
+    Two-tier cache for classification decisions keyed on a normalized message window.
+
+    The exact tier matches normalized keys. The optional semantic tier embeds the key with `embeddings`
+    and returns the decision of the most similar cached window if its cosine similarity is at least
+    `similarity_threshold`. The vector index is a linear scan over the cached entries, which is fast
+    enough for the few thousand entries a classification cache holds.
+
+    Entries expire after `ttl_seconds` and the least recently used entry is evicted beyond `max_entries`.
+    Lookups are counted in the `cache_lookups_total` metric under `name`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600,
+        embeddings: Optional[Embeddings] = None,
+        similarity_threshold: float = 0.95,
+        name: str = "classification",
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.embeddings = embeddings
+        self.similarity_threshold = similarity_threshold
+        self.stats = CacheStats()
+        self._entries: OrderedDict[str, _Entry[T]] = OrderedDict()
+        # Vectors of recent lookups, so that a miss followed by `put` embeds the window only once
+        self._recent_vectors: OrderedDict[str, list[float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, messages: Sequence[Any]) -> Optional[T]:
+        key = normalize_messages(messages)
+        value = self._get_exact(key)
+        if value is None and self.embeddings is not None:
+            vector = self._remember_vector(key, self.embeddings.embed_query(key))
+            value = self._get_semantic(vector)
+        self._record(value)
+        return value
+
+    async def aget(self, messages: Sequence[Any]) -> Optional[T]:
+        key = normalize_messages(messages)
+        value = self._get_exact(key)
+        if value is None and self.embeddings is not None:
+            vector = self._remember_vector(key, await self.embeddings.aembed_query(key))
+            value = self._get_semantic(vector)
+        self._record(value)
+        return value
+
+    def put(self, messages: Sequence[Any], value: T) -> None:
+        key = normalize_messages(messages)
+        vector = None
+        if self.embeddings is not None:
+            vector = self._recent_vectors.pop(key, None) or self._normalize_vector(
+                self.embeddings.embed_query(key)
+            )
+        self._put(key, value, vector)
+
+    async def aput(self, messages: Sequence[Any], value: T) -> None:
+        key = normalize_messages(messages)
+        vector = None
+        if self.embeddings is not None:
+            vector = self._recent_vectors.pop(key, None) or self._normalize_vector(
+                await self.embeddings.aembed_query(key)
+            )
+        self._put(key, value, vector)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._recent_vectors.clear()
+            self.stats = CacheStats()
+
+    def _get_exact(self, key: str) -> Optional[T]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            self.stats.exact_hits += 1
+            return entry.value
+
+    def _get_semantic(self, vector: list[float]) -> Optional[T]:
+        now = time.monotonic()
+        best_key, best_score = None, self.similarity_threshold
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.expires_at < now:
+                    del self._entries[key]
+                    continue
+                if entry.vector is None:
+                    continue
+                score = sum(a * b for a, b in zip(vector, entry.vector))
+                if score >= best_score:
+                    best_key, best_score = key, score
+            if best_key is None:
+                return None
+            self._entries.move_to_end(best_key)
+            self.stats.semantic_hits += 1
+            return self._entries[best_key].value
+
+    def _put(self, key: str, value: T, vector: Optional[list[float]]) -> None:
+        with self._lock:
+            self._entries[key] = _Entry(
+                value=value,
+                expires_at=time.monotonic() + self.ttl_seconds,
+                vector=vector,
+            )
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _remember_vector(self, key: str, vector: list[float]) -> list[float]:
+        vector = self._normalize_vector(vector)
+        with self._lock:
+            self._recent_vectors[key] = vector
+            while len(self._recent_vectors) > 64:
+                self._recent_vectors.popitem(last=False)
+        return vector
+
+    def _record(self, value: Optional[T]) -> None:
+        record_cache_lookup(self.name, value is not None)
+        if value is None:
+            with self._lock:
+                self.stats.misses += 1
+
+    @staticmethod
+    def _normalize_vector(vector: list[float]) -> list[float]:
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
@@ -0,0 +1,132 @@
+import bisect
+import threading
+from dataclasses import dataclass, field
+from typing import Sequence, Union
+
+DEFAULT_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+
+@dataclass
+class _Series:
+    bucket_counts: list[int]
+    count: int = 0
+    sum: float = 0.0
+
+
+@dataclass
+class Histogram:
+    """Prometheus-style cumulative histogram with labels."""
+
+    name: str
+    help: str
+    buckets: Sequence[float] = DEFAULT_BUCKETS
+    _series: dict[tuple, _Series] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _Series([0] * len(self.buckets))
+            if index < len(self.buckets):
+                series.bucket_counts[index] += 1
+            series.count += 1
+            series.sum += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series.count if series else 0
+
+    def mean(self, **labels: str) -> float:
+        series = self._series.get(tuple(sorted(labels.items())))
+        return series.sum / series.count if series and series.count else 0.0
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in self._series.items():
+                labels = ",".join(f'{k}="{v}"' for k, v in key)
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, series.bucket_counts):
+                    cumulative += bucket_count
+                    le = ",".join(filter(None, [labels, f'le="{bound}"']))
+                    lines.append(f"{self.name}_bucket{{{le}}} {cumulative}")
+                le = ",".join(filter(None, [labels, 'le="+Inf"']))
+                lines.append(f"{self.name}_bucket{{{le}}} {series.count}")
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}_sum{suffix} {series.sum}")
+                lines.append(f"{self.name}_count{suffix} {series.count}")
+        return "\n".join(lines)
+
+
+@dataclass
+class Counter:
+    """Prometheus-style counter with labels."""
+
+    name: str
+    help: str
+    _values: dict[tuple, float] = field(default_factory=dict, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(tuple(sorted(labels.items())), 0)
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                labels = ",".join(f'{k}="{v}"' for k, v in key)
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{self.name}{suffix} {value}")
+        return "\n".join(lines)
+
+
+class MetricsRegistry:
+    """Process-wide set of metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._metrics: dict[str, Union[Histogram, Counter]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(
+        self, name: str, help: str, buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, help, buckets)
+            return self._metrics[name]
+
+    def counter(self, name: str, help: str) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, help)
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+metrics = MetricsRegistry()
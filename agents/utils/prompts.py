@@ -0,0 +1,115 @@
+import inspect
+import json
+import threading
+from dataclasses import dataclass
+from functools import cached_property
+from typing import Any, Optional, Sequence
+
+from langchain_core.messages import AIMessage, AnyMessage, BaseMessage, SystemMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from agents.utils.metrics import metrics
+from agents.utils.tokens import (
+    MessageTokenCounter,
+    count_message_tokens_approximately,
+    message_tokens,
+)
+
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+
+cacheable_prefix_tokens = metrics.histogram(
+    "prompt_cacheable_prefix_tokens",
+    "Tokens before the volatile tail of a prompt, the part a provider prefix cache can reuse",
+    buckets=TOKEN_BUCKETS,
+)
+cached_tokens = metrics.histogram(
+    "prompt_cached_tokens",
+    "Input tokens the provider reported as read from its prompt cache",
+    buckets=(0,) + TOKEN_BUCKETS,
+)
+
+
+@dataclass
+class PromptStats:
+    calls: int = 0
+    prefix_tokens: int = 0
+    input_tokens: int = 0
+    cached_tokens: int = 0
+
+    @property
+    def cached_ratio(self) -> float:
+        """Share of the reported input tokens that were served from the provider's cache"""
+        return self.cached_tokens / self.input_tokens if self.input_tokens else 0.0
+
+
+class Prompt:
+    """
+    A prompt laid out for provider-side prefix caching.
+
+    Providers cache the longest previously seen prefix of a request (tool schemas, then messages),
+    so the static system prompt comes first and volatile data such as the current date goes into
+    a `tail` message after the conversation. The system message is built once and shared by all
+    calls. `format` records the length of the cacheable prefix, `record` the cached input tokens
+    reported by the provider.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        system: Optional[str] = None,
+        tail: Optional[str] = None,
+        tools: Sequence[Any] = (),
+        counter: MessageTokenCounter = count_message_tokens_approximately,
+    ):
+        self.name = name
+        self.system_message = (
+            SystemMessage(content=inspect.cleandoc(system)) if system else None
+        )
+        self.tail = inspect.cleandoc(tail) if tail else None
+        self.tools = tools
+        self.counter = counter
+        self.stats = PromptStats()
+        self._lock = threading.Lock()
+
+    @cached_property
+    def static_tokens(self) -> int:
+        """Tokens of the tool schemas and system message, counted on the first `format`."""
+        # Tool schemas are sent ahead of the messages, the estimate matches `count_tokens_approximately`
+        tokens = sum(
+            len(json.dumps(convert_to_openai_tool(t))) // 4 for t in self.tools
+        )
+        if self.system_message is not None:
+            tokens += message_tokens(self.system_message, self.counter)
+        return tokens
+
+    def format(self, messages: Sequence[AnyMessage], **variables: Any) -> list:
+        """Return the system prompt, `messages` and the tail filled with `variables`."""
+        prefix = self.static_tokens + sum(
+            message_tokens(m, self.counter)
+            if isinstance(m, BaseMessage)
+            else count_tokens_approximately([m])
+            for m in messages
+        )
+        cacheable_prefix_tokens.observe(prefix, prompt=self.name)
+        with self._lock:
+            self.stats.calls += 1
+            self.stats.prefix_tokens += prefix
+
+        result = [self.system_message] if self.system_message is not None else []
+        result += messages
+        if self.tail is not None:
+            result.append(SystemMessage(content=self.tail.format(**variables)))
+        return result
+
+    def record(self, response: AIMessage) -> AIMessage:
+        """Record the provider's cached token count of `response`, if it reports one."""
+        usage = getattr(response, "usage_metadata", None)
+        if not usage:
+            return response
+        cached = (usage.get("input_token_details") or {}).get("cache_read", 0)
+        cached_tokens.observe(cached, prompt=self.name)
+        with self._lock:
+            self.stats.input_tokens += usage.get("input_tokens", 0)
+            self.stats.cached_tokens += cached
+        return response
@@ -0,0 +1,210 @@
+import json
+import math
+import re
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Protocol, Sequence, Union
+
+from langchain_core.embeddings import Embeddings
+
+
+@dataclass
+class RouteDecision:
+    intent: str
+    confidence: float
+    tier: str
+
+
+class Router(Protocol):
+    def route(self, text: str) -> Optional[RouteDecision]: ...
+
+    async def aroute(self, text: str) -> Optional[RouteDecision]: ...
+
+
+@dataclass
+class Rule:
+    intent: str
+    pattern: re.Pattern
+    confidence: float
+
+
+def rule(intent: str, pattern: str, confidence: float) -> Rule:
+    return Rule(intent, re.compile(pattern, re.IGNORECASE | re.DOTALL), confidence)
+
+
+def all_of(*patterns: str) -> str:
+    """Pattern matching texts that contain each of `patterns`, in any order."""
+    return "^" + "".join(rf"(?=.*\b{p}\b)" for p in patterns)
+
+
+# Topics whose answer changes over time
+LIVE_TOPIC = r"(news|headlines?|weather|forecast|(stock |share )?prices?|exchange rates?|scores?|election results?)"
+# Words that ask for the current state of a live topic, on their own they are as often about
+# something else ("electric current", "recent history")
+FRESH = r"(latest|current(ly)?|recent(ly)?|breaking|now|today'?s|tonight'?s|yesterday'?s|tomorrow'?s)"
+TIME_FRAME = r"(today|tonight|yesterday|tomorrow|this (morning|afternoon|evening|week|weekend|month|year)|right now|at the moment|\d{4}-\d{1,2}-\d{1,2})"
+# Questions about events, "how are you today?" is small talk
+EVENT_QUESTION = r"^\s*(who (won|wins|lost|is winning|is leading)|what happened|what time|when (is|does|will|did)|did)\b"
+
+DEFAULT_RULES = [
+    # A live topic asked about now, or an event on a specific day or period, needs fresh data
+    rule("web_search", all_of(LIVE_TOPIC, FRESH), 0.9),
+    rule("web_search", all_of(LIVE_TOPIC, TIME_FRAME), 0.9),
+    rule("web_search", EVENT_QUESTION + r"(?=.*\b" + TIME_FRAME + r"\b)", 0.9),
+    # A single keyword is only a hint, below the default threshold: "What is the score of a
+    # t-test?", "Write a poem about the latest fashion", "Tell me the recent history of Rome"
+    rule(
+        "web_search",
+        r"\b(today|tonight|yesterday|tomorrow|this (week|month|year))\b",
+        0.7,
+    ),
+    rule("web_search", r"\b" + LIVE_TOPIC + r"\b", 0.7),
+    rule(
+        "web_search", r"\b(latest|breaking|current(ly)?|right now|recent(ly)?)\b", 0.7
+    ),
+    # Greetings, thanks and small talk never need a search
+    rule(
+        "chat",
+        r"^\s*(hi|hello|hey|good (morning|afternoon|evening)|thanks?( you)?|thx|bye|goodbye)\b[\s!.,]*$",
+        0.95,
+    ),
+    rule("chat", r"^\s*(how are you|how's it going)\b", 0.95),
+    # Creative writing, even about a live topic ("a poem about today's weather")
+    rule(
+        "chat",
+        r"^\s*(please )?(write|compose|tell)( me)? (a|an|another) (poem|story|joke|song|haiku|limerick)\b",
+        0.95,
+    ),
+    rule("chat", r"^\s*(who|what) are you\b", 0.9),
+    rule(
+        "chat",
+        r"\b(write|rewrite|translate|summari[sz]e|explain|poem|story|joke)\b",
+        0.6,
+    ),
+]
+
+
+class RuleRouter:
+    """Keyword and regex rules, the decision of the most confident matching rule wins."""
+
+    def __init__(self, rules: Sequence[Rule] = DEFAULT_RULES):
+        self.rules = rules
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        best = None
+        for r in self.rules:
+            if best is not None and r.confidence <= best.confidence:
+                continue
+            if r.pattern.search(text):
+                best = RouteDecision(r.intent, r.confidence, "rules")
+        return best
+
+    async def aroute(self, text: str) -> Optional[RouteDecision]:
+        return self.route(text)
+
+
+def _normalize(vector: Sequence[float]) -> list[float]:
+    norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+    return [v / norm for v in vector]
+
+
+def load_labeled_examples(path: Union[str, Path]) -> list[tuple[str, str]]:
+    """Read `{"text": ..., "intent": ...}` lines from a JSONL file."""
+    with open(path) as f:
+        return [
+            (row["text"], row["intent"])
+            for row in map(json.loads, filter(str.strip, f))
+        ]
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    Embeddings of a sentence-transformers model run in process, e.g. "all-MiniLM-L6-v2", so that
+    routing a turn costs no network round trip. The model is downloaded on first use.
+    """
+
+    def __init__(self, model_name: str):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError(
+                "sentence-transformers is required for the local embedding router, install it with `pip install sentence-transformers`"
+            ) from e
+
+        self.model = SentenceTransformer(model_name)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.model.encode(texts, normalize_embeddings=True).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+class EmbeddingCentroidRouter:
+    """
+    Nearest-centroid classifier over sentence embeddings.
+    Each intent is represented by the mean embedding of its labeled examples. The confidence is the
+    softmax probability of the closest centroid, with `temperature` scaling the cosine similarities.
+    """
+
+    def __init__(self, embeddings: Embeddings, temperature: float = 0.05):
+        self.embeddings = embeddings
+        self.temperature = temperature
+        self.centroids: dict[str, list[float]] = {}
+
+    def fit(self, examples: Sequence[tuple[str, str]]) -> "EmbeddingCentroidRouter":
+        vectors = self.embeddings.embed_documents([text for text, _ in examples])
+        sums: dict[str, list[float]] = {}
+        for (_, intent), vector in zip(examples, vectors):
+            vector = _normalize(vector)
+            total = sums.setdefault(intent, [0.0] * len(vector))
+            for i, v in enumerate(vector):
+                total[i] += v
+        self.centroids = {intent: _normalize(total) for intent, total in sums.items()}
+        return self
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        return self._decide(self.embeddings.embed_query(text))
+
+    async def aroute(self, text: str) -> Optional[RouteDecision]:
+        return self._decide(await self.embeddings.aembed_query(text))
+
+    def _decide(self, vector: Sequence[float]) -> Optional[RouteDecision]:
+        if not self.centroids:
+            return None
+        vector = _normalize(vector)
+        scores = {
+            intent: sum(a * b for a, b in zip(vector, centroid))
+            for intent, centroid in self.centroids.items()
+        }
+        best = max(scores, key=scores.__getitem__)
+        weights = {
+            intent: math.exp((score - scores[best]) / self.temperature)
+            for intent, score in scores.items()
+        }
+        return RouteDecision(best, 1 / sum(weights.values()), "embedding")
+
+
+class TieredRouter:
+    """
+    Try cheap local routers in order and return the first decision with a confidence of at least
+    `threshold`. Returns None when no tier is confident, the caller then falls back to the LLM.
+    """
+
+    def __init__(self, tiers: Sequence[Router], threshold: float = 0.85):
+        self.tiers = tiers
+        self.threshold = threshold
+
+    def route(self, text: str) -> Optional[RouteDecision]:
+        for tier in self.tiers:
+            decision = tier.route(text)
+            if decision is not None and decision.confidence >= self.threshold:
+                return decision
+        return None
+
+    async def aroute(self, text: str) -> Optional[RouteDecision]:
+        for tier in self.tiers:
+            decision = await tier.aroute(text)
+            if decision is not None and decision.confidence >= self.threshold:
+                return decision
+        return None
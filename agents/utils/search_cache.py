@@ -0,0 +1,343 @@
+import asyncio
+import json
+import re
+import sqlite3
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import Future
+from datetime import date
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Optional, Protocol, Union
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForToolRun,
+    CallbackManagerForToolRun,
+)
+from langchain_tavily import TavilySearch
+from pydantic import Field
+
+from agents.utils.instrumentation import record_cache_lookup
+from agents.utils.search_compaction import SearchCompactor
+from models.limits import OutboundLimiter
+
+_PUNCTUATION = re.compile(r"[^\w\s-]")
+_WHITESPACE = re.compile(r"\s+")
+_DATE = re.compile(r"\b(\d{4})-(\d{2})-(\d{2})\b")
+# Tavily tool results carry failed requests as {"error": Exception("Error <status>: ...")}
+_THROTTLED = re.compile(r"^Error (429|503)\b")
+_VOLATILE = re.compile(
+    r"\b(today|tonight|now|current|currently|latest|live|breaking|news|this week|price|weather)\b"
+)
+
+
+class _LeaderInterrupted(Exception):
+    """The lookup that was fetching for the others was interrupted, they fetch again."""
+
+
+def _forget(inflight: dict[str, asyncio.Task], key: str, task: asyncio.Task) -> None:
+    if inflight.get(key) is task:
+        del inflight[key]
+    if not task.cancelled():
+        # Mark the exception as retrieved when every lookup waiting for it was cancelled
+        task.exception()
+
+
+def normalize_query(query: str) -> str:
+    return _WHITESPACE.sub(" ", _PUNCTUATION.sub("", query.lower())).strip()
+
+
+class SearchCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[dict]: ...
+
+    def set(self, key: str, value: dict, expires_at: float) -> None: ...
+
+
+class MemorySearchCacheBackend:
+    """In-process LRU backend."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[dict, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key: str, value: dict, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteSearchCacheBackend:
+    """Disk-backed backend, survives restarts and can be shared by the processes of one host."""
+
+    def __init__(self, path: Union[str, Path]):
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_cache "
+            "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM search_cache WHERE key = ? AND expires_at >= ?",
+                (key, time.time()),
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: dict, expires_at: float) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            # Expired rows are only pruned on write, reads already skip them
+            self._conn.execute(
+                "DELETE FROM search_cache WHERE expires_at < ?", (time.time(),)
+            )
+            self._conn.commit()
+
+
+class SearchResultCache:
+    """
+    TTL cache for search results with singleflight coalescing.
+
+    Concurrent lookups of the same key share one upstream call, which a cancelled or interrupted
+    lookup doesn't fail for the others. TTLs depend on the query:
+    queries about volatile topics ("latest", "news", "today", ...) or today's date expire after
+    `volatile_ttl_seconds`, queries that only mention past dates after `historical_ttl_seconds`,
+    everything else after `ttl_seconds`.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[SearchCacheBackend] = None,
+        ttl_seconds: float = 3600,
+        volatile_ttl_seconds: float = 300,
+        historical_ttl_seconds: float = 7 * 24 * 3600,
+    ):
+        self.backend = backend or MemorySearchCacheBackend()
+        self.ttl_seconds = ttl_seconds
+        self.volatile_ttl_seconds = volatile_ttl_seconds
+        self.historical_ttl_seconds = historical_ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._inflight: dict[str, Future] = {}
+        self._inflight_async: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, asyncio.Task]
+        ] = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def key(self, query: str, **params: Any) -> str:
+        params = {k: v for k, v in params.items() if v is not None}
+        return json.dumps([normalize_query(query), params], sort_keys=True)
+
+    def ttl_for(self, query: str) -> float:
+        normalized = normalize_query(query)
+        if _VOLATILE.search(normalized):
+            return self.volatile_ttl_seconds
+        dates = []
+        for match in _DATE.finditer(normalized):
+            try:
+                dates.append(date(*map(int, match.groups())))
+            except ValueError:
+                continue
+        if dates:
+            if max(dates) < date.today():
+                return self.historical_ttl_seconds
+            return self.volatile_ttl_seconds
+        return self.ttl_seconds
+
+    def get_or_fetch(self, key: str, query: str, fetch: Callable[[], dict]) -> dict:
+        if (cached := self._lookup(key)) is not None:
+            return cached
+
+        while True:
+            with self._lock:
+                future = self._inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self._inflight[key] = Future()
+                else:
+                    self.coalesced += 1
+            if leader:
+                break
+            try:
+                return future.result()
+            except _LeaderInterrupted:
+                # Fetch again, possibly as the new leader
+                continue
+
+        try:
+            result = fetch()
+            self._store(key, query, result)
+        except Exception as e:
+            self._release(key)
+            future.set_exception(e)
+            raise
+        except BaseException:
+            # Interrupting the leader's thread must not fail the lookups that joined it
+            self._release(key)
+            future.set_exception(_LeaderInterrupted())
+            raise
+        self._release(key)
+        future.set_result(result)
+        return result
+
+    def _release(self, key: str) -> None:
+        # Before the future is resolved, so that a follower that retries becomes the leader
+        with self._lock:
+            del self._inflight[key]
+
+    async def aget_or_fetch(
+        self, key: str, query: str, fetch: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        if (cached := self._lookup(key)) is not None:
+            return cached
+
+        # Tasks are bound to their event loop, so lookups are coalesced per loop
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight_async.setdefault(loop, {})
+        task = inflight.get(key)
+        if task is None:
+            # The fetch runs in a task of its own, cancelling any of the lookups that wait for it,
+            # the first included, leaves the others and the fetch running
+            task = inflight[key] = loop.create_task(self._afetch(key, query, fetch))
+            task.add_done_callback(lambda t: _forget(inflight, key, t))
+        else:
+            self.coalesced += 1
+        return await asyncio.shield(task)
+
+    async def _afetch(
+        self, key: str, query: str, fetch: Callable[[], Awaitable[dict]]
+    ) -> dict:
+        result = await fetch()
+        self._store(key, query, result)
+        return result
+
+    def _lookup(self, key: str) -> Optional[dict]:
+        cached = self.backend.get(key)
+        record_cache_lookup("search", cached is not None)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return cached
+
+    def _store(self, key: str, query: str, result: dict) -> None:
+        # Tavily reports failures and empty result sets as an "error" payload, those are not cached
+        if "error" in result:
+            return
+        self.backend.set(key, result, time.time() + self.ttl_for(query))
+
+
+def _throttled(result: dict) -> bool:
+    return "error" in result and bool(_THROTTLED.match(str(result["error"])))
+
+
+class CachedTavilySearch(TavilySearch):
+    """
+    `TavilySearch` that serves repeated queries from a `SearchResultCache`.
+    Requests that miss the cache go through `limiter` when one is set, and are retried when
+    Tavily throttles them. With a `compactor`, the tool returns the compacted results ranked
+    against the query, the cache keeps the full response.
+    """
+
+    cache: SearchResultCache = Field(default_factory=SearchResultCache, exclude=True)
+    limiter: Optional[OutboundLimiter] = Field(default=None, exclude=True)
+    compactor: Optional[SearchCompactor] = Field(default=None, exclude=True)
+
+    def _fetch(self, fetch: Callable[[], dict]) -> dict:
+        if self.limiter is None:
+            return fetch()
+        attempt = 0
+        while True:
+            permit = self.limiter.acquire()
+            try:
+                result = fetch()
+            except BaseException:
+                self.limiter.release(permit)
+                raise
+            throttled = _throttled(result)
+            self.limiter.release(permit, throttled=throttled)
+            if not throttled or attempt == self.limiter.config.max_retries:
+                return result
+            time.sleep(self.limiter.retry_delay(attempt))
+            attempt += 1
+
+    async def _afetch(self, fetch: Callable[[], Awaitable[dict]]) -> dict:
+        if self.limiter is None:
+            return await fetch()
+        attempt = 0
+        while True:
+            permit = await self.limiter.aacquire()
+            try:
+                result = await fetch()
+            except BaseException:
+                self.limiter.release(permit)
+                raise
+            throttled = _throttled(result)
+            self.limiter.release(permit, throttled=throttled)
+            if not throttled or attempt == self.limiter.config.max_retries:
+                return result
+            await asyncio.sleep(self.limiter.retry_delay(attempt))
+            attempt += 1
+
+    def _run(
+        self,
+        query: str,
+        run_manager: Optional[CallbackManagerForToolRun] = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        key = self.cache.key(query, max_results=self.max_results, **kwargs)
+        result = self.cache.get_or_fetch(
+            key,
+            query,
+            lambda: self._fetch(
+                lambda: super(CachedTavilySearch, self)._run(
+                    query, run_manager=run_manager, **kwargs
+                )
+            ),
+        )
+        if self.compactor is None or "error" in result:
+            return result
+        return self.compactor.compact(query, result)
+
+    async def _arun(
+        self,
+        query: str,
+        run_manager: Optional[AsyncCallbackManagerForToolRun] = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        key = self.cache.key(query, max_results=self.max_results, **kwargs)
+        result = await self.cache.aget_or_fetch(
+            key,
+            query,
+            lambda: self._afetch(
+                lambda: super(CachedTavilySearch, self)._arun(
+                    query, run_manager=run_manager, **kwargs
+                )
+            ),
+        )
+        if self.compactor is None or "error" in result:
+            return result
+        return await self.compactor.acompact(query, result)
@@ -0,0 +1,257 @@
+import math
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence
+
+from langchain_core.embeddings import Embeddings
+
+from agents.utils.metrics import metrics
+from agents.utils.prompts import TOKEN_BUCKETS
+
+_WORD = re.compile(r"\w+")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+search_result_tokens = metrics.histogram(
+    "search_result_tokens",
+    "Estimated tokens of the search results of one query, before and after compaction",
+    buckets=TOKEN_BUCKETS,
+)
+
+
+def approximate_tokens(text: str) -> int:
+    # Four characters per token, the estimate of `count_tokens_approximately`
+    return math.ceil(len(text) / 4)
+
+
+def words(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+def shingles(text: str, size: int = 3) -> set[tuple[str, ...]]:
+    tokens = words(text)
+    return {tuple(tokens[i : i + size]) for i in range(max(1, len(tokens) - size + 1))}
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def split_passages(text: str, max_tokens: int = 96) -> list[str]:
+    """Split `text` at sentence boundaries into passages of at most about `max_tokens` tokens."""
+    passages, current, size = [], [], 0
+    for sentence in filter(None, (s.strip() for s in _SENTENCE_END.split(text))):
+        tokens = approximate_tokens(sentence)
+        if current and size + tokens > max_tokens:
+            passages.append(" ".join(current))
+            current, size = [], 0
+        current.append(sentence)
+        size += tokens
+    if current:
+        passages.append(" ".join(current))
+    return passages
+
+
+class BM25:
+    """Okapi BM25 over a small in-memory corpus, here the passages of one search."""
+
+    def __init__(self, documents: Sequence[str], k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = [Counter(words(document)) for document in documents]
+        self.lengths = [sum(counts.values()) for counts in self.documents]
+        self.average_length = (
+            sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        )
+        frequencies = Counter(term for counts in self.documents for term in counts)
+        n = len(self.documents)
+        self.idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5))
+            for term, df in frequencies.items()
+        }
+
+    def scores(self, query: str) -> list[float]:
+        terms = [term for term in set(words(query)) if term in self.idf]
+        scores = []
+        for counts, length in zip(self.documents, self.lengths):
+            norm = self.k1 * (
+                1 - self.b + self.b * length / (self.average_length or 1.0)
+            )
+            scores.append(
+                sum(
+                    self.idf[term]
+                    * counts[term]
+                    * (self.k1 + 1)
+                    / (counts[term] + norm)
+                    for term in terms
+                    if term in counts
+                )
+            )
+        return scores
+
+
+@dataclass
+class _Passage:
+    result: int
+    position: int
+    text: str
+    tokens: int
+    score: float = 0.0
+
+
+@dataclass
+class CompactionStats:
+    searches: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    duplicates: int = 0
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.input_tokens - self.output_tokens
+
+
+class SearchCompactor:
+    """
+    Compact Tavily results before they reach a prompt.
+
+    Results whose content is a near-duplicate of a better ranked result (word 3-gram Jaccard
+    similarity of at least `duplicate_threshold`) are dropped, the rest are split into passages,
+    repeated passages are dropped, and the remaining passages are ranked against the query with
+    BM25. With `embeddings`, the best BM25 candidates are reranked by cosine similarity to the
+    query. The best passages are packed into `max_tokens` and returned in the Tavily response
+    shape, each result's content being its selected passages in document order.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 1000,
+        passage_tokens: int = 96,
+        duplicate_threshold: float = 0.8,
+        embeddings: Optional[Embeddings] = None,
+        rerank_candidates: int = 32,
+        count_tokens: Callable[[str], int] = approximate_tokens,
+    ):
+        self.max_tokens = max_tokens
+        self.passage_tokens = passage_tokens
+        self.duplicate_threshold = duplicate_threshold
+        self.embeddings = embeddings
+        self.rerank_candidates = rerank_candidates
+        self.count_tokens = count_tokens
+        self.stats = CompactionStats()
+        self._lock = threading.Lock()
+
+    def compact(self, query: str, response: dict[str, Any]) -> dict[str, Any]:
+        results, passages = self._passages(response)
+        ranked = self._rank_bm25(query, passages)
+        if self.embeddings is not None and ranked:
+            candidates = ranked[: self.rerank_candidates]
+            vectors = self.embeddings.embed_documents([p.text for p in candidates])
+            ranked = self._rerank(
+                self.embeddings.embed_query(query), candidates, vectors
+            )
+        return self._pack(response, results, ranked)
+
+    async def acompact(self, query: str, response: dict[str, Any]) -> dict[str, Any]:
+        results, passages = self._passages(response)
+        ranked = self._rank_bm25(query, passages)
+        if self.embeddings is not None and ranked:
+            candidates = ranked[: self.rerank_candidates]
+            vectors = await self.embeddings.aembed_documents(
+                [p.text for p in candidates]
+            )
+            ranked = self._rerank(
+                await self.embeddings.aembed_query(query), candidates, vectors
+            )
+        return self._pack(response, results, ranked)
+
+    def _passages(self, response: dict[str, Any]) -> tuple[list[dict], list[_Passage]]:
+        results, kept_shingles, duplicates = [], [], 0
+        # Tavily returns results best first, so the first copy of near-duplicates is kept
+        for result in response.get("results") or []:
+            content = result.get("content") or ""
+            result_shingles = shingles(content)
+            if any(
+                jaccard(result_shingles, other) >= self.duplicate_threshold
+                for other in kept_shingles
+            ):
+                duplicates += 1
+                continue
+            kept_shingles.append(result_shingles)
+            results.append(result)
+
+        passages, seen = [], set()
+        for index, result in enumerate(results):
+            for position, text in enumerate(
+                split_passages(result.get("content") or "", self.passage_tokens)
+            ):
+                key = " ".join(words(text))
+                if key in seen:
+                    continue
+                seen.add(key)
+                passages.append(
+                    _Passage(index, position, text, self.count_tokens(text))
+                )
+        with self._lock:
+            self.stats.duplicates += duplicates
+        return results, passages
+
+    @staticmethod
+    def _rank_bm25(query: str, passages: list[_Passage]) -> list[_Passage]:
+        if not passages:
+            return []
+        for passage, score in zip(
+            passages, BM25([p.text for p in passages]).scores(query)
+        ):
+            passage.score = score
+        # Ties keep the search engine's order
+        return sorted(passages, key=lambda p: (-p.score, p.result, p.position))
+
+    @staticmethod
+    def _rerank(
+        query_vector: Sequence[float],
+        candidates: list[_Passage],
+        vectors: Sequence[Sequence[float]],
+    ) -> list[_Passage]:
+        query_norm = math.sqrt(sum(v * v for v in query_vector)) or 1.0
+        for passage, vector in zip(candidates, vectors):
+            norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+            passage.score = sum(a * b for a, b in zip(query_vector, vector)) / (
+                query_norm * norm
+            )
+        return sorted(candidates, key=lambda p: -p.score)
+
+    def _pack(
+        self, response: dict[str, Any], results: list[dict], ranked: list[_Passage]
+    ) -> dict[str, Any]:
+        selected, budget = [], self.max_tokens
+        for passage in ranked:
+            if passage.tokens <= budget:
+                selected.append(passage)
+                budget -= passage.tokens
+        selected.sort(key=lambda p: (p.result, p.position))
+
+        compacted = []
+        for index, result in enumerate(results):
+            texts = [p.text for p in selected if p.result == index]
+            if texts:
+                compacted.append(
+                    {
+                        **{k: v for k, v in result.items() if k != "raw_content"},
+                        "content": " ... ".join(texts),
+                    }
+                )
+
+        input_tokens = sum(
+            self.count_tokens(r.get("content") or "")
+            for r in response.get("results") or []
+        )
+        output_tokens = self.max_tokens - budget
+        search_result_tokens.observe(input_tokens, stage="raw")
+        search_result_tokens.observe(output_tokens, stage="compacted")
+        with self._lock:
+            self.stats.searches += 1
+            self.stats.input_tokens += input_tokens
+            self.stats.output_tokens += output_tokens
+        return {**response, "results": compacted}
@@ -0,0 +1,74 @@
+"""
+Settings shared by the agents. Each agent's `env.py` combines them with its own settings into a
+`Settings` class that reads the agent's .env file.
+"""
+
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+from models.limits import rate_limits
+from models.schema import (
+    Endpoint,
+    OpenAIModelConfig,
+    ResponseCacheConfig,
+    RoutingConfig,
+)
+
+
+class OpenAISettings(BaseSettings):
+    OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
+    OPENAI_MODEL_NAME: str = "gpt-4o"
+    # JSON list of OpenAI-compatible endpoints serving the model, requests are balanced across
+    # them by weight, e.g. [{"base_url": "https://a/v1", "weight": 2}, {"base_url": "https://b/v1"}]
+    OPENAI_ENDPOINTS: list[Endpoint] = []
+    # Send a duplicate request to a second endpoint when the first is slower than its p95
+    OPENAI_HEDGE: bool = True
+    # Request and token budgets per endpoint, and the cap of the adaptive concurrency limit.
+    # Unset means no client-side limits.
+    OPENAI_RPM: Optional[float] = None
+    OPENAI_TPM: Optional[float] = None
+    OPENAI_MAX_CONCURRENCY: Optional[int] = None
+    # Cache complete model responses by request: "cache", "record" or "replay" (recorded
+    # responses only, for offline runs). Stored in the SQLite file LLM_CACHE_PATH, in memory
+    # when unset.
+    LLM_CACHE_MODE: Optional[str] = None
+    LLM_CACHE_PATH: Optional[str] = None
+
+
+class SummarySettings(BaseSettings):
+    # Fold older messages into a rolling summary in the background once SUMMARY_TRIGGER_TOKENS
+    # follow the latest summary, keeping the last SUMMARY_KEEP_TOKENS verbatim. Turns then send
+    # the summary and the recent messages instead of the whole thread.
+    SUMMARIZATION: bool = False
+    SUMMARY_TRIGGER_TOKENS: int = 4000
+    SUMMARY_KEEP_TOKENS: int = 1000
+
+
+class LanggraphSettings(BaseSettings):
+    LANGSMITH_API_KEY: Optional[str] = None
+    # "memory" or "sqlite" to compile the graph with a checkpointer. Leave unset under
+    # `langgraph dev`/the LangGraph server, which provide their own.
+    CHECKPOINTER: Optional[str] = None
+    CHECKPOINT_PATH: str = "checkpoints.sqlite"
+    CHECKPOINT_COMPRESSION: bool = False
+    # Record node, model and tool latencies and token usage as Prometheus-style metrics, and
+    # export them as OpenTelemetry spans with OTEL_TRACING (requires opentelemetry-api)
+    INSTRUMENTATION: bool = True
+    OTEL_TRACING: bool = False
+
+
+def model_config(env: OpenAISettings) -> OpenAIModelConfig:
+    """The config of the agent's chat model, built from the OpenAI settings."""
+    return OpenAIModelConfig(
+        model_name=env.OPENAI_MODEL_NAME,
+        api_key=env.OPENAI_API_KEY,
+        base_url=env.OPENAI_BASE_URL,
+        endpoints=env.OPENAI_ENDPOINTS,
+        routing=RoutingConfig(hedge=env.OPENAI_HEDGE),
+        limits=rate_limits(env.OPENAI_RPM, env.OPENAI_TPM, env.OPENAI_MAX_CONCURRENCY),
+        cache=ResponseCacheConfig(mode=env.LLM_CACHE_MODE, path=env.LLM_CACHE_PATH)
+        if env.LLM_CACHE_MODE
+        else None,
+    )
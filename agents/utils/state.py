@@ -0,0 +1,171 @@
+import json
+import threading
+import zlib
+from collections import OrderedDict
+from collections.abc import Iterator, MutableMapping
+from typing import Callable, Optional, Sequence, TypeVar
+
+from langchain_core.messages import (
+    AnyMessage,
+    BaseMessage,
+    messages_from_dict,
+    messages_to_dict,
+)
+from langgraph.graph.message import Messages
+from typing_extensions import Annotated, TypedDict
+
+from agents.utils.tokens import (
+    MessageTokenCounter,
+    count_message_tokens_approximately,
+    token_counting_reducer,
+)
+
+Summarizer = Callable[[list[BaseMessage]], str]
+
+V = TypeVar("V")
+
+
+class LRUStore(MutableMapping[str, V]):
+    """
+    Mapping that keeps the `max_entries` most recently used entries in process memory. Its contents
+    are lost on restart and not shared by the worker processes of `server.main`.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, V] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getitem__(self, key: str) -> V:
+        with self._lock:
+            value = self._entries[key]
+            self._entries.move_to_end(key)
+            return value
+
+    def __setitem__(self, key: str, value: V) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __delitem__(self, key: str) -> None:
+        with self._lock:
+            del self._entries[key]
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class MessageArchive:
+    """
+    Compact side store for messages evicted from the hot window of a thread.
+
+    Evicted messages are stored as one zlib-compressed JSON chunk, keyed by the id of the message
+    that follows them in the thread. Each chunk's first message is in turn the key of the chunk
+    before it, so the full history can be walked back from the current window on demand.
+    `store` can be any mapping of str to bytes, e.g. a `shelve` or SQLite-backed dict to move the
+    archive out of process memory. With a `summarizer`, each chunk also keeps a short summary.
+
+    The default store is an `LRUStore` of the `max_chunks` most recently used chunks. It is
+    process-local: the archive is lost on restart, and `history` stops at the first chunk that was
+    evicted or written by another worker.
+    """
+
+    def __init__(
+        self,
+        store: Optional[MutableMapping[str, bytes]] = None,
+        summarizer: Optional[Summarizer] = None,
+        max_chunks: int = 10_000,
+    ):
+        self.store = store if store is not None else LRUStore(max_chunks)
+        self.summarizer = summarizer
+        self._lock = threading.Lock()
+
+    def put(self, next_id: str, messages: list[BaseMessage]) -> None:
+        # Replaying the writes of a checkpoint runs the reducer again and evicts the same chunk
+        with self._lock:
+            if next_id in self.store:
+                return
+        chunk = {"messages": messages_to_dict(messages)}
+        if self.summarizer is not None:
+            chunk["summary"] = self.summarizer(messages)
+        data = zlib.compress(json.dumps(chunk).encode())
+        with self._lock:
+            self.store[next_id] = data
+
+    def _chunk(self, next_id: str) -> Optional[dict]:
+        with self._lock:
+            data = self.store.get(next_id)
+        return json.loads(zlib.decompress(data)) if data is not None else None
+
+    def get(self, next_id: str) -> list[BaseMessage]:
+        """Return the messages evicted right before the message with id `next_id`."""
+        chunk = self._chunk(next_id)
+        return messages_from_dict(chunk["messages"]) if chunk else []
+
+    def summary(self, next_id: str) -> Optional[str]:
+        chunk = self._chunk(next_id)
+        return chunk.get("summary") if chunk else None
+
+    def history(
+        self, window: Sequence[BaseMessage], limit: Optional[int] = None
+    ) -> list[BaseMessage]:
+        """Fetch archived messages preceding `window`, oldest first, up to `limit` messages."""
+        history: list[BaseMessage] = []
+        next_id = window[0].id if window else None
+        while next_id and (limit is None or len(history) < limit):
+            chunk = self.get(next_id)
+            if not chunk:
+                break
+            history = chunk + history
+            next_id = chunk[0].id
+        return history[-limit:] if limit else history
+
+
+message_archive = MessageArchive()
+
+
+def windowed_messages_reducer(
+    max_messages: int = 200,
+    archive: Optional[MessageArchive] = None,
+    counter: MessageTokenCounter = count_message_tokens_approximately,
+) -> Callable[[Messages, Messages], list[AnyMessage]]:
+    """
+    Build a messages reducer that keeps a bounded hot window in graph state.
+
+    Works like `add_messages` with token counting (see `token_counting_reducer`). When the window
+    grows beyond `max_messages`, the oldest messages move to `archive` until a quarter of the window
+    is free again, so evictions are batched into fewer, better compressed chunks. The cut is moved
+    forward to the next human message, so the window never starts in the middle of a tool call exchange.
+    """
+    archive = archive if archive is not None else message_archive
+    add_messages_with_token_counts = token_counting_reducer(counter)
+
+    def reducer(left: Messages, right: Messages) -> list[AnyMessage]:
+        merged = add_messages_with_token_counts(left, right)
+        if len(merged) <= max_messages:
+            return merged
+
+        cut = len(merged) - (max_messages - max_messages // 4)
+        while cut < len(merged) and merged[cut].type != "human":
+            cut += 1
+        if cut == len(merged):
+            # No turn boundary in the window yet, keep everything until there is one
+            return merged
+
+        archive.put(merged[cut].id, merged[:cut])
+        return merged[cut:]
+
+    return reducer
+
+
+windowed_messages = windowed_messages_reducer()
+
+
+class WindowedMessagesState(TypedDict):
+    messages: Annotated[list[AnyMessage], windowed_messages]
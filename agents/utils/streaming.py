@@ -0,0 +1,145 @@
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Literal, Optional, Sequence, Union
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AIMessage,
+    AIMessageChunk,
+    BaseMessage,
+    ToolMessage,
+    message_chunk_to_message,
+)
+from langgraph.config import get_stream_writer
+
+from agents.utils.metrics import metrics
+
+TOKEN_RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 200, 400, 800)
+
+time_to_first_token = metrics.histogram(
+    "node_time_to_first_token_seconds",
+    "Time from the start of a node's model call to its first streamed token",
+)
+tokens_per_second = metrics.histogram(
+    "node_tokens_per_second",
+    "Output tokens per second of a node's model call, after the first token",
+    buckets=TOKEN_RATE_BUCKETS,
+)
+
+
+@dataclass
+class StreamMessage:
+    """Custom stream event, the same shape as the deprecated Pydantic AI graph emitted."""
+
+    type: Literal["text", "thinking", "tool_call_start", "tool_call_end"]
+    timestamp: str
+    content: Optional[str] = None
+    content_delta: Optional[str] = None
+    tool_call_id: Optional[str] = None
+    tool_call_args: Optional[Union[dict, str]] = None
+    tool_call_name: Optional[str] = None
+    node: Optional[str] = None
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _stream_writer() -> Callable[[Any], None]:
+    """Return the graph's custom stream writer, or a no-op outside of a graph run."""
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda _: None
+
+
+class NodeStream:
+    """
+    Forward a node's model stream as `StreamMessage` custom events and measure
+    time to first token and tokens per second for the node.
+    """
+
+    def __init__(self, node: str):
+        self.node = node
+        self.writer = _stream_writer()
+        self.start = time.perf_counter()
+        self.first_token_at: Optional[float] = None
+        self.chunks = 0
+        self.aggregate: Optional[AIMessageChunk] = None
+
+    def on_chunk(self, chunk: AIMessageChunk) -> None:
+        self.aggregate = chunk if self.aggregate is None else self.aggregate + chunk
+        if not chunk.text:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+            time_to_first_token.observe(
+                self.first_token_at - self.start, node=self.node
+            )
+        self.chunks += 1
+        self.writer(
+            StreamMessage(
+                type="text",
+                content_delta=chunk.text,
+                timestamp=_now(),
+                node=self.node,
+            )
+        )
+
+    def on_tool_call(self, message: AIMessage) -> None:
+        for tool_call in message.tool_calls:
+            self.writer(
+                StreamMessage(
+                    type="tool_call_start",
+                    tool_call_id=tool_call["id"],
+                    tool_call_name=tool_call["name"],
+                    tool_call_args=tool_call["args"],
+                    timestamp=_now(),
+                    node=self.node,
+                )
+            )
+
+    def on_tool_result(self, message: ToolMessage) -> None:
+        self.writer(
+            StreamMessage(
+                type="tool_call_end",
+                tool_call_id=message.tool_call_id,
+                content=message.text,
+                timestamp=_now(),
+                node=self.node,
+            )
+        )
+
+    def finish(self) -> AIMessage:
+        """Record the token rate and return the aggregated message, an empty one without chunks."""
+        if self.first_token_at is not None:
+            usage = self.aggregate.usage_metadata if self.aggregate else None
+            tokens = usage["output_tokens"] if usage else self.chunks
+            elapsed = time.perf_counter() - self.first_token_at
+            if elapsed > 0:
+                tokens_per_second.observe(tokens / elapsed, node=self.node)
+        if self.aggregate is None:
+            # Nodes append the result to the messages, which have no place for None
+            return AIMessage(content="")
+        return message_chunk_to_message(self.aggregate)
+
+
+def stream_model(
+    model: BaseChatModel, messages: Sequence[BaseMessage], node: str
+) -> AIMessage:
+    """`model.invoke` that streams tokens to the graph's custom stream and records node token metrics."""
+    stream = NodeStream(node)
+    for chunk in model.stream(messages):
+        stream.on_chunk(chunk)
+    return stream.finish()
+
+
+async def astream_model(
+    model: BaseChatModel, messages: Sequence[BaseMessage], node: str
+) -> AIMessage:
+    """Async variant of `stream_model`."""
+    stream = NodeStream(node)
+    async for chunk in model.astream(messages):
+        stream.on_chunk(chunk)
+    return stream.finish()
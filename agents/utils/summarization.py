@@ -0,0 +1,201 @@
+import threading
+import time
+from collections.abc import MutableMapping
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from langchain.chat_models import BaseChatModel
+from langchain_core.messages import (
+    BaseMessage,
+    HumanMessage,
+    SystemMessage,
+    get_buffer_string,
+)
+
+from agents.utils.metrics import metrics
+from agents.utils.prompts import TOKEN_BUCKETS, Prompt
+from agents.utils.state import LRUStore
+from agents.utils.tokens import (
+    MessageTokenCounter,
+    count_message_tokens_approximately,
+    message_tokens,
+)
+
+SUMMARY_SYSTEM_PROMPT = """
+    You maintain the running summary of a conversation between a user and an assistant.
+    Given the previous summary, if any, and the messages that followed it, write an updated summary.
+    Keep facts, numbers, names, decisions and open questions the assistant will need later.
+    Leave out greetings and small talk. Answer with the summary only.
+    """
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+
+summary_duration = metrics.histogram(
+    "summary_seconds",
+    "Wall time of a background conversation summary, by summarizer and status",
+)
+summary_tokens = metrics.histogram(
+    "summary_tokens",
+    "Estimated tokens of the messages folded into a summary and of the summary",
+    buckets=TOKEN_BUCKETS,
+)
+
+
+@dataclass
+class SummaryStats:
+    summaries: int = 0
+    errors: int = 0
+    input_tokens: int = 0
+    summary_tokens: int = 0
+    seconds: float = 0.0
+
+
+class ConversationSummarizer:
+    """
+    Rolling summary of the older part of a conversation, computed off the request path.
+
+    After a turn, `schedule` checks whether the messages since the latest summary exceed
+    `trigger_tokens`. If they do, a worker thread folds them, except for the last `keep_tokens`
+    (the cut moved forward to the next human message), into the previous summary with one model
+    call. The new summary is stored under the id of the first message it does not cover, like the
+    chunks of `MessageArchive`, so threads need no key of their own and a summary that is not ready
+    yet simply isn't found. On the request path, `context` only looks up the latest summary among
+    the messages in state and returns it with the messages that follow it.
+
+    The summary changes once per summarization rather than every turn, so the summary message,
+    placed after the system prompt, stays in the provider's prompt cache in between.
+
+    `store` can be any mapping of str to str, e.g. a `shelve` or SQLite-backed dict. The default is
+    an `LRUStore` of the `max_summaries` most recently used summaries, which is process-local: after
+    a restart, on another worker or once a thread's summary is evicted, its turns send the whole
+    window again until the next summary is ready.
+    """
+
+    def __init__(
+        self,
+        model: Callable[[], BaseChatModel],
+        name: str = "conversation",
+        trigger_tokens: int = 4000,
+        keep_tokens: int = 1000,
+        counter: MessageTokenCounter = count_message_tokens_approximately,
+        store: Optional[MutableMapping[str, str]] = None,
+        max_workers: int = 2,
+        max_summaries: int = 10_000,
+    ):
+        self.model = model
+        self.name = name
+        self.trigger_tokens = trigger_tokens
+        self.keep_tokens = keep_tokens
+        self.counter = counter
+        self.store = store if store is not None else LRUStore(max_summaries)
+        self.prompt = Prompt(f"{name}_summary", SUMMARY_SYSTEM_PROMPT, counter=counter)
+        self.stats = SummaryStats()
+        self._executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="summarizer"
+        )
+        # Summaries being computed, by the id of the first message they cover
+        self._pending: dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+    def _latest(self, messages: Sequence[BaseMessage]) -> tuple[int, Optional[str]]:
+        """Index of the first message after the latest summary, and that summary."""
+        for index in range(len(messages) - 1, -1, -1):
+            summary = self.store.get(messages[index].id)
+            if summary is not None:
+                return index, summary
+        return 0, None
+
+    def context(
+        self, messages: Sequence[BaseMessage]
+    ) -> tuple[Optional[SystemMessage], list[BaseMessage]]:
+        """The latest summary as a system message, None if there is none yet, and the messages after it."""
+        start, summary = self._latest(messages)
+        if summary is None:
+            return None, list(messages)
+        return SystemMessage(content=SUMMARY_PREFIX + summary), list(messages[start:])
+
+    def schedule(self, messages: Sequence[BaseMessage]) -> Optional[Future]:
+        """Start summarizing in the background when enough messages followed the latest summary."""
+        start, summary = self._latest(messages)
+        tokens = [message_tokens(m, self.counter) for m in messages[start:]]
+        if sum(tokens) < self.trigger_tokens:
+            return None
+
+        cut, kept = len(messages), 0
+        while cut > start and kept + tokens[cut - 1 - start] <= self.keep_tokens:
+            cut -= 1
+            kept += tokens[cut - start]
+        while cut < len(messages) and messages[cut].type != "human":
+            cut += 1
+        if cut <= start or cut == len(messages):
+            # No turn boundary to cut at yet
+            return None
+
+        base = messages[start].id
+        with self._lock:
+            if base in self._pending:
+                return None
+            future = self._pending[base] = self._executor.submit(
+                self._summarize,
+                summary,
+                list(messages[start:cut]),
+                messages[cut].id,
+                base if summary is not None else None,
+            )
+        future.add_done_callback(lambda _: self._done(base))
+        return future
+
+    def _done(self, base: str) -> None:
+        with self._lock:
+            self._pending.pop(base, None)
+
+    def _summarize(
+        self,
+        previous: Optional[str],
+        messages: list[BaseMessage],
+        next_id: str,
+        previous_id: Optional[str] = None,
+    ) -> Optional[str]:
+        transcript = get_buffer_string(messages)
+        if previous:
+            transcript = f"Previous summary:\n{previous}\n\nMessages:\n{transcript}"
+        input_tokens = sum(message_tokens(m, self.counter) for m in messages)
+        start = time.perf_counter()
+        try:
+            response = self.prompt.record(
+                self.model().invoke(
+                    self.prompt.format([HumanMessage(content=transcript)])
+                )
+            )
+        except Exception:
+            # The next turn schedules the same messages again
+            summary_duration.observe(
+                time.perf_counter() - start, summarizer=self.name, status="error"
+            )
+            with self._lock:
+                self.stats.errors += 1
+            return None
+        elapsed = time.perf_counter() - start
+        summary = response.text
+        output_tokens = self.counter(SystemMessage(content=summary))
+        self.store[next_id] = summary
+        if previous_id is not None:
+            # Folded into the new summary, which `_latest` finds first
+            self.store.pop(previous_id, None)
+
+        summary_duration.observe(elapsed, summarizer=self.name, status="ok")
+        summary_tokens.observe(input_tokens, summarizer=self.name, stage="input")
+        summary_tokens.observe(output_tokens, summarizer=self.name, stage="summary")
+        with self._lock:
+            self.stats.summaries += 1
+            self.stats.input_tokens += input_tokens
+            self.stats.summary_tokens += output_tokens
+            self.stats.seconds += elapsed
+        return summary
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """Wait for the summaries in progress, e.g. before shutting down."""
+        with self._lock:
+            pending = list(self._pending.values())
+        wait(pending, timeout)
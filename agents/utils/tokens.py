@@ -0,0 +1,117 @@
+from typing import Callable, Optional, Sequence, Union
+
+from langchain_core.messages import AnyMessage, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langgraph.graph.message import Messages, add_messages
+
+# Key in `response_metadata` under which a message's token count is stored.
+# `response_metadata` is never sent back to the provider.
+TOKEN_COUNT_KEY = "token_count"
+
+MessageTokenCounter = Callable[[BaseMessage], int]
+
+
+def count_message_tokens_approximately(message: BaseMessage) -> int:
+    return count_tokens_approximately([message])
+
+
+def tiktoken_counter(encoding_name: str = "o200k_base") -> MessageTokenCounter:
+    """
+    Count tokens with a local tiktoken encoding.
+    tiktoken is installed with langchain-openai, set TIKTOKEN_CACHE_DIR to load encodings from disk without network access.
+    """
+    try:
+        import tiktoken
+    except ImportError as e:
+        raise ImportError(
+            "tiktoken is required for the tiktoken token counter, install it with `pip install tiktoken`"
+        ) from e
+
+    encoding = tiktoken.get_encoding(encoding_name)
+
+    def count(message: BaseMessage) -> int:
+        # 3 tokens of per-message overhead, the same as `count_tokens_approximately`
+        return len(encoding.encode(message.text, disallowed_special=())) + 3
+
+    return count
+
+
+def get_token_counter(name: Optional[str] = None) -> MessageTokenCounter:
+    """
+    Resolve a token counter by name: None or "approximate" for the character-based estimate,
+    "tiktoken" or "tiktoken:<encoding>" for a tiktoken encoding.
+    """
+    if not name or name == "approximate":
+        return count_message_tokens_approximately
+    if name == "tiktoken" or name.startswith("tiktoken:"):
+        _, _, encoding_name = name.partition(":")
+        return tiktoken_counter(encoding_name or "o200k_base")
+    raise ValueError(f"Unknown token counter: {name}")
+
+
+def message_tokens(
+    message: BaseMessage,
+    counter: MessageTokenCounter = count_message_tokens_approximately,
+) -> int:
+    """Return the cached token count of `message`, counting and caching it if needed."""
+    count = message.response_metadata.get(TOKEN_COUNT_KEY)
+    if count is None:
+        count = message.response_metadata[TOKEN_COUNT_KEY] = counter(message)
+    return count
+
+
+def token_counting_reducer(
+    counter: MessageTokenCounter = count_message_tokens_approximately,
+) -> Callable[[Messages, Messages], list[AnyMessage]]:
+    """
+    Build a messages reducer that behaves like `add_messages` and counts the tokens of each new
+    message once, when it is appended. Trimming can then use the cached counts.
+    """
+
+    def reducer(left: Messages, right: Messages) -> list[AnyMessage]:
+        merged = add_messages(left, right)
+        # Only the tail can hold new messages, walk back until the first already counted one
+        for message in reversed(merged):
+            if TOKEN_COUNT_KEY in message.response_metadata:
+                break
+            message_tokens(message, counter)
+        return merged
+
+    return reducer
+
+
+add_messages_with_token_counts = token_counting_reducer()
+
+
+def trim_messages_by_cached_tokens(
+    messages: Sequence[BaseMessage],
+    max_tokens: int,
+    counter: MessageTokenCounter = count_message_tokens_approximately,
+    start_on: Union[str, Sequence[str], None] = "human",
+    end_on: Union[str, Sequence[str], None] = ("human", "tool"),
+) -> list[BaseMessage]:
+    """
+    Keep the last messages that fit in `max_tokens`, like `trim_messages(strategy="last")`.
+    Walks back from the tail using cached token counts, so the cost depends on the size of
+    the kept window rather than on the length of the thread.
+    """
+    start_on = (start_on,) if isinstance(start_on, str) else start_on
+    end_on = (end_on,) if isinstance(end_on, str) else end_on
+
+    end = len(messages)
+    if end_on:
+        while end and messages[end - 1].type not in end_on:
+            end -= 1
+
+    start, total = end, 0
+    while start:
+        total += message_tokens(messages[start - 1], counter)
+        if total > max_tokens:
+            break
+        start -= 1
+
+    if start_on:
+        while start < end and messages[start].type not in start_on:
+            start += 1
+
+    return list(messages[start:end])
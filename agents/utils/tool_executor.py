@@ -0,0 +1,153 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Callable, Optional, Sequence
+
+from langchain_core.messages import ToolCall, ToolMessage
+from langchain_core.tools import BaseTool, StructuredTool
+
+
+def is_async_tool(tool: BaseTool) -> bool:
+    return (
+        isinstance(tool, StructuredTool)
+        and tool.func is None
+        and tool.coroutine is not None
+    )
+
+
+class _Start:
+    """Set by a pool thread when it starts running a call, the call's timeout counts from then."""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.at = 0.0
+
+    def __call__(self) -> None:
+        self.at = time.monotonic()
+        self.started.set()
+
+
+class ToolExecutor:
+    """
+    Run the tool calls of one model response concurrently.
+
+    Sync tools run on a thread pool, async tools are gathered on the event loop. At most
+    `max_concurrency` calls run at once, each call is bounded by its tool's timeout (`timeouts`
+    by tool name, `timeout` otherwise), counted from when the call starts running rather than
+    while it waits for a slot. Results are returned in the order of the tool calls. Failures and
+    timeouts are returned as error `ToolMessage`s, so the model can react to them.
+
+    Threads can't be interrupted: a sync tool that timed out keeps its thread of the pool's
+    `max_concurrency` until it returns, and later calls wait for a free thread. Tools that can
+    hang should bound their own I/O, e.g. with HTTP client timeouts.
+    """
+
+    def __init__(
+        self,
+        tools: Sequence[BaseTool],
+        max_concurrency: int = 8,
+        timeout: Optional[float] = 30.0,
+        timeouts: Optional[dict[str, float]] = None,
+    ):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.timeouts = timeouts or {}
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="tool-executor"
+        )
+
+    def timeout_for(self, name: str) -> Optional[float]:
+        return self.timeouts.get(name, self.timeout)
+
+    def execute(self, tool_calls: Sequence[ToolCall]) -> list[ToolMessage]:
+        starts = [_Start() for _ in tool_calls]
+        futures = [
+            self._pool.submit(self._run_started, call, start)
+            for call, start in zip(tool_calls, starts)
+        ]
+        results = []
+        for call, future, start in zip(tool_calls, futures, starts):
+            timeout = self.timeout_for(call["name"])
+            if timeout is not None:
+                start.started.wait()
+                timeout = max(0.0, start.at + timeout - time.monotonic())
+            try:
+                results.append(future.result(timeout=timeout))
+            except FutureTimeoutError:
+                results.append(self._timeout_message(call))
+        return results
+
+    async def aexecute(self, tool_calls: Sequence[ToolCall]) -> list[ToolMessage]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def run(call: ToolCall) -> ToolMessage:
+            tool = self.tools_by_name.get(call["name"])
+            async with semaphore:
+                try:
+                    if tool is not None and is_async_tool(tool):
+                        observation = tool.ainvoke(call["args"])
+                    else:
+                        started = asyncio.Event()
+                        observation = loop.run_in_executor(
+                            self._pool,
+                            self._run_started,
+                            call,
+                            lambda: loop.call_soon_threadsafe(started.set),
+                        )
+                        await started.wait()
+                    result = await asyncio.wait_for(
+                        observation, self.timeout_for(call["name"])
+                    )
+                except asyncio.TimeoutError:
+                    return self._timeout_message(call)
+                except Exception as e:
+                    return self._error_message(call, e)
+            if isinstance(result, ToolMessage):
+                return result
+            return ToolMessage(
+                content=result, tool_call_id=call["id"], name=call["name"]
+            )
+
+        return list(await asyncio.gather(*(run(call) for call in tool_calls)))
+
+    def _run_started(self, call: ToolCall, on_start: Callable[[], None]) -> ToolMessage:
+        on_start()
+        return self._run_call(call)
+
+    def _run_call(self, call: ToolCall) -> ToolMessage:
+        tool = self.tools_by_name.get(call["name"])
+        if tool is None:
+            return self._error_message(
+                call, ValueError(f"Unknown tool: {call['name']}")
+            )
+        try:
+            if is_async_tool(tool):
+                observation = asyncio.run(tool.ainvoke(call["args"]))
+            else:
+                observation = tool.invoke(call["args"])
+        except Exception as e:
+            return self._error_message(call, e)
+        return ToolMessage(
+            content=observation, tool_call_id=call["id"], name=call["name"]
+        )
+
+    def _timeout_message(self, call: ToolCall) -> ToolMessage:
+        return ToolMessage(
+            content=f"Error: {call['name']} timed out after {self.timeout_for(call['name'])}s",
+            tool_call_id=call["id"],
+            name=call["name"],
+            status="error",
+        )
+
+    @staticmethod
+    def _error_message(call: ToolCall, error: Exception) -> ToolMessage:
+        return ToolMessage(
+            content=f"Error: {error!r}",
+            tool_call_id=call["id"],
+            name=call["name"],
+            status="error",
+        )
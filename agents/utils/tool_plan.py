@@ -0,0 +1,144 @@
+import json
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Optional, Sequence, Union
+
+from langchain_core.tools import BaseTool, StructuredTool
+from pydantic import BaseModel, Field
+
+PLAN_TOOL_NAME = "evaluate_plan"
+# Step arguments of the form "$<step id>" are replaced by that step's result
+REFERENCE_PREFIX = "$"
+
+
+class PlanStep(BaseModel):
+    id: str = Field(description="Unique name of the step, e.g. 's1'")
+    tool: str = Field(description="Name of the tool to call")
+    args: dict[str, Union[int, float, str, list[Union[int, float]]]] = Field(
+        description='Tool arguments, "$<step id>" stands for the result of that step'
+    )
+
+
+class ToolPlan(BaseModel):
+    steps: list[PlanStep] = Field(description="Tool calls, in any order")
+    result: Optional[str] = Field(
+        default=None,
+        description="Id of the step that answers the question, the last step by default",
+    )
+
+
+def references(step: PlanStep) -> set[str]:
+    return {
+        value[len(REFERENCE_PREFIX) :]
+        for value in step.args.values()
+        if isinstance(value, str) and value.startswith(REFERENCE_PREFIX)
+    }
+
+
+class ToolPlanExecutor:
+    """
+    Evaluate a DAG of tool calls that a model emitted in one response, instead of one model
+    round trip per step.
+
+    Steps run as soon as the steps they refer to have finished, independent branches on a thread
+    pool. Invalid plans (unknown tools or steps, cycles) and failing steps raise a `ValueError`,
+    which the tool node returns to the model as an error message.
+    """
+
+    def __init__(self, tools: Sequence[BaseTool], max_concurrency: int = 8):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="tool-plan"
+        )
+
+    def as_tool(self) -> BaseTool:
+        names = ", ".join(self.tools_by_name)
+        return StructuredTool.from_function(
+            func=self._evaluate,
+            name=PLAN_TOOL_NAME,
+            description=(
+                f"Evaluate several calls of the tools {names} at once. "
+                "Put every step of the calculation in one plan and refer to the result of an "
+                'earlier step as "$<step id>". Returns the result and the value of each step.'
+            ),
+            args_schema=ToolPlan,
+        )
+
+    def _evaluate(self, steps: list, result: Optional[str] = None) -> str:
+        plan = ToolPlan.model_validate({"steps": steps, "result": result})
+        values = self.run(plan)
+        answer = plan.result or plan.steps[-1].id
+        return json.dumps({"result": values[answer], "steps": values})
+
+    def validate(self, plan: ToolPlan) -> dict[str, set[str]]:
+        """Return the steps each step depends on, raise a `ValueError` if the plan can't run."""
+        if not plan.steps:
+            raise ValueError("The plan has no steps")
+        dependencies = {}
+        for step in plan.steps:
+            if step.id in dependencies:
+                raise ValueError(f"Duplicate step id {step.id!r}")
+            if step.tool not in self.tools_by_name:
+                raise ValueError(f"Step {step.id!r} calls unknown tool {step.tool!r}")
+            dependencies[step.id] = references(step)
+        for step_id, refs in dependencies.items():
+            if unknown := refs - dependencies.keys():
+                raise ValueError(
+                    f"Step {step_id!r} refers to unknown steps {sorted(unknown)}"
+                )
+        if plan.result is not None and plan.result not in dependencies:
+            raise ValueError(f"Unknown result step {plan.result!r}")
+
+        # Kahn's algorithm, whatever is left over is on a cycle
+        remaining = {step_id: set(refs) for step_id, refs in dependencies.items()}
+        ready = [step_id for step_id, refs in remaining.items() if not refs]
+        while ready:
+            done = ready.pop()
+            del remaining[done]
+            for step_id, refs in remaining.items():
+                if done in refs:
+                    refs.discard(done)
+                    if not refs:
+                        ready.append(step_id)
+        if remaining:
+            raise ValueError(f"The plan has a cycle through steps {sorted(remaining)}")
+        return dependencies
+
+    def run(self, plan: ToolPlan) -> dict[str, Any]:
+        """Evaluate all steps of `plan`, return their results by step id."""
+        dependencies = self.validate(plan)
+        steps = {step.id: step for step in plan.steps}
+        results: dict[str, Any] = {}
+        running: dict[Future, str] = {}
+        while dependencies or running:
+            ready = [
+                step_id
+                for step_id, refs in dependencies.items()
+                if refs <= results.keys()
+            ]
+            for step_id in ready:
+                del dependencies[step_id]
+            # A lone step runs inline, threads only pay off for independent branches
+            if len(ready) == 1 and not running:
+                results[ready[0]] = self._call(steps[ready[0]], results)
+                continue
+            for step_id in ready:
+                future = self._pool.submit(self._call, steps[step_id], dict(results))
+                running[future] = step_id
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+        return results
+
+    def _call(self, step: PlanStep, results: dict[str, Any]) -> Any:
+        args = {
+            name: results[value[len(REFERENCE_PREFIX) :]]
+            if isinstance(value, str) and value.startswith(REFERENCE_PREFIX)
+            else value
+            for name, value in step.args.items()
+        }
+        try:
+            result = self.tools_by_name[step.tool].invoke(args)
+        except Exception as e:
+            raise ValueError(f"Step {step.id!r} ({step.tool}) failed: {e!r}") from e
+        # The batch tools return JSON arrays, decoded so later steps can reference them as vectors
+        return json.loads(result) if isinstance(result, str) else result
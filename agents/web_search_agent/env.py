@@ -1,30 +1,86 @@
+from functools import cache
 from pathlib import Path
 from typing import Optional
 
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 
+from agents.utils.settings import LanggraphSettings, OpenAISettings, SummarySettings
+
 BASE_DIR = Path(__file__).resolve().parent
 
 
 class TavilySettings(BaseSettings):
     TAVILY_API_KEY: str = ""
+    TAVILY_API_BASE_URL: Optional[str] = None
+    SEARCH_CACHE_TTL_SECONDS: float = 3600
+    # SQLite file for a search result cache that survives restarts, in-memory when unset
+    SEARCH_CACHE_PATH: Optional[str] = None
+    # Request budget and cap of the adaptive concurrency limit for Tavily, unset means no limits
+    TAVILY_RPM: Optional[float] = None
+    TAVILY_MAX_CONCURRENCY: Optional[int] = None
+    # Token budget for the search results of one query after deduplication and BM25 ranking of
+    # their passages, empty or "none" to pass results through in full. Passages are reranked by
+    # similarity to the query with SEARCH_RERANK_EMBEDDING_MODEL, e.g. "text-embedding-3-small".
+    SEARCH_RESULT_MAX_TOKENS: Optional[int] = 1000
+    SEARCH_RERANK_EMBEDDING_MODEL: Optional[str] = None
 
-
-class OpenAISettings(BaseSettings):
-    OPENAI_API_KEY: str = ""
-    OPENAI_BASE_URL: str = "https://api.openai.com/v1"
-    OPENAI_MODEL_NAME: str = "gpt-4o"
+    @field_validator("SEARCH_RESULT_MAX_TOKENS", mode="before")
+    @classmethod
+    def _empty_to_none(cls, value):
+        if isinstance(value, str) and value.strip().lower() in ("", "none", "null"):
+            return None
+        return value
 
 
-class LanggraphSettings(BaseSettings):
-    LANGSMITH_API_KEY: Optional[str] = None
+class WebSearchAgentSettings(BaseSettings):
+    # Run intent classification and query rewriting concurrently, see `build_graph`
+    SPECULATIVE_REWRITE: bool = False
+    # "approximate" or "tiktoken:<encoding>" (requires tiktoken)
+    TOKEN_COUNTER: Optional[str] = None
+    # Messages kept in graph state, older ones move to the message archive
+    MAX_WINDOW_MESSAGES: int = 200
+    INTENT_CACHE_MAX_ENTRIES: int = 1024
+    INTENT_CACHE_TTL_SECONDS: float = 3600
+    # Enables the semantic tier of the intent cache, e.g. "text-embedding-3-small"
+    INTENT_CACHE_EMBEDDING_MODEL: Optional[str] = None
+    # Local routers decide the intent without an LLM call at or above this confidence
+    INTENT_ROUTER_THRESHOLD: float = 0.85
+    # Labeled JSONL examples and local sentence-transformers model, e.g. "all-MiniLM-L6-v2", for
+    # the embedding centroid router tier
+    INTENT_ROUTER_EXAMPLES_PATH: Optional[str] = None
+    INTENT_ROUTER_EMBEDDING_MODEL: Optional[str] = None
+    # Micro-batch intent classification and query rewriting across concurrent sessions:
+    # "abatch" sends each request on its own with at most BATCH_MAX_CONCURRENCY in flight, which
+    # caps the load on the provider (and throughput, at BATCH_MAX_CONCURRENCY / latency) rather
+    # than speeding anything up, "prompt" also classifies a batch of sessions with one
+    # multi-item structured-output call
+    BATCH_MODE: Optional[str] = None
+    BATCH_MAX_SIZE: int = 16
+    BATCH_MAX_WAIT_MS: float = 5
+    BATCH_MAX_CONCURRENCY: int = 8
 
 
-class Settings(TavilySettings, OpenAISettings, LanggraphSettings):
+class Settings(
+    TavilySettings,
+    OpenAISettings,
+    WebSearchAgentSettings,
+    SummarySettings,
+    LanggraphSettings,
+):
     pass
 
     class Config:
         env_file = BASE_DIR / ".env"
 
 
-env = Settings()
+@cache
+def get_settings() -> Settings:
+    return Settings()
+
+
+def __getattr__(name: str):
+    # Settings are read from the environment and .env on first access of `env`, not at import
+    if name == "env":
+        return get_settings()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
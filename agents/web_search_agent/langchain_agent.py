@@ -1,32 +1,210 @@
-import operator
+import threading
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Literal
-
-from langchain.agents import create_agent
-from langchain.messages import AIMessage, AnyMessage, HumanMessage, SystemMessage
-from langchain_core.messages.utils import count_tokens_approximately, trim_messages
-from langchain_tavily import TavilySearch
+from functools import cache
+from typing import Literal, Optional
+
+from langchain.chat_models import BaseChatModel
+from langchain.messages import (
+    AIMessage,
+    AIMessageChunk,
+    AnyMessage,
+    HumanMessage,
+    ToolMessage,
+)
+from langchain_core.messages import BaseMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.tools import BaseTool
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.graph import END, START, StateGraph
+from langgraph.graph.message import Messages
 from pydantic import BaseModel, Field
 from typing_extensions import Annotated, TypedDict
 
-from agents.demo.env import env
+from agents.utils.checkpointer import create_checkpointer
+from agents.utils.instrumentation import instrument
+from agents.utils.intent_cache import ClassificationCache
+from agents.utils.prompts import Prompt
+from agents.utils.router import (
+    EmbeddingCentroidRouter,
+    LocalEmbeddings,
+    Router,
+    RuleRouter,
+    TieredRouter,
+    load_labeled_examples,
+)
+from agents.utils.search_compaction import SearchCompactor
+from agents.utils.settings import model_config
+from agents.utils.state import windowed_messages_reducer
+from agents.utils.streaming import NodeStream, astream_model, stream_model
+from agents.utils.summarization import ConversationSummarizer
+from agents.utils.tokens import (
+    MessageTokenCounter,
+    get_token_counter,
+    trim_messages_by_cached_tokens,
+)
+from agents.web_search_agent.env import get_settings
+from models.batching import MicroBatcher, runnable_batcher, structured_batcher
+from models.limits import rate_limits
 from models.openai.langchain import create_openai_model
+from models.registry import get_model_registry
 from models.schema import OpenAIModelConfig
 
-config = OpenAIModelConfig(
-    model_name=env.OPENAI_MODEL_NAME,
-    api_key=env.OPENAI_API_KEY,
-    base_url=env.OPENAI_BASE_URL,
-)
-model = create_openai_model(config)
-search_tool = TavilySearch(max_results=5)
+
+# Settings are read on the first model call, not when langgraph.json loads this module
+@cache
+def get_model_config() -> OpenAIModelConfig:
+    return model_config(get_settings())
+
+
+# Clients are built on first use rather than at import, so loading the graph module stays cheap.
+# The OpenAI integration is only imported by `get_model`, langchain_tavily only by `get_search_tool`.
+@cache
+def get_model() -> BaseChatModel:
+    return create_openai_model(get_model_config())
+
+
+@cache
+def get_search_tool() -> BaseTool:
+    from agents.utils.search_cache import (
+        CachedTavilySearch,
+        MemorySearchCacheBackend,
+        SearchResultCache,
+        SQLiteSearchCacheBackend,
+    )
+
+    env = get_settings()
+    limits = rate_limits(env.TAVILY_RPM, max_concurrency=env.TAVILY_MAX_CONCURRENCY)
+    return CachedTavilySearch(
+        compactor=get_search_compactor(),
+        max_results=5,
+        tavily_api_key=env.TAVILY_API_KEY,
+        api_base_url=env.TAVILY_API_BASE_URL,
+        limiter=get_model_registry().limiter(
+            env.TAVILY_API_BASE_URL or "https://api.tavily.com", limits
+        )
+        if limits
+        else None,
+        cache=SearchResultCache(
+            backend=SQLiteSearchCacheBackend(env.SEARCH_CACHE_PATH)
+            if env.SEARCH_CACHE_PATH
+            else MemorySearchCacheBackend(),
+            ttl_seconds=env.SEARCH_CACHE_TTL_SECONDS,
+        ),
+    )
+
+
+# Search results are compacted to a token budget before they reach the model
+@cache
+def get_search_compactor() -> Optional[SearchCompactor]:
+    env = get_settings()
+    if env.SEARCH_RESULT_MAX_TOKENS is None:
+        return None
+    return SearchCompactor(
+        max_tokens=env.SEARCH_RESULT_MAX_TOKENS,
+        embeddings=_create_embeddings(env.SEARCH_RERANK_EMBEDDING_MODEL)
+        if env.SEARCH_RERANK_EMBEDDING_MODEL
+        else None,
+    )
+
+
+def _create_embeddings(model_name: str):
+    from langchain_openai import OpenAIEmbeddings
+
+    env = get_settings()
+    # Embedding requests share the chat model's endpoints, rate limits and connection pool
+    http_client, http_async_client = get_model_registry().http_clients(
+        get_model_config()
+    )
+    return OpenAIEmbeddings(
+        model=model_name,
+        api_key=env.OPENAI_API_KEY,
+        base_url=env.OPENAI_BASE_URL,
+        http_client=http_client,
+        http_async_client=http_async_client,
+    )
+
+
+# Cached intents are reused without a classification LLM call
+@cache
+def get_intent_cache() -> ClassificationCache[str]:
+    env = get_settings()
+    return ClassificationCache(
+        max_entries=env.INTENT_CACHE_MAX_ENTRIES,
+        ttl_seconds=env.INTENT_CACHE_TTL_SECONDS,
+        name="intent",
+        embeddings=_create_embeddings(env.INTENT_CACHE_EMBEDDING_MODEL)
+        if env.INTENT_CACHE_EMBEDDING_MODEL
+        else None,
+    )
+
+
+# Obvious intents are decided locally without a classification LLM call
+@cache
+def get_intent_router() -> TieredRouter:
+    env = get_settings()
+    tiers: list[Router] = [RuleRouter()]
+    if env.INTENT_ROUTER_EXAMPLES_PATH and env.INTENT_ROUTER_EMBEDDING_MODEL:
+        tiers.append(
+            EmbeddingCentroidRouter(
+                LocalEmbeddings(env.INTENT_ROUTER_EMBEDDING_MODEL)
+            ).fit(load_labeled_examples(env.INTENT_ROUTER_EXAMPLES_PATH))
+        )
+    return TieredRouter(tiers, threshold=env.INTENT_ROUTER_THRESHOLD)
+
+
+# The token counter and the window size are settings too, resolved on the first turn
+@cache
+def get_message_token_counter() -> MessageTokenCounter:
+    return get_token_counter(get_settings().TOKEN_COUNTER)
+
+
+def token_counter(message: BaseMessage) -> int:
+    """Count with the TOKEN_COUNTER counter, which is only resolved on the first count"""
+    return get_message_token_counter()(message)
+
+
+@cache
+def get_messages_reducer():
+    return windowed_messages_reducer(
+        max_messages=get_settings().MAX_WINDOW_MESSAGES, counter=token_counter
+    )
+
+
+def windowed_messages(left: Messages, right: Messages) -> list[AnyMessage]:
+    return get_messages_reducer()(left, right)
 
 
 class MessagesState(TypedDict):
-    messages: Annotated[list[AnyMessage], operator.add]
+    # Bounded window of recent messages, each message's token count is computed once when it is appended
+    messages: Annotated[list[AnyMessage], windowed_messages]
     intent: str
     search_query: str
+    # Speculative mode only: whether the local routers and the intent cache abstained this turn,
+    # so that classification and rewriting run concurrently, and the seconds spent in each node
+    speculating: bool
+    node_timings: Annotated[dict[str, float], lambda a, b: {**a, **b}]
+
+
+# Older messages of a thread are summarized between turns, see `ConversationSummarizer`
+@cache
+def get_summarizer() -> Optional[ConversationSummarizer]:
+    env = get_settings()
+    if not env.SUMMARIZATION:
+        return None
+    return ConversationSummarizer(
+        get_model,
+        name="web_search",
+        trigger_tokens=env.SUMMARY_TRIGGER_TOKENS,
+        keep_tokens=env.SUMMARY_KEEP_TOKENS,
+        counter=token_counter,
+    )
+
+
+def _schedule_summary(state: MessagesState, answer: AnyMessage) -> None:
+    if (summarizer := get_summarizer()) is not None:
+        summarizer.schedule([*state["messages"], answer])
 
 
 class IntentClassification(BaseModel):
@@ -36,22 +214,45 @@ class IntentClassification(BaseModel):
     )
 
 
-def intent_classification_node(state: MessagesState):
-    """Classify the user's intent"""
-    # Use a structured output model to classify intent, to make sure the output is constrained.
-    structured_model = model.with_structured_output(IntentClassification)
-    system_prompt = """
+INTENT_SYSTEM_PROMPT = """
     You are an intent classification model. Classify the user's intent based on the message.
 
     If the user is asking a question that requires latest information, return "web_search".
     Else return "chat".
     """
 
-    for msg in state["messages"]:
-        print(msg)
+REWRITE_SYSTEM_PROMPT = """
+    You are a query rewriting model. Rewrite the user's query to be more suitable for web search.
+    Focus on keywords and important phrases.
 
+    <Rules>
+    - Don't use quotation marks.
+    - If the date is mentioned in the user query, make sure to include it in the rewritten query. And use the format YYYY-MM-DD.
+    <Rules>
+    """
+
+# The date changes daily, it goes after the conversation so the prompt prefix stays cacheable
+REWRITE_TAIL_PROMPT = "The current date is {date}."
+
+WEB_SEARCH_SYSTEM_PROMPT = (
+    "You are a helpful assistant that uses web search to answer user queries."
+)
+
+INTENT_PROMPT = Prompt(
+    "intent_classification", INTENT_SYSTEM_PROMPT, counter=token_counter
+)
+REWRITE_PROMPT = Prompt(
+    "rewrite_query",
+    REWRITE_SYSTEM_PROMPT,
+    tail=REWRITE_TAIL_PROMPT,
+    counter=token_counter,
+)
+CHAT_PROMPT = Prompt("chat", counter=token_counter)
+
+
+def _intent_classification_window(state: MessagesState) -> list[AnyMessage]:
     # Only use the last 5 messages for intent classification
-    user_messages = [
+    return [
         msg
         for msg in state["messages"]
         if isinstance(msg, AIMessage)
@@ -60,63 +261,266 @@ def intent_classification_node(state: MessagesState):
         or (isinstance(msg, dict) and msg["type"] == "ai")
     ][-5:]
 
-    decision = structured_model.invoke(
-        [
-            SystemMessage(content=system_prompt),
-        ]
-        + user_messages
-    )
 
-    return {
-        "intent": decision.intent,
-    }
+def _last_human_text(messages: list[AnyMessage]) -> str:
+    for msg in reversed(messages):
+        if isinstance(msg, dict) and msg["type"] == "human":
+            return msg["content"]
+        if isinstance(msg, HumanMessage):
+            return msg.text
+    return ""
 
 
-def chat_node(state: MessagesState):
-    """Handle general chat messages"""
-
+def _chat_messages(state: MessagesState) -> list[AnyMessage]:
+    summary, messages = None, state["messages"]
+    if (summarizer := get_summarizer()) is not None:
+        summary, messages = summarizer.context(messages)
     # Trim messages to fit within model context window
-    trimmed_messages = trim_messages(
-        state["messages"],
-        strategy="last",
+    messages = trim_messages_by_cached_tokens(
+        messages,
         max_tokens=5000,
-        token_counter=count_tokens_approximately,
+        counter=token_counter,
         start_on="human",
         end_on=("human", "tool"),
     )
+    return CHAT_PROMPT.format([summary, *messages] if summary else messages)
+
+
+def _rewrite_query_messages(state: MessagesState) -> list[AnyMessage]:
+    user_messages = [
+        msg
+        for msg in state["messages"]
+        if isinstance(msg, HumanMessage)
+        or (isinstance(msg, dict) and msg["type"] == "human")
+    ][-5:]
+
+    return REWRITE_PROMPT.format(user_messages, date=datetime.now().date())
+
+
+@cache
+def get_intent_classifier():
+    # Use a structured output model to classify intent, to make sure the output is constrained.
+    # `include_raw` keeps the model's message, so its token usage can be recorded.
+    return get_model().with_structured_output(IntentClassification, include_raw=True)
+
+
+def _batch_options() -> dict:
+    env = get_settings()
+    return {
+        "max_batch_size": env.BATCH_MAX_SIZE,
+        "max_wait": env.BATCH_MAX_WAIT_MS / 1000,
+        "max_concurrency": env.BATCH_MAX_CONCURRENCY,
+    }
+
+
+@cache
+def get_intent_batcher() -> Optional[MicroBatcher]:
+    """Batcher for the classification requests of concurrent sessions, None when batching is off"""
+    env = get_settings()
+    if not env.BATCH_MODE:
+        return None
+    if env.BATCH_MODE == "prompt":
+        return structured_batcher(
+            get_model(),
+            IntentClassification,
+            INTENT_PROMPT.system_message.text,
+            **_batch_options(),
+        )
+    if env.BATCH_MODE == "abatch":
+        return runnable_batcher(
+            RunnableLambda(INTENT_PROMPT.format) | get_intent_classifier(),
+            **_batch_options(),
+        )
+    raise ValueError(f"Unknown batch mode: {env.BATCH_MODE}")
+
+
+@cache
+def get_rewrite_batcher() -> Optional[MicroBatcher]:
+    """
+    Batcher for the rewrite requests of concurrent sessions, None when batching is off.
+    Rewrites are free text, so both batch modes send them through `abatch`.
+    """
+    env = get_settings()
+    if not env.BATCH_MODE:
+        return None
+    return runnable_batcher(get_model(), **_batch_options())
+
+
+def _classify(user_messages: list[AnyMessage]) -> dict:
+    if (batcher := get_intent_batcher()) is not None:
+        return batcher.submit(user_messages)
+    return get_intent_classifier().invoke(INTENT_PROMPT.format(user_messages))
+
+
+async def _aclassify(user_messages: list[AnyMessage]) -> dict:
+    if (batcher := get_intent_batcher()) is not None:
+        return await batcher.asubmit(user_messages)
+    return await get_intent_classifier().ainvoke(INTENT_PROMPT.format(user_messages))
+
 
+def _rewrite(messages: list[AnyMessage]) -> AIMessage:
+    if (batcher := get_rewrite_batcher()) is not None:
+        return batcher.submit(messages)
+    return get_model().invoke(messages)
+
+
+async def _arewrite(messages: list[AnyMessage]) -> AIMessage:
+    if (batcher := get_rewrite_batcher()) is not None:
+        return await batcher.asubmit(messages)
+    return await get_model().ainvoke(messages)
+
+
+def _parse_intent(result: dict) -> IntentClassification:
+    INTENT_PROMPT.record(result["raw"])
+    if result["parsing_error"] is not None:
+        raise result["parsing_error"]
+    return result["parsed"]
+
+
+_web_search_agents: dict[tuple, tuple] = {}
+_web_search_agents_lock = threading.Lock()
+
+
+def get_web_search_agent(
+    agent_model: Optional[BaseChatModel] = None,
+    tools: Optional[tuple[BaseTool, ...]] = None,
+    system_prompt: str = WEB_SEARCH_SYSTEM_PROMPT,
+):
+    """
+    Return the compiled inner web search agent, building it on first use.
+    Agents are memoized by model, tools and prompt, so turns reuse the compiled graph.
+    It is invoked from inside `web_search_agent_node`, which makes it a subgraph of the
+    web search graph: its steps show up with `stream(..., subgraphs=True)` and in checkpoints.
+    The model and tools default to `get_model()` and `get_search_tool()`.
+    """
+    agent_model = agent_model or get_model()
+    tools = tools or (get_search_tool(),)
+    # Entries keep a reference to the model and tools, so their ids can't be reused while cached
+    key = (id(agent_model), tuple(id(t) for t in tools), system_prompt)
+    with _web_search_agents_lock:
+        if key not in _web_search_agents:
+            from langchain.agents import create_agent
+
+            _web_search_agents[key] = (
+                agent_model,
+                tools,
+                create_agent(
+                    model=agent_model,
+                    tools=list(tools),
+                    system_prompt=system_prompt,
+                    name="web_search_agent",
+                ),
+            )
+        return _web_search_agents[key][2]
+
+
+def _local_intent(user_messages: list[AnyMessage]) -> Optional[str]:
+    """The intent the local routers or the intent cache decide, None when both abstain"""
+    decision = get_intent_router().route(_last_human_text(user_messages))
+    if decision is not None:
+        return decision.intent
+    return get_intent_cache().get(user_messages)
+
+
+async def _alocal_intent(user_messages: list[AnyMessage]) -> Optional[str]:
+    decision = await get_intent_router().aroute(_last_human_text(user_messages))
+    if decision is not None:
+        return decision.intent
+    return await get_intent_cache().aget(user_messages)
+
+
+def _model_intent(user_messages: list[AnyMessage]) -> str:
+    decision = _parse_intent(_classify(user_messages))
+    get_intent_cache().put(user_messages, decision.intent)
+    return decision.intent
+
+
+async def _amodel_intent(user_messages: list[AnyMessage]) -> str:
+    decision = _parse_intent(await _aclassify(user_messages))
+    await get_intent_cache().aput(user_messages, decision.intent)
+    return decision.intent
+
+
+def intent_classification_node(state: MessagesState):
+    """Classify the user's intent"""
+    user_messages = _intent_classification_window(state)
+    if (intent := _local_intent(user_messages)) is not None:
+        return {"intent": intent}
+
+    return {
+        "intent": _model_intent(user_messages),
+    }
+
+
+async def aintent_classification_node(state: MessagesState):
+    """Classify the user's intent without blocking the event loop"""
+    user_messages = _intent_classification_window(state)
+    if (intent := await _alocal_intent(user_messages)) is not None:
+        return {"intent": intent}
+
+    return {
+        "intent": await _amodel_intent(user_messages),
+    }
+
+
+def intent_router_node(state: MessagesState):
+    """Decide the intent locally if possible, speculate only when the local tiers abstain"""
+    return _routed(_local_intent(_intent_classification_window(state)))
+
+
+async def aintent_router_node(state: MessagesState):
+    """Decide the intent locally without blocking the event loop"""
+    return _routed(await _alocal_intent(_intent_classification_window(state)))
+
+
+def _routed(intent: Optional[str]) -> dict:
+    if intent is None:
+        return {"intent": "", "speculating": True}
+    speculation_stats.record_routed()
+    return {"intent": intent, "speculating": False}
+
+
+def speculative_intent_classification_node(state: MessagesState):
+    """Classify the user's intent with the model, the local tiers already abstained"""
+    return {"intent": _model_intent(_intent_classification_window(state))}
+
+
+async def aspeculative_intent_classification_node(state: MessagesState):
+    """Classify the user's intent with the model without blocking the event loop"""
+    return {"intent": await _amodel_intent(_intent_classification_window(state))}
+
+
+def chat_node(state: MessagesState):
+    """Handle general chat messages, streaming the answer token by token"""
+    message = stream_model(get_model(), _chat_messages(state), node="chat_node")
+    _schedule_summary(state, message)
+    return {
+        "messages": [CHAT_PROMPT.record(message)],
+    }
+
+
+async def achat_node(state: MessagesState):
+    """Handle general chat messages without blocking the event loop"""
+    message = await astream_model(get_model(), _chat_messages(state), node="chat_node")
+    _schedule_summary(state, message)
     return {
-        "messages": [model.invoke(trimmed_messages)],
+        "messages": [CHAT_PROMPT.record(message)],
     }
 
 
 def rewrite_query_node(state: MessagesState):
     """Rewrite the user query for web search"""
-    system_prompt = """
-    You are a query rewriting model. Rewrite the user's query to be more suitable for web search.
-    Focus on keywords and important phrases.
+    rewrite_query = REWRITE_PROMPT.record(_rewrite(_rewrite_query_messages(state)))
 
-    The current date is {datetime_now}. 
+    return {
+        "search_query": rewrite_query.content,
+    }
 
-    <Rules>
-    - Don't use quotation marks.
-    - If the date is mentioned in the user query, make sure to include it in the rewritten query. And use the format YYYY-MM-DD.
-    <Rules>
-    """
 
-    user_messages = [
-        msg
-        for msg in state["messages"]
-        if isinstance(msg, HumanMessage)
-        or (isinstance(msg, dict) and msg["type"] == "human")
-    ][-5:]
-    rewrite_query = model.invoke(
-        [
-            SystemMessage(
-                content=system_prompt.format(datetime_now=datetime.now().date())
-            ),
-        ]
-        + user_messages
+async def arewrite_query_node(state: MessagesState):
+    """Rewrite the user query for web search without blocking the event loop"""
+    rewrite_query = REWRITE_PROMPT.record(
+        await _arewrite(_rewrite_query_messages(state))
     )
 
     return {
@@ -126,52 +530,266 @@ def rewrite_query_node(state: MessagesState):
 
 def web_search_node(state: MessagesState):
     """Handle web search messages"""
-    results = search_tool.run(state["seach_query"])
+    # The search tool compacts the results against the rewritten query
+    results = get_search_tool().run(state["search_query"])
     search_results = "\n\n".join(
-        [f"[{r['title']}] {r['content']}" for r in results["results"]]
+        [f"[{r['title']}] {r['content']}" for r in results.get("results", [])]
     )
     content = (
-        f"Web Search Results for query '{state['seach_query']}':\n\n{search_results}"
+        f"Web Search Results for query '{state['search_query']}':\n\n{search_results}"
     )
     return {"messages": [AIMessage(content=content)]}
 
 
+def _forward_web_search_agent_event(stream: NodeStream, mode: str, data) -> list:
+    """Forward one event of the inner agent's stream, return the messages of node updates"""
+    if mode == "messages":
+        message, _ = data
+        if isinstance(message, AIMessageChunk):
+            stream.on_chunk(message)
+        return []
+
+    messages = []
+    for update in data.values():
+        for message in (update or {}).get("messages", []):
+            if isinstance(message, AIMessage) and message.tool_calls:
+                stream.on_tool_call(message)
+            elif isinstance(message, ToolMessage):
+                stream.on_tool_result(message)
+            messages.append(message)
+    return messages
+
+
+NO_ANSWER = "Sorry, the web search didn't return an answer. Please try again."
+
+
+def _web_search_agent_answer(state: MessagesState, messages: list) -> dict:
+    """The inner agent's last message, a fallback answer when it ended without any"""
+    if not messages:
+        return {"messages": [AIMessage(content=NO_ANSWER)]}
+    _schedule_summary(state, messages[-1])
+    return {"messages": messages[-1:]}
+
+
 def web_search_agent_node(state: MessagesState):
-    """Handle web search messages"""
-    agent = create_agent(
-        model=model,
-        tools=[search_tool],
-        system_prompt="You are a helpful assistant that uses web search to answer user queries.",
+    """Handle web search messages, streaming tool calls and the answer"""
+    agent = get_web_search_agent()
+    stream = NodeStream("web_search_agent_node")
+
+    messages = []
+    for mode, data in agent.stream(
+        {"messages": [HumanMessage(content=state["search_query"])]},
+        stream_mode=["messages", "updates"],
+    ):
+        messages += _forward_web_search_agent_event(stream, mode, data)
+    stream.finish()
+
+    return _web_search_agent_answer(state, messages)
+
+
+async def aweb_search_agent_node(state: MessagesState):
+    """Handle web search messages without blocking the event loop"""
+    agent = get_web_search_agent()
+    stream = NodeStream("web_search_agent_node")
+
+    # The inner agent runs the search tool through `arun`, so the search is async as well.
+    messages = []
+    async for mode, data in agent.astream(
+        {"messages": [HumanMessage(content=state["search_query"])]},
+        stream_mode=["messages", "updates"],
+    ):
+        messages += _forward_web_search_agent_event(stream, mode, data)
+    stream.finish()
+
+    return _web_search_agent_answer(state, messages)
+
+
+@dataclass
+class SpeculationStats:
+    """
+    Cost and benefit of speculative query rewriting, accumulated for the process.
+    Turns the local routers or the intent cache decide don't speculate. Of the others, every chat turn wastes one
+    rewrite call and waits at the join for the rewrite to finish when it is slower than the
+    classification, every search turn saves the shorter of the two LLM round trips.
+    """
+
+    routed_turns: int = 0
+    search_turns: int = 0
+    chat_turns: int = 0
+    wasted_rewrite_seconds: float = 0.0
+    # Latency the join adds to chat turns, waiting for a rewrite that is then dropped
+    chat_join_wait_seconds: float = 0.0
+    saved_seconds: float = 0.0
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    @property
+    def wasted_rewrites(self) -> int:
+        return self.chat_turns
+
+    def record_routed(self):
+        with self._lock:
+            self.routed_turns += 1
+
+    def record(
+        self, intent: str, classification_seconds: float, rewrite_seconds: float
+    ):
+        with self._lock:
+            if intent == "chat":
+                self.chat_turns += 1
+                self.wasted_rewrite_seconds += rewrite_seconds
+                self.chat_join_wait_seconds += max(
+                    0.0, rewrite_seconds - classification_seconds
+                )
+            else:
+                self.search_turns += 1
+                self.saved_seconds += min(classification_seconds, rewrite_seconds)
+
+
+speculation_stats = SpeculationStats()
+
+
+def _timed_node(name: str, func, afunc) -> RunnableLambda:
+    """Wrap a node so that its duration is recorded in `node_timings`"""
+
+    def timed(state: MessagesState):
+        start = time.perf_counter()
+        update = func(state)
+        return {**update, "node_timings": {name: time.perf_counter() - start}}
+
+    async def atimed(state: MessagesState):
+        start = time.perf_counter()
+        update = await afunc(state)
+        return {**update, "node_timings": {name: time.perf_counter() - start}}
+
+    return RunnableLambda(timed, afunc=atimed, name=name)
+
+
+def speculation_join_node(state: MessagesState):
+    """Keep the speculatively rewritten query for web search turns, discard it for chat turns"""
+    timings = state.get("node_timings", {})
+    speculation_stats.record(
+        state["intent"],
+        timings.get("intent_classification", 0.0),
+        timings.get("rewrite_query_node", 0.0),
     )
+    if state["intent"] == "chat":
+        return {"search_query": ""}
+    return {}
 
-    response = agent.invoke({"messages": [HumanMessage(content=state["search_query"])]})
-    print(response)
 
-    return {"messages": response["messages"][-1:]}
+def _route_or_speculate(state: MessagesState):
+    if state["speculating"]:
+        return ["intent_classification", "rewrite_query_node"]
+    return "chat_node" if state["intent"] == "chat" else "rewrite_query_node"
 
 
-# Build workflow
-agent_builder = StateGraph(MessagesState)
+def build_graph(
+    speculative: bool = False, checkpointer: Optional[BaseCheckpointSaver] = None
+):
+    """
+    Build and compile the web search graph.
+    With `speculative=True`, the local routers and the intent cache decide the intent first.
+    When they abstain, LLM intent classification and query rewriting run concurrently, and a join
+    step drops the rewritten query when the intent turns out to be chat. This trades one wasted
+    rewrite call per such chat turn for one less LLM round trip per such search turn, see
+    `speculation_stats`.
+    """
+    agent_builder = StateGraph(MessagesState)
 
-# Add nodes
-agent_builder.add_node("intent_classification", intent_classification_node)
-agent_builder.add_node("chat_node", chat_node)
-agent_builder.add_node("rewrite_query_node", rewrite_query_node)
-agent_builder.add_node("web_search_agent_node", web_search_agent_node)
+    # Add nodes, each with a sync and an async implementation so that `agent.ainvoke`/`astream` never block the event loop
+    classification = RunnableLambda(
+        intent_classification_node, afunc=aintent_classification_node
+    )
+    rewrite = RunnableLambda(rewrite_query_node, afunc=arewrite_query_node)
+    if speculative:
+        classification = _timed_node(
+            "intent_classification",
+            speculative_intent_classification_node,
+            aspeculative_intent_classification_node,
+        )
+        rewrite = _timed_node(
+            "rewrite_query_node", rewrite_query_node, arewrite_query_node
+        )
+    agent_builder.add_node("intent_classification", classification)
+    agent_builder.add_node("chat_node", RunnableLambda(chat_node, afunc=achat_node))
+    agent_builder.add_node("rewrite_query_node", rewrite)
+    agent_builder.add_node(
+        "web_search_agent_node",
+        RunnableLambda(web_search_agent_node, afunc=aweb_search_agent_node),
+    )
+
+    # Add edges to connect nodes
+    if speculative:
+        agent_builder.add_node(
+            "intent_router",
+            RunnableLambda(intent_router_node, afunc=aintent_router_node),
+        )
+        agent_builder.add_node("speculation_join", speculation_join_node)
+        agent_builder.add_edge(START, "intent_router")
+        agent_builder.add_conditional_edges(
+            "intent_router",
+            _route_or_speculate,
+            ["intent_classification", "rewrite_query_node", "chat_node"],
+        )
+        # Both speculative branches run in the same step, so the join runs once after both
+        agent_builder.add_edge("intent_classification", "speculation_join")
+        agent_builder.add_conditional_edges(
+            "rewrite_query_node",
+            lambda state: (
+                "speculation_join" if state["speculating"] else "web_search_agent_node"
+            ),
+            ["speculation_join", "web_search_agent_node"],
+        )
+        agent_builder.add_conditional_edges(
+            "speculation_join",
+            lambda state: state["intent"],
+            {
+                "web_search": "web_search_agent_node",
+                "chat": "chat_node",
+            },
+        )
+    else:
+        agent_builder.add_edge(START, "intent_classification")
+        agent_builder.add_conditional_edges(
+            "intent_classification",
+            lambda state: state["intent"],
+            {
+                "web_search": "rewrite_query_node",
+                "chat": "chat_node",
+            },
+        )
+        agent_builder.add_edge("rewrite_query_node", "web_search_agent_node")
+    agent_builder.add_edge("chat_node", END)
+    agent_builder.add_edge("web_search_agent_node", END)
+
+    # Compile the inner agent with the graph rather than on the first search turn
+    get_web_search_agent()
+
+    return agent_builder.compile(checkpointer=checkpointer)
+
+
+@cache
+def _compiled_graph():
+    env = get_settings()
+    graph = build_graph(
+        speculative=env.SPECULATIVE_REWRITE,
+        checkpointer=create_checkpointer(
+            env.CHECKPOINTER, env.CHECKPOINT_PATH, env.CHECKPOINT_COMPRESSION
+        ),
+    )
+    return instrument(graph, env.OTEL_TRACING) if env.INSTRUMENTATION else graph
+
+
+def make_graph(config: Optional[RunnableConfig] = None):
+    """
+    Graph factory referenced by langgraph.json.
+    The server calls it per run, the graph is compiled on the first call and reused afterwards.
+    """
+    return _compiled_graph()
 
-# Add edges to connect nodes
-agent_builder.add_edge(START, "intent_classification")
-agent_builder.add_conditional_edges(
-    "intent_classification",
-    lambda state: state["intent"],
-    {
-        "web_search": "rewrite_query_node",
-        "chat": "chat_node",
-    },
-)
-agent_builder.add_edge("rewrite_query_node", "web_search_agent_node")
-agent_builder.add_edge("chat_node", END)
-agent_builder.add_edge("web_search_agent_node", END)
 
-# Compile the agent
-agent = agent_builder.compile()
+def __getattr__(name: str):
+    # `agent` is compiled on first access, so importing this module doesn't build any client
+    if name == "agent":
+        return make_graph()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,111 @@
+"""
+Element-wise arithmetic on 1k-element vectors with the scalar math tools, one tool call per pair,
+against the NumPy batch tools, one call per vector. Reports the tool calls, the tool node's
+wall-clock time and the tokens the model has to write (tool-call arguments) and read back (tool
+results) per operation. A tenth of the divisors are zero.
+
+Before timing, each batch tool is run through LangGraph's `ToolNode` and the demo's `ToolExecutor`
+and the resulting tool messages converted to OpenAI request messages. The check fails (exit code
+1) when a message content is not a single string holding the JSON result, e.g. null for a division
+by zero.
+
+    python -m benchmarks.batch_tools --size 1000
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+
+from langchain_core.messages import AIMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_openai.chat_models.base import _convert_message_to_dict
+from langgraph.graph import START, MessagesState, StateGraph
+from langgraph.prebuilt import ToolNode
+
+from agents.demo.langchain_agent import TOOL_EXECUTOR, TOOLS
+
+# Arguments and expected result of each batch tool
+EXPECTED = {
+    "batch_multiply": ({"a": [1, 2, 3], "b": 2}, [2.0, 4.0, 6.0]),
+    "batch_add": ({"a": [1, 2], "b": [0.5, 0.5]}, [1.5, 2.5]),
+    "batch_divide": ({"a": [1, 2, 3], "b": [1, 0, 2]}, [1.0, None, 1.5]),
+}
+
+
+def tool_call(i: int, name: str, args: dict) -> dict:
+    return {"name": name, "args": args, "id": f"call_{i}", "type": "tool_call"}
+
+
+def check_tool_messages() -> list[str]:
+    """Errors in the OpenAI tool messages of the batch tools, empty when they are well-formed."""
+    calls = [
+        tool_call(i, name, args) for i, (name, (args, _)) in enumerate(EXPECTED.items())
+    ]
+    # ToolNode needs a graph run to inject its runtime
+    graph = StateGraph(MessagesState)
+    graph.add_node("tools", ToolNode([t for t in TOOLS if t.name in EXPECTED]))
+    graph.add_edge(START, "tools")
+    state = graph.compile().invoke(
+        {"messages": [AIMessage(content="", tool_calls=calls)]}
+    )
+    runs = {
+        "ToolNode": state["messages"][1:],
+        "ToolExecutor": TOOL_EXECUTOR.execute(calls),
+    }
+    errors = []
+    for runner, messages in runs.items():
+        for message in messages:
+            content = _convert_message_to_dict(message)["content"]
+            expected = EXPECTED[message.name][1]
+            label = f"{runner} {message.name}"
+            if not isinstance(content, str):
+                errors.append(
+                    f"{label}: content is {type(content).__name__}, not a string"
+                )
+            elif json.loads(content) != expected:
+                errors.append(f"{label}: {content} instead of {json.dumps(expected)}")
+    return errors
+
+
+def run(name: str, calls: list[dict]) -> None:
+    start = time.perf_counter()
+    results = TOOL_EXECUTOR.execute(calls)
+    elapsed = (time.perf_counter() - start) * 1000
+    written = count_tokens_approximately([AIMessage(content="", tool_calls=calls)])
+    read = count_tokens_approximately(results)
+    errors = sum(result.status == "error" for result in results)
+    print(
+        f"{name:<16} tool_calls={len(calls):5d} tool_node={elapsed:8.1f}ms "
+        f"tokens_written={written:6d} tokens_read={read:6d} errors={errors}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=1000)
+    args = parser.parse_args()
+
+    errors = check_tool_messages()
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+    rng = random.Random(0)
+    a = [rng.randint(1, 100) for _ in range(args.size)]
+    b = [0 if rng.random() < 0.1 else rng.randint(1, 100) for _ in range(args.size)]
+
+    # Warm up the tool thread pool and the NumPy import
+    TOOL_EXECUTOR.execute([tool_call(0, "batch_add", {"a": [1], "b": [1]})])
+    for op in ("multiply", "add", "divide"):
+        run(
+            f"{op} scalar",
+            [tool_call(i, op, {"a": x, "b": y}) for i, (x, y) in enumerate(zip(a, b))],
+        )
+        run(f"{op} batch", [tool_call(0, f"batch_{op}", {"a": a, "b": b})])
+
+
+if __name__ == "__main__":
+    main()
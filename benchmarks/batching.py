@@ -0,0 +1,220 @@
+"""
+Throughput of intent classification for many concurrent sessions, one request per session versus
+micro-batched through `models.batching` ("abatch" and multi-item "prompt" batches),
+against a local mock OpenAI server. "abatch" still sends one request per session, with at most
+`--max-concurrency` in flight, so it caps the load on the provider rather than adding throughput:
+at most max_concurrency / latency sessions per second, printed as its ceiling.
+
+Then checks that `--max-concurrency` bounds the requests in flight across all batches, against a
+mock server that rejects requests beyond it with a 429: many small "abatch" batches at once, and
+"prompt" batches whose results have invalid ids and fall back to one call per item. Also checks
+that a batch function returning fewer results than items fails every caller rather than leaving
+some waiting forever. The check fails (exit code 1) otherwise.
+
+    python -m benchmarks.batching --sessions 200 --latency 0.2 --max-batch-size 16 --max-wait-ms 5
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from typing import Literal
+
+from langchain_core.messages import HumanMessage, SystemMessage
+from pydantic import BaseModel
+
+from benchmarks.mock_servers import MockOpenAIServer, running_in_process
+from benchmarks.rate_limits import server_stats
+from models.batching import MicroBatcher, runnable_batcher, structured_batcher
+from models.openai.langchain import create_openai_model
+from models.schema import OpenAIModelConfig
+
+SYSTEM_PROMPT = (
+    "Classify the user's intent: web_search for latest information, else chat."
+)
+
+
+class Intent(BaseModel):
+    intent: Literal["web_search", "chat"]
+
+
+def classify(text: str) -> dict:
+    return {"intent": "web_search" if "news" in text else "chat"}
+
+
+def batch_intent_responder(request: dict, valid_ids: bool = True) -> dict:
+    """
+    Answer single and multi-item classification prompts, one result per <request> block, in
+    reverse order so that results only line up when they are mapped by id.
+    """
+    text = request["messages"][-1]["content"]
+    schema = request["response_format"]["json_schema"]["schema"]
+    if "results" in schema.get("properties", {}):
+        blocks = re.findall(r"<request id=\"(\d+)\">(.*?)</request>", text, re.DOTALL)
+        content = {
+            "results": [
+                {"id": int(id) if valid_ids else 0, **classify(block)}
+                for id, block in reversed(blocks)
+            ]
+        }
+    else:
+        content = classify(text)
+    return {"role": "assistant", "content": json.dumps(content)}
+
+
+def invalid_ids_responder(request: dict) -> dict:
+    return batch_intent_responder(request, valid_ids=False)
+
+
+async def run(mode: str, model, sessions: list[list], args) -> None:
+    options = {
+        "max_batch_size": args.max_batch_size,
+        "max_wait": args.max_wait_ms / 1000,
+        "max_concurrency": args.max_concurrency,
+    }
+    classifier = model.with_structured_output(Intent, include_raw=True)
+    system = [SystemMessage(content=SYSTEM_PROMPT)]
+    batcher = None
+    if mode == "abatch":
+        batcher = runnable_batcher(classifier, **options)
+    elif mode == "prompt":
+        batcher = structured_batcher(model, Intent, SYSTEM_PROMPT, **options)
+
+    async def session(messages: list) -> str:
+        if batcher is None:
+            result = await classifier.ainvoke(system + messages)
+        elif mode == "abatch":
+            result = await batcher.asubmit(system + messages)
+        else:
+            result = await batcher.asubmit(messages)
+        return result["parsed"].intent
+
+    start = time.perf_counter()
+    intents = await asyncio.gather(*(session(m) for m in sessions))
+    wall = time.perf_counter() - start
+
+    expected = [classify(m[-1].content)["intent"] for m in sessions]
+    correct = sum(a == b for a, b in zip(intents, expected))
+    requests = batcher.stats.batches if mode == "prompt" else len(sessions)
+    batches = f" mean_batch={batcher.stats.mean_batch_size:.1f}" if batcher else ""
+    if mode == "abatch":
+        batches += f" ceiling={args.max_concurrency / args.latency:.0f}/s"
+    print(
+        f"{mode:<7} wall={wall:.2f}s throughput={len(sessions) / wall:6.1f} sessions/s "
+        f"requests={requests}{batches} correct={correct}/{len(sessions)}"
+    )
+
+
+async def main_async(args, base_url: str) -> None:
+    model = create_openai_model(
+        OpenAIModelConfig(model_name="mock", api_key="mock", base_url=base_url)
+    )
+    sessions = [
+        [HumanMessage(content=f"latest news {i}" if i % 2 else f"hello {i}")]
+        for i in range(args.sessions)
+    ]
+    # One event loop for all modes, the model registry's async connection pool is bound to it.
+    for mode in ("direct", "abatch", "prompt"):
+        await run(mode, model, sessions, args)
+
+
+async def check_shared_limit(args, base_url: str) -> list[str]:
+    """Run many small batches at once, return a message per mode that exceeded the limit."""
+    model = create_openai_model(
+        OpenAIModelConfig(model_name="mock", api_key="mock", base_url=base_url)
+    )
+    options = {
+        "max_batch_size": 4,
+        "max_wait": args.max_wait_ms / 1000,
+        "max_concurrency": args.max_concurrency,
+    }
+    system = [SystemMessage(content=SYSTEM_PROMPT)]
+    classifier = model.with_structured_output(Intent, include_raw=True)
+    batchers = {
+        "abatch": (runnable_batcher(classifier, **options), system),
+        "prompt": (structured_batcher(model, Intent, SYSTEM_PROMPT, **options), []),
+    }
+    server = base_url.removesuffix("/v1")
+    errors = []
+    for mode, (batcher, prefix) in batchers.items():
+        before = server_stats(server)
+        await asyncio.gather(
+            *(
+                batcher.asubmit(prefix + [HumanMessage(content=f"hello {i}")])
+                for i in range(args.sessions)
+            ),
+            return_exceptions=True,
+        )
+        after = server_stats(server)
+        throttled = after["throttled"] - before["throttled"]
+        print(
+            f"{mode:<7} limit check: batches={batcher.stats.batches} "
+            f"requests={after['requests'] - before['requests']} server_429s={throttled}"
+        )
+        if throttled:
+            errors.append(
+                f"{mode}: {throttled} requests beyond max_concurrency={args.max_concurrency}"
+            )
+    return errors
+
+
+async def check_missing_results() -> list[str]:
+    async def one_result(items: list) -> list:
+        return items[:1]
+
+    batcher = MicroBatcher(batch_fn=lambda items: items[:1], abatch_fn=one_result)
+    errors = []
+    try:
+        results = await asyncio.wait_for(
+            asyncio.gather(
+                *(batcher.asubmit(i) for i in range(3)), return_exceptions=True
+            ),
+            timeout=5,
+        )
+    except asyncio.TimeoutError:
+        return ["asubmit: callers without a result are still waiting"]
+    if not all(isinstance(r, ValueError) for r in results):
+        errors.append(f"asubmit: a short batch returned {results}")
+
+    loop = asyncio.get_running_loop()
+    futures = [loop.run_in_executor(None, batcher.submit, i) for i in range(3)]
+    done, pending = await asyncio.wait(futures, timeout=5)
+    if pending:
+        errors.append("submit: callers without a result are still waiting")
+    elif not all(isinstance(f.exception(), ValueError) for f in done):
+        errors.append("submit: a short batch didn't fail its callers")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    with running_in_process(
+        MockOpenAIServer, latency=args.latency, responder=batch_intent_responder
+    ) as openai_url:
+        asyncio.run(main_async(args, f"{openai_url}/v1"))
+
+    with running_in_process(
+        MockOpenAIServer,
+        latency=args.latency,
+        responder=invalid_ids_responder,
+        max_concurrency=args.max_concurrency,
+    ) as openai_url:
+        errors = asyncio.run(check_shared_limit(args, f"{openai_url}/v1"))
+    errors += asyncio.run(check_missing_results())
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Write amplification and per-turn latency of the SQLite checkpointer against LangGraph's InMemorySaver.
+Each turn appends a user message and two model-sized messages to one thread, like a chat turn of the
+web search graph. Write amplification is the number of bytes serialized by the checkpointer divided
+by the serialized size of the new messages.
+
+Then checks that the delta bases the SQLite checkpointer keeps in memory stay within
+`max_cached_values` when more threads take turns than fit, and that every thread still reads
+back its whole history, and that the async methods don't block the event loop while a commit
+in another thread holds the database. The checks fail with exit code 1 otherwise.
+
+    python -m benchmarks.checkpointer --turns 200 --message-size 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from typing import Any
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import END, START, StateGraph
+
+from agents.utils.checkpointer import SQLiteCheckpointSaver
+from agents.utils.state import WindowedMessagesState
+
+
+class CountingSerializer(JsonPlusSerializer):
+    """Count the bytes the in-memory saver serializes, it keeps no stats of its own."""
+
+    bytes_written = 0
+
+    def dumps_typed(self, obj: Any) -> tuple[str, bytes]:
+        typ, data = super().dumps_typed(obj)
+        self.bytes_written += len(data)
+        return typ, data
+
+
+WORDS = (
+    "the search results show that latest model release weather forecast price market "
+    "according to sources reported on today analysts expect growth in the region"
+).split()
+
+
+def text(size: int, rng: random.Random) -> str:
+    """Prose-like text, so that compression ratios are realistic"""
+    words = []
+    while sum(len(w) + 1 for w in words) < size:
+        words.append(rng.choice(WORDS) if rng.random() < 0.7 else str(rng.random()))
+    return " ".join(words)
+
+
+def build_graph(checkpointer, message_size: int):
+    rng = random.Random(0)
+
+    def classify(state):
+        return {"messages": [AIMessage(content=text(message_size // 10, rng))]}
+
+    def answer(state):
+        return {"messages": [AIMessage(content=text(message_size, rng))]}
+
+    builder = StateGraph(WindowedMessagesState)
+    builder.add_node("classify", classify)
+    builder.add_node("answer", answer)
+    builder.add_edge(START, "classify")
+    builder.add_edge("classify", "answer")
+    builder.add_edge("answer", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def run(name: str, checkpointer, bytes_written, args, path=None):
+    graph = build_graph(checkpointer, args.message_size)
+    config = {"configurable": {"thread_id": "benchmark"}}
+    serde = JsonPlusSerializer()
+    rng = random.Random(1)
+    latencies, payload = [], 0
+    for turn in range(args.turns):
+        message = HumanMessage(content=f"question {turn}: " + text(100, rng))
+        start = time.perf_counter()
+        state = graph.invoke({"messages": [message]}, config)
+        latencies.append((time.perf_counter() - start) * 1000)
+        payload += len(serde.dumps_typed(state["messages"][-3:])[1])
+
+    written = bytes_written()
+    on_disk = ""
+    if path:
+        checkpointer.close()
+        size = sum(
+            os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p)
+        )
+        on_disk = f" on_disk={size / 1e6:.1f}MB"
+    print(
+        f"{name:<22} p50={statistics.median(latencies):6.2f}ms "
+        f"p95={statistics.quantiles(latencies, n=20)[-1]:6.2f}ms "
+        f"written={written / 1e6:7.1f}MB amplification={written / payload:6.1f}x{on_disk}"
+    )
+
+
+def check_bounded_cache(threads: int = 16, max_cached_values: int = 4) -> list[str]:
+    saver = SQLiteCheckpointSaver(max_cached_values=max_cached_values)
+    graph = build_graph(saver, 200)
+    errors = []
+    for turn in range(3):
+        for thread in range(threads):
+            config = {"configurable": {"thread_id": f"thread-{thread}"}}
+            graph.invoke(
+                {"messages": [HumanMessage(content=f"question {turn}")]}, config
+            )
+            cached = len(saver._last_values)
+            if cached > max_cached_values:
+                errors.append(f"{cached} cached values, more than {max_cached_values}")
+    for thread in range(threads):
+        config = {"configurable": {"thread_id": f"thread-{thread}"}}
+        messages = graph.get_state(config).values["messages"]
+        if [m.content for m in messages if m.type == "human"] != [
+            f"question {turn}" for turn in range(3)
+        ]:
+            errors.append(f"thread-{thread} read back {len(messages)} messages")
+    print(
+        f"bounded cache: threads={threads} max_cached_values={max_cached_values} "
+        f"snapshots={saver.stats.snapshot_blobs} deltas={saver.stats.delta_blobs}"
+    )
+    return errors
+
+
+def check_event_loop(hold: float = 0.3, max_stall: float = 0.1) -> list[str]:
+    """The async methods wait for a commit in another thread off the event loop."""
+    saver = SQLiteCheckpointSaver()
+    graph = build_graph(saver, 200)
+    config = {"configurable": {"thread_id": "loop"}}
+    graph.invoke({"messages": [HumanMessage(content="question")]}, config)
+    config = saver.get_tuple(config).config
+
+    async def stall(call) -> float:
+        """Longest gap between ticks of the loop while `call` waits for the held lock."""
+        gaps, last = [], time.perf_counter()
+
+        async def tick():
+            nonlocal last
+            while True:
+                await asyncio.sleep(0.01)
+                gaps.append(time.perf_counter() - last)
+                last = time.perf_counter()
+
+        ticker = asyncio.create_task(tick())
+        held = threading.Event()
+
+        def commit():
+            with saver._lock:
+                held.set()
+                time.sleep(hold)
+
+        thread = threading.Thread(target=commit)
+        thread.start()
+        held.wait()
+        last = time.perf_counter()
+        await call()
+        ticker.cancel()
+        thread.join()
+        return max(gaps, default=time.perf_counter() - last)
+
+    calls = {
+        "aget_tuple": lambda: saver.aget_tuple(config),
+        "aput_writes": lambda: saver.aput_writes(config, [("messages", [])], "task"),
+    }
+    errors = []
+    for name, call in calls.items():
+        stalled = asyncio.run(stall(call))
+        print(f"event loop: {name} stalled the loop for {stalled * 1000:.0f}ms")
+        if stalled > max_stall:
+            errors.append(
+                f"{name} blocked the event loop for {stalled * 1000:.0f}ms "
+                f"waiting for a commit"
+            )
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--message-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    serde = CountingSerializer()
+    run("InMemorySaver", InMemorySaver(serde=serde), lambda: serde.bytes_written, args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        variants = {
+            "sqlite snapshots": {"delta_channels": ()},
+            "sqlite deltas": {},
+            "sqlite deltas+zstd": {"compress": True},
+        }
+        for name, kwargs in variants.items():
+            path = os.path.join(tmp, f"{name.replace(' ', '_')}.sqlite")
+            saver = SQLiteCheckpointSaver(path, **kwargs)
+            run(name, saver, lambda: saver.stats.bytes_written, args, path)
+
+    errors = check_bounded_cache() + check_event_loop()
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Tail latency of a model served by two OpenAI-compatible endpoints, each with injected slow
+requests, against a single endpoint: balanced without hedging, balanced with hedged requests,
+and failover when one endpoint fails every request.
+
+Then checks failover from an endpoint that throttles every request (429) when rate limits are
+configured: the limiter must hand the throttled response to the balancer rather than retry it on
+the same endpoint, so no request may take longer than `--max-throttled-ms`. The check fails with
+exit code 1 otherwise.
+
+    python -m benchmarks.endpoints --requests 400 --concurrency 16 --slow-fraction 0.03
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from contextlib import ExitStack
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.mock_servers import MockOpenAIServer, running_in_process
+from models.limits import rate_limits
+from models.openai.langchain import create_openai_model
+from models.registry import get_model_registry
+from models.schema import Endpoint, OpenAIModelConfig, RoutingConfig
+
+
+async def run(name: str, config: OpenAIModelConfig, args) -> list[float]:
+    model = create_openai_model(config)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    latencies, errors = [], 0
+
+    async def request(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                await model.ainvoke([HumanMessage(content=f"question {i}")])
+            except Exception:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(request(i) for i in range(args.requests)))
+    wall = time.perf_counter() - start
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{name:<10} p50={quantiles[49]:7.1f}ms p95={quantiles[94]:7.1f}ms "
+        f"p99={quantiles[98]:7.1f}ms throughput={args.requests / wall:6.1f}/s errors={errors}"
+    )
+    pool = get_model_registry().endpoint_pool(config)
+    if pool is not None:
+        for state in pool.states:
+            stats = state.stats
+            print(
+                f"{'':<10} {state.base_url}: requests={stats.requests} failures={stats.failures} "
+                f"hedges={stats.hedges} hedge_wins={stats.hedge_wins} breaker={state.state}"
+            )
+    return latencies
+
+
+async def main_async(
+    args, a: str, b: str, failing: str, throttling: str, healthy: str
+) -> list[str]:
+    def config(*urls: str, hedge: bool = True, limits=None) -> OpenAIModelConfig:
+        return OpenAIModelConfig(
+            model_name="mock",
+            api_key="mock",
+            base_url=urls[0],
+            endpoints=[Endpoint(base_url=url) for url in urls] if len(urls) > 1 else [],
+            routing=RoutingConfig(hedge=hedge),
+            limits=limits,
+        )
+
+    await run("single", config(a), args)
+    await run("balanced", config(a, b, hedge=False), args)
+    await run("hedged", config(a, b), args)
+    await run("failover", config(failing, b), args)
+    latencies = await run(
+        "throttled",
+        config(
+            throttling,
+            healthy,
+            hedge=False,
+            limits=rate_limits(max_concurrency=args.concurrency),
+        ),
+        args,
+    )
+    if max(latencies) > args.max_throttled_ms:
+        return [
+            f"a request took {max(latencies):.0f}ms with one endpoint throttling, "
+            f"more than {args.max_throttled_ms:.0f}ms"
+        ]
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--slow-fraction", type=float, default=0.03)
+    parser.add_argument("--slow-latency", type=float, default=1.0)
+    parser.add_argument("--max-throttled-ms", type=float, default=300)
+    args = parser.parse_args()
+
+    get_model_registry().clear()
+    with ExitStack() as stack:
+        a, b = (
+            stack.enter_context(
+                running_in_process(
+                    MockOpenAIServer,
+                    latency=args.latency,
+                    slow_fraction=args.slow_fraction,
+                    slow_latency=args.slow_latency,
+                )
+            )
+            for _ in range(2)
+        )
+        failing = stack.enter_context(
+            running_in_process(MockOpenAIServer, latency=args.latency, error_rate=1.0)
+        )
+        throttling, healthy = (
+            stack.enter_context(
+                running_in_process(MockOpenAIServer, latency=args.latency, **kwargs)
+            )
+            for kwargs in ({"error_rate": 1.0, "error_status": 429}, {})
+        )
+        # One event loop for all runs, the model registry's async connection pool is bound to it.
+        errors = asyncio.run(
+            main_async(
+                args,
+                *(f"{url}/v1" for url in (a, b, failing, throttling, healthy)),
+            )
+        )
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
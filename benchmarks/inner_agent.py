@@ -0,0 +1,74 @@
+"""
+Per-turn overhead of the inner web search agent with the model and search tool stubbed,
+building the agent on every turn versus reusing the memoized compiled agent.
+
+    python -m benchmarks.inner_agent --turns 200
+"""
+
+import argparse
+import os
+import statistics
+import time
+from itertools import cycle
+
+from langchain.agents import create_agent
+from langchain.messages import AIMessage, HumanMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.tools import tool
+
+
+class StubChatModel(GenericFakeChatModel):
+    """Fake chat model that accepts tools and always answers without calling them."""
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+@tool
+def stub_search(query: str) -> str:
+    """Search the web for `query`."""
+    return f"Results for {query}"
+
+
+def measure(get_agent, turns: int) -> list[float]:
+    latencies = []
+    for i in range(turns):
+        start = time.perf_counter()
+        get_agent().invoke({"messages": [HumanMessage(content=f"query {i}")]})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    args = parser.parse_args()
+
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    os.environ.setdefault("TAVILY_API_KEY", "mock")
+    from agents.web_search_agent.langchain_agent import (
+        WEB_SEARCH_SYSTEM_PROMPT,
+        get_web_search_agent,
+    )
+
+    model = StubChatModel(messages=cycle([AIMessage(content="stub answer")]))
+    tools = (stub_search,)
+
+    def rebuild():
+        return create_agent(
+            model=model, tools=list(tools), system_prompt=WEB_SEARCH_SYSTEM_PROMPT
+        )
+
+    def memoized():
+        return get_web_search_agent(model, tools, WEB_SEARCH_SYSTEM_PROMPT)
+
+    for name, get_agent in (("rebuild", rebuild), ("memoized", memoized)):
+        latencies = measure(get_agent, args.turns)
+        print(
+            f"{name:>8}: mean={statistics.mean(latencies):.2f}ms "
+            f"p50={statistics.median(latencies):.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Overhead of `GraphInstrumentation`: the handler's own cost per callback event, replaying the events
+of a graph run (nodes with a nested runnable, a model call and a tool call each), and the end-to-end
+cost per turn of the demo graph against a local mock OpenAI server with instrumentation on and off.
+The check fails (exit code 1) when the handler takes longer per event than the budget.
+
+    python -m benchmarks.instrumentation --budget-us 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from agents.demo import langchain_agent
+from agents.demo.env import get_settings
+from agents.utils.instrumentation import (
+    GraphInstrumentation,
+    node_duration,
+    node_queue_time,
+)
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    agent_responder,
+    running_in_process,
+)
+
+RESULT = LLMResult(
+    generations=[
+        [
+            ChatGeneration(
+                message=AIMessage(
+                    content="answer",
+                    usage_metadata={
+                        "input_tokens": 500,
+                        "output_tokens": 20,
+                        "total_tokens": 520,
+                    },
+                )
+            )
+        ]
+    ]
+)
+
+
+def replay_run(handler: GraphInstrumentation, nodes: int) -> int:
+    """Send the callback events of one graph run to `handler`, return the number of events."""
+    graph = uuid.uuid4()
+    handler.on_chain_start({}, {}, run_id=graph, name="LangGraph")
+    events = 1
+    for step in range(1, nodes + 1):
+        node, inner, llm, tool = (uuid.uuid4() for _ in range(4))
+        metadata = {"langgraph_checkpoint_ns": f"node_{step}:{node}"}
+        handler.on_chain_start(
+            {},
+            {},
+            run_id=node,
+            parent_run_id=graph,
+            tags=[f"graph:step:{step}"],
+            metadata=metadata,
+            name=f"node_{step}",
+        )
+        handler.on_chain_start(
+            {},
+            {},
+            run_id=inner,
+            parent_run_id=node,
+            tags=["seq:step:1"],
+            metadata=metadata,
+        )
+        handler.on_chat_model_start(
+            {}, [], run_id=llm, parent_run_id=inner, metadata=metadata
+        )
+        handler.on_llm_end(RESULT, run_id=llm)
+        handler.on_chain_end({}, run_id=inner)
+        handler.on_tool_start(
+            {"name": "multiply"}, "", run_id=tool, parent_run_id=node, metadata=metadata
+        )
+        handler.on_tool_end("", run_id=tool)
+        handler.on_chain_end({}, run_id=node)
+        events += 8
+    handler.on_chain_end({}, run_id=graph)
+    return events + 1
+
+
+def handler_overhead(runs: int) -> float:
+    """Microseconds the handler spends per event."""
+    handler = GraphInstrumentation()
+    replay_run(handler, 4)
+    start = time.perf_counter()
+    events = sum(replay_run(handler, 4) for _ in range(runs))
+    return (time.perf_counter() - start) / events * 1e6
+
+
+def turn_latency(prompts: int, instrumented: bool) -> float:
+    """Median milliseconds per turn of the demo graph."""
+    os.environ["INSTRUMENTATION"] = str(instrumented).lower()
+    get_settings.cache_clear()
+    langchain_agent.build_graph.cache_clear()
+    graph = langchain_agent.make_graph()
+    latencies = []
+    for i in range(prompts):
+        start = time.perf_counter()
+        graph.invoke({"messages": [HumanMessage(content=f"Multiply {i} and 2")]})
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=2000)
+    parser.add_argument("--prompts", type=int, default=200)
+    parser.add_argument("--budget-us", type=float, default=20)
+    args = parser.parse_args()
+
+    per_event = handler_overhead(args.runs)
+    print(f"handler: {per_event:.1f}us per event (budget {args.budget_us:.0f}us)")
+
+    with running_in_process(MockOpenAIServer, responder=agent_responder) as url:
+        os.environ.update(OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{url}/v1")
+        # Warm up connections and the model registry
+        turn_latency(5, instrumented=False)
+        off = turn_latency(args.prompts, instrumented=False)
+        on = turn_latency(args.prompts, instrumented=True)
+    print(f"demo turn p50: {off:.2f}ms without, {on:.2f}ms with instrumentation")
+    for node in ("llm_call", "tool_node"):
+        print(
+            f"  {node}: runs={node_duration.count(node=node, status='ok')} "
+            f"wall={node_duration.mean(node=node, status='ok') * 1000:.2f}ms "
+            f"queue={node_queue_time.mean(node=node) * 1000:.2f}ms"
+        )
+
+    if per_event > args.budget_us:
+        print(f"FAIL: {per_event:.1f}us per event exceeds the budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
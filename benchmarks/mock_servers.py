@@ -0,0 +1,593 @@
+"""
+Local OpenAI-compatible and Tavily-compatible mock servers for benchmarks.
+Both servers speak HTTP/1.1 with keep-alive, so connection reuse behaves like it does against real providers.
+"""
+
+import ast
+import hashlib
+import json
+import multiprocessing
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Iterator, Optional
+
+Responder = Callable[[dict], dict]
+
+
+def schema_instance(schema: dict) -> Any:
+    """Build a minimal instance that validates against a JSON schema."""
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+    schema_type = schema.get("type")
+    if schema_type == "object":
+        properties = schema.get("properties", {})
+        return {
+            name: schema_instance(properties[name])
+            for name in schema.get("required", properties)
+        }
+    if schema_type == "array":
+        return []
+    if schema_type in ("integer", "number"):
+        return 0
+    if schema_type == "boolean":
+        return False
+    return "mock"
+
+
+def default_responder(request: dict) -> dict:
+    """Answer structured-output requests with a schema instance and everything else with plain text."""
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        schema = response_format["json_schema"]["schema"]
+        return {"role": "assistant", "content": json.dumps(schema_instance(schema))}
+    return {
+        "role": "assistant",
+        "content": "This is a mock response from the local server.",
+    }
+
+
+def agent_responder(request: dict) -> dict:
+    """
+    Behave like a tool-using agent: call the first available tool once, then answer.
+    Tool arguments are a schema instance of the tool's parameters.
+    """
+    tools = request.get("tools") or []
+    messages = request.get("messages") or []
+    if tools and messages and messages[-1].get("role") != "tool":
+        function = tools[0]["function"]
+        return {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {
+                        "name": function["name"],
+                        "arguments": json.dumps(
+                            schema_instance(function.get("parameters", {}))
+                        ),
+                    },
+                }
+            ],
+        }
+    return default_responder(request)
+
+
+ARITHMETIC_TOOLS = {ast.Add: "add", ast.Mult: "multiply", ast.Div: "divide"}
+
+
+def _arithmetic_steps(expression: str) -> list[dict]:
+    """Binary operations of `expression` in evaluation order, operands are numbers or step ids."""
+    steps = []
+
+    def visit(node: ast.AST) -> Any:
+        if isinstance(node, ast.Constant):
+            return node.value
+        args = {"a": visit(node.left), "b": visit(node.right)}
+        step_id = f"s{len(steps) + 1}"
+        steps.append(
+            {"id": step_id, "tool": ARITHMETIC_TOOLS[type(node.op)], "args": args}
+        )
+        return step_id
+
+    visit(ast.parse(expression, mode="eval").body)
+    return steps
+
+
+def _tool_call(call_id: str, name: str, args: dict) -> dict:
+    return {
+        "id": call_id,
+        "type": "function",
+        "function": {"name": name, "arguments": json.dumps(args)},
+    }
+
+
+def arithmetic_responder(request: dict) -> dict:
+    """
+    Behave like a model that evaluates the expression after "Evaluate" in the user message with
+    the `tools.math` tools. Step by step, it calls every operation whose operands are known at
+    once, one round trip per level of the expression. Given the `evaluate_plan` tool, it sends all
+    operations as one plan.
+    """
+    messages = request.get("messages") or []
+    tools = {tool["function"]["name"] for tool in request.get("tools") or []}
+    question = next(m["content"] for m in messages if m.get("role") == "user")
+    steps = _arithmetic_steps(question.split("Evaluate", 1)[1].strip(" ?."))
+    results = {
+        m["tool_call_id"]: json.loads(m["content"])
+        for m in messages
+        if m.get("role") == "tool"
+    }
+
+    def answer(value: Any) -> dict:
+        return {"role": "assistant", "content": f"The result is {value}."}
+
+    def call(*tool_calls: dict) -> dict:
+        return {"role": "assistant", "content": None, "tool_calls": list(tool_calls)}
+
+    if "evaluate_plan" in tools:
+        if "call_plan" in results:
+            return answer(results["call_plan"]["result"])
+        plan = [
+            {
+                **step,
+                "args": {
+                    name: f"${value}" if isinstance(value, str) else value
+                    for name, value in step["args"].items()
+                },
+            }
+            for step in steps
+        ]
+        return call(_tool_call("call_plan", "evaluate_plan", {"steps": plan}))
+
+    values = {step["id"]: results.get(f"call_{step['id']}") for step in steps}
+    if values[steps[-1]["id"]] is not None:
+        return answer(values[steps[-1]["id"]])
+    ready = []
+    for step in steps:
+        operands = step["args"].values()
+        if values[step["id"]] is None and not any(
+            isinstance(value, str) and values[value] is None for value in operands
+        ):
+            args = {
+                name: values[value] if isinstance(value, str) else value
+                for name, value in step["args"].items()
+            }
+            ready.append(_tool_call(f"call_{step['id']}", step["tool"], args))
+    return call(*ready)
+
+
+class ScriptedResponder:
+    """
+    Answer the model calls of a turn from a script. The n-th call with tools, counted by the
+    assistant messages since the last user message, gets the n-th entry: `{"content": "..."}` or
+    `{"tool_calls": [{"name": ..., "args": {...}}]}`. A tool call without a name calls the first
+    tool of the request, one without args gets a schema instance whose string arguments are the
+    last user message, so that searches differ between turns. Calls without tools echo the last
+    user message like a query rewrite, structured-output calls and calls past the end of the
+    script get `default_responder`.
+    """
+
+    def __init__(self, script: list[dict]):
+        self.script = script
+
+    @classmethod
+    def from_file(cls, path: str) -> "ScriptedResponder":
+        with open(path) as f:
+            return cls(json.load(f))
+
+    def __call__(self, request: dict) -> dict:
+        tools = {
+            t["function"]["name"]: t["function"] for t in request.get("tools") or []
+        }
+        messages = request.get("messages") or []
+        calls, user = 0, ""
+        for message in reversed(messages):
+            if message.get("role") == "user":
+                user = message.get("content") or ""
+                break
+            calls += message.get("role") == "assistant"
+        if not tools and not request.get("response_format"):
+            return {"role": "assistant", "content": user}
+        if not tools or calls >= len(self.script):
+            return default_responder(request)
+
+        entry = self.script[calls]
+        if "tool_calls" not in entry:
+            return {"role": "assistant", "content": entry.get("content", "")}
+        tool_calls = []
+        for call in entry["tool_calls"]:
+            function = tools.get(call.get("name")) or next(iter(tools.values()))
+            args = call.get("args")
+            if args is None:
+                args = {
+                    name: user if isinstance(value, str) else value
+                    for name, value in schema_instance(
+                        function.get("parameters", {})
+                    ).items()
+                }
+            tool_calls.append(
+                _tool_call(f"call_{uuid.uuid4().hex[:12]}", function["name"], args)
+            )
+        return {"role": "assistant", "content": None, "tool_calls": tool_calls}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        # Clients drop connections of hedged requests they no longer need
+        try:
+            super().handle()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+
+    def read_json(self) -> dict:
+        length = int(self.headers.get("Content-Length", 0))
+        return json.loads(self.rfile.read(length) or b"{}")
+
+    def send_json(
+        self, body: dict, status: int = 200, headers: Optional[dict] = None
+    ) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        request = self.read_json()
+        self.server.count_request()
+        if not self.server.enter():
+            self.send_json(
+                self.server.throttled_body,
+                status=429,
+                headers={"Retry-After": str(self.server.retry_after)},
+            )
+            return
+        try:
+            self.respond(request)
+        finally:
+            self.server.leave()
+
+    def respond(self, request: dict) -> None:
+        raise NotImplementedError
+
+    def do_GET(self):
+        # Counters of a server running in another process
+        if self.path == "/stats":
+            self.send_json(
+                {
+                    "requests": self.server.request_count,
+                    "throttled": self.server.throttled_count,
+                }
+            )
+        else:
+            self.send_json({"error": "not found"}, status=404)
+
+
+class _MockServer(ThreadingHTTPServer):
+    """
+    Request counting shared by the mock servers. With `max_concurrency`, requests beyond it are
+    rejected right away with a 429 and a `retry_after` hint, like a provider's rate limit.
+    """
+
+    daemon_threads = True
+    request_queue_size = 1024
+    throttled_body: dict = {"error": "rate limited"}
+
+    def __init__(
+        self,
+        handler: type[_Handler],
+        port: int = 0,
+        max_concurrency: Optional[int] = None,
+        retry_after: float = 0.05,
+    ):
+        self.max_concurrency = max_concurrency
+        self.retry_after = retry_after
+        self.request_count = 0
+        self.throttled_count = 0
+        self.active = 0
+        self._count_lock = threading.Lock()
+        super().__init__(("127.0.0.1", port), handler)
+
+    def count_request(self) -> None:
+        with self._count_lock:
+            self.request_count += 1
+
+    def enter(self) -> bool:
+        with self._count_lock:
+            if self.max_concurrency is not None and self.active >= self.max_concurrency:
+                self.throttled_count += 1
+                return False
+            self.active += 1
+            return True
+
+    def leave(self) -> None:
+        with self._count_lock:
+            self.active -= 1
+
+
+class MockOpenAIServer(_MockServer):
+    """
+    OpenAI-compatible `/chat/completions` endpoint.
+    `latency` is the time to first token in seconds, `tokens_per_second` paces streamed chunks.
+    A `slow_fraction` of requests take `slow_latency` instead, to model tail latency, and an
+    `error_rate` of requests fail with `error_status`. `prefill_tokens_per_second` adds the time
+    to process the prompt tokens that are not served from the prefix cache.
+    Usage reports cached prompt tokens like a provider prefix cache would, for the longest
+    prefix of tools and whole messages that an earlier request already sent.
+    """
+
+    throttled_body = {
+        "error": {"message": "Rate limit reached", "type": "rate_limit_error"}
+    }
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        tokens_per_second: Optional[float] = None,
+        responder: Responder = default_responder,
+        slow_fraction: float = 0.0,
+        slow_latency: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        max_concurrency: Optional[int] = None,
+        prefill_tokens_per_second: Optional[float] = None,
+    ):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.responder = responder
+        self.slow_fraction = slow_fraction
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._seen_prefixes: set[str] = set()
+        super().__init__(_OpenAIHandler, port, max_concurrency)
+
+    def cached_prompt_tokens(self, request: dict) -> int:
+        prefix = hashlib.sha256(json.dumps(request.get("tools") or []).encode())
+        size, cached, hit = 0, 0, True
+        keys = []
+        for message in request.get("messages", []):
+            data = json.dumps(message).encode()
+            prefix.update(data)
+            size += len(data)
+            keys.append(prefix.hexdigest())
+            with self._count_lock:
+                hit = hit and keys[-1] in self._seen_prefixes
+            if hit:
+                cached = size // 4
+        with self._count_lock:
+            self._seen_prefixes.update(keys)
+        return cached
+
+    def request_latency(self) -> float:
+        if self.slow_fraction and random.random() < self.slow_fraction:
+            return self.slow_latency
+        return self.latency
+
+
+class _OpenAIHandler(_Handler):
+    server: MockOpenAIServer
+
+    def respond(self, request: dict) -> None:
+        if not self.path.endswith("/chat/completions"):
+            self.send_json({"error": {"message": "not found"}}, status=404)
+            return
+
+        time.sleep(self.server.request_latency())
+        if self.server.error_rate and random.random() < self.server.error_rate:
+            self.send_json(
+                {"error": {"message": "mock error", "type": "server_error"}},
+                status=self.server.error_status,
+            )
+            return
+        message = self.server.responder(request)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        model = request.get("model", "mock")
+        content = message.get("content") or ""
+        usage = {
+            "prompt_tokens": len(json.dumps(request.get("messages", []))) // 4,
+            "completion_tokens": max(1, len(content) // 4),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        usage["prompt_tokens_details"] = {
+            "cached_tokens": self.server.cached_prompt_tokens(request)
+        }
+        if self.server.prefill_tokens_per_second:
+            uncached = (
+                usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]
+            )
+            time.sleep(max(0, uncached) / self.server.prefill_tokens_per_second)
+
+        if not request.get("stream"):
+            self.send_json(
+                {
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": message,
+                            "finish_reason": "tool_calls"
+                            if message.get("tool_calls")
+                            else "stop",
+                        }
+                    ],
+                    "usage": usage,
+                }
+            )
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def send_chunk(delta: dict, finish_reason: Optional[str] = None, **extra):
+            chunk = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [
+                    {"index": 0, "delta": delta, "finish_reason": finish_reason}
+                ],
+                **extra,
+            }
+            self.write_chunk(f"data: {json.dumps(chunk)}\n\n".encode())
+
+        send_chunk({"role": "assistant", "content": ""})
+        for token in content.split(" "):
+            if self.server.tokens_per_second:
+                time.sleep(1 / self.server.tokens_per_second)
+            send_chunk({"content": token + " "})
+        for index, tool_call in enumerate(message.get("tool_calls") or []):
+            send_chunk({"tool_calls": [{"index": index, **tool_call}]})
+        send_chunk(
+            {}, "tool_calls" if message.get("tool_calls") else "stop", usage=usage
+        )
+        self.write_chunk(b"data: [DONE]\n\n")
+        self.write_chunk(b"")
+
+    def write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+
+FILLER_WORDS = (
+    "the report said new data shows growth across the region while analysts expect prices "
+    "to change next year as officials review policy and users compare results from the study"
+).split()
+
+
+def _article(query: str, seed: str, size: int) -> str:
+    """Distinct sentences of filler words, some of them mentioning words of `query`."""
+    rng = random.Random(seed)
+    query_words = query.split() or ["mock"]
+    sentences, length = [], 0
+    while length < size:
+        sentence = rng.choices(FILLER_WORDS, k=rng.randint(8, 16))
+        if rng.random() < 0.3:
+            sentence.insert(rng.randrange(len(sentence)), rng.choice(query_words))
+        text = " ".join(sentence).capitalize() + "."
+        sentences.append(text)
+        length += len(text) + 1
+    return " ".join(sentences)
+
+
+class MockTavilyServer(_MockServer):
+    """
+    Tavily-compatible `/search` endpoint returning `max_results` synthetic results.
+    With `varied_content`, each result is an article of distinct sentences, and the first
+    `duplicate_results` results after the first are near-copies of it, like syndicated news.
+    """
+
+    throttled_body = {"detail": {"error": "Rate limit reached"}}
+
+    def __init__(
+        self,
+        port: int = 0,
+        latency: float = 0.0,
+        content_size: int = 800,
+        max_concurrency: Optional[int] = None,
+        varied_content: bool = False,
+        duplicate_results: int = 0,
+    ):
+        self.latency = latency
+        self.content_size = content_size
+        self.varied_content = varied_content
+        self.duplicate_results = duplicate_results
+        super().__init__(_TavilyHandler, port, max_concurrency)
+
+    def content(self, query: str, i: int) -> str:
+        if not self.varied_content:
+            sentence = f"Mock article about {query}. "
+            body = sentence * max(1, self.content_size // len(sentence))
+            return f"Source {i}. {body}"
+        if 0 < i <= self.duplicate_results:
+            return f"Source {i}. " + _article(query, f"{query}:0", self.content_size)
+        return _article(query, f"{query}:{i}", self.content_size)
+
+
+class _TavilyHandler(_Handler):
+    server: MockTavilyServer
+
+    def respond(self, request: dict) -> None:
+        time.sleep(self.server.latency)
+        query = request.get("query", "")
+        self.send_json(
+            {
+                "query": query,
+                "results": [
+                    {
+                        "title": f"Result {i} for {query}",
+                        "url": f"https://example.com/{i}",
+                        "content": self.server.content(query, i),
+                        "score": 1 / (i + 1),
+                    }
+                    for i in range(request.get("max_results") or 5)
+                ],
+                "response_time": self.server.latency,
+            }
+        )
+
+
+@contextmanager
+def running(server: ThreadingHTTPServer) -> Iterator[str]:
+    """Serve in a background thread and yield the base URL."""
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        host, port = server.server_address[:2]
+        yield f"http://{host}:{port}"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def _serve_forever(server_cls: type[ThreadingHTTPServer], kwargs: dict, ports) -> None:
+    server = server_cls(**kwargs)
+    ports.put(server.server_address[1])
+    server.serve_forever()
+
+
+@contextmanager
+def running_in_process(
+    server_cls: type[ThreadingHTTPServer], **kwargs
+) -> Iterator[str]:
+    """
+    Serve in a child process and yield the base URL.
+    Use this for load tests, so the mock server does not compete with the client for the GIL.
+    `kwargs` must be picklable, e.g. module-level responder functions.
+    """
+    context = multiprocessing.get_context("spawn")
+    ports = context.Queue()
+    process = context.Process(
+        target=_serve_forever, args=(server_cls, kwargs, ports), daemon=True
+    )
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{ports.get(timeout=30)}"
+    finally:
+        process.terminate()
+        process.join()
@@ -0,0 +1,123 @@
+"""
+Per-step latency of the demo agent's `llm_call` model setup, with and without the model registry.
+Then checks that `clear` closes every client the registry built, sync and async, with their
+connections and hedging threads, and fails with exit code 1 otherwise.
+
+    python -m benchmarks.model_registry --steps 200
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+
+from langchain.chat_models import init_chat_model
+from langchain.messages import HumanMessage
+from langchain.tools import tool
+
+from benchmarks.mock_servers import MockOpenAIServer, running
+from models.openai.langchain import create_openai_model_with_tools
+from models.limits import rate_limits
+from models.registry import ModelRegistry, get_model_registry
+from models.schema import Endpoint, OpenAIModelConfig
+from tools.math import tools
+
+TOOLS = [tool(math_tool) for math_tool in tools]
+
+
+def rebuild_step(config: OpenAIModelConfig):
+    """What `llm_call` did before the registry: a new client and `bind_tools` on every step."""
+    model = init_chat_model(
+        model_provider="openai",
+        model=config.model_name,
+        api_key=config.api_key,
+        base_url=config.base_url,
+    )
+    return model.bind_tools(tools=TOOLS)
+
+
+def registry_step(config: OpenAIModelConfig):
+    return create_openai_model_with_tools(config, TOOLS)
+
+
+def measure(step, config: OpenAIModelConfig, steps: int) -> list[float]:
+    latencies = []
+    for _ in range(steps):
+        start = time.perf_counter()
+        step(config).invoke([HumanMessage(content="What is 3 * 4?")])
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def check_clear(base_url: str) -> list[str]:
+    registry = ModelRegistry()
+    config = OpenAIModelConfig(
+        model_name="mock",
+        api_key="mock",
+        endpoints=[Endpoint(base_url=f"{base_url}/v1")],
+        limits=rate_limits(max_concurrency=4),
+    )
+    url = f"{base_url}/v1/chat/completions"
+    body = {"model": "mock", "messages": [{"role": "user", "content": "hi"}]}
+    transport, async_transport = registry.transport, registry.async_transport
+    routed, async_routed = registry.http_clients(config)
+    clients = [registry.http_client, routed]
+    async_clients = [registry.http_async_client, async_routed]
+    for client in clients:
+        client.post(url, json=body)
+
+    async def use_and_clear():
+        for client in async_clients:
+            await client.post(url, json=body)
+        # Inside a running loop the async clients are closed by a task
+        registry.clear()
+        await asyncio.gather(*registry._closing)
+
+    asyncio.run(use_and_clear())
+    errors = [
+        f"{type(client).__name__} {i} is still open"
+        for i, client in enumerate(clients + async_clients)
+        if not client.is_closed
+    ]
+    for name, t in (("sync", transport), ("async", async_transport)):
+        if t._pool.connections:
+            errors.append(f"{len(t._pool.connections)} {name} connections still open")
+    if not routed._transport._executor._shutdown:
+        errors.append("the hedging threads of the balanced transport still run")
+    print(f"clear: {len(clients + async_clients)} clients, {len(errors)} left open")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=200)
+    args = parser.parse_args()
+
+    with running(MockOpenAIServer()) as base_url:
+        config = OpenAIModelConfig(
+            model_name="mock", api_key="mock", base_url=f"{base_url}/v1"
+        )
+        for name, step in (("rebuild", rebuild_step), ("registry", registry_step)):
+            latencies = measure(step, config, args.steps)
+            print(
+                f"{name:>8}: mean={statistics.mean(latencies):.2f}ms "
+                f"p50={statistics.median(latencies):.2f}ms "
+                f"p95={statistics.quantiles(latencies, n=20)[-1]:.2f}ms"
+            )
+
+    stats = get_model_registry().stats
+    print(
+        f"registry: hits={stats.hits} misses={stats.misses} hit_rate={stats.hit_rate:.1%}"
+    )
+
+    with running(MockOpenAIServer()) as base_url:
+        errors = check_clear(base_url)
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
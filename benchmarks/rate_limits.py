@@ -0,0 +1,190 @@
+"""
+Throughput under bursts against local OpenAI and Tavily servers that reject requests beyond their
+concurrency capacity with 429s, with and without client-side rate limiting (token buckets plus
+AIMD adaptive concurrency, `models.limits`). Throughput stability is the coefficient of variation
+of completed calls per 100ms window, lower is steadier.
+
+With client-side limits, the run is checked once AIMD has settled, after the first quarter of the
+calls: throughput has to reach `--min-utilization` of the server's capacity (capacity / latency),
+no call may fail, and at most `--max-429-rate` of the remaining calls may be rejected with a 429.
+The check fails with exit code 1 otherwise.
+
+    python -m benchmarks.rate_limits --requests 800 --workers 64 --capacity 16 --latency 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+import urllib.request
+from contextlib import ExitStack
+
+from langchain_core.messages import HumanMessage
+
+from agents.utils.search_cache import CachedTavilySearch, SearchResultCache
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    MockTavilyServer,
+    running_in_process,
+)
+from models.openai.langchain import create_openai_model
+from models.registry import get_model_registry
+from models.schema import OpenAIModelConfig, RateLimitConfig
+
+WINDOW = 0.1
+
+
+def server_stats(url: str) -> dict:
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        return json.load(response)
+
+
+async def load(name: str, call, url: str, limiter, args) -> dict:
+    """Run `args.requests` calls from `args.workers` concurrent workers, report and return stats."""
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+    latencies, done_at, errors = [], [], 0
+    before = server_stats(url)
+    settle = args.requests // 4
+    settled: dict = {}
+
+    async def worker() -> None:
+        nonlocal errors
+        while not queue.empty():
+            i = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                ok = await call(i)
+            except Exception:
+                ok = False
+            if not ok:
+                errors += 1
+                continue
+            latencies.append((time.perf_counter() - start) * 1000)
+            done_at.append(time.perf_counter())
+            if len(done_at) == settle:
+                settled.update(server_stats(url), at=time.perf_counter())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.workers)))
+    wall = time.perf_counter() - start
+
+    after = server_stats(url)
+    windows = [0] * (int(wall / WINDOW) + 1)
+    for t in done_at:
+        windows[int((t - start) / WINDOW)] += 1
+    # The last window is partial
+    windows = windows[:-1] or windows
+    cv = statistics.pstdev(windows) / statistics.mean(windows) if any(windows) else 0.0
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0] * 99
+    )
+    limit = f" limit={limiter.concurrency.limit:.1f}" if limiter else ""
+    print(
+        f"{name:<16} throughput={len(latencies) / wall:6.1f}/s cv={cv:4.2f} "
+        f"p50={quantiles[49]:6.0f}ms p99={quantiles[98]:6.0f}ms errors={errors} "
+        f"server_429s={after['throttled'] - before['throttled']}{limit}"
+    )
+    settled_429s = after["throttled"] - settled.get("throttled", before["throttled"])
+    settled_wall = time.perf_counter() - settled.get("at", start)
+    return {
+        "errors": errors,
+        "settled_throughput": (len(done_at) - settle) / settled_wall,
+        "settled_429_rate": settled_429s / max(1, args.requests - settle),
+    }
+
+
+def check(name: str, result: dict, args) -> list[str]:
+    """Compare a client-side limited run with its floor and ceiling"""
+    failures = []
+    floor = args.min_utilization * args.capacity / args.latency
+    if result["settled_throughput"] < floor:
+        failures.append(
+            f"{name}: {result['settled_throughput']:.1f}/s after settling, below {floor:.1f}/s"
+        )
+    if result["settled_429_rate"] > args.max_429_rate:
+        failures.append(
+            f"{name}: {result['settled_429_rate']:.1%} of calls rejected after settling, "
+            f"more than {args.max_429_rate:.1%}"
+        )
+    if result["errors"]:
+        failures.append(f"{name}: {result['errors']} calls failed")
+    return failures
+
+
+async def main_async(args, openai_url: str, tavily_url: str) -> list[str]:
+    limits = RateLimitConfig(max_concurrency=args.workers)
+    registry = get_model_registry()
+    failures = []
+    for limited in (False, True):
+        suffix = "limited" if limited else "unlimited"
+
+        config = OpenAIModelConfig(
+            model_name="mock",
+            api_key="mock",
+            base_url=f"{openai_url}/v1",
+            limits=limits if limited else None,
+        )
+        model = create_openai_model(config)
+
+        async def chat(i: int) -> bool:
+            await model.ainvoke([HumanMessage(content=f"question {i}")])
+            return True
+
+        limiter = registry.limiter(f"{openai_url}/v1", limits) if limited else None
+        result = await load(f"llm {suffix}", chat, openai_url, limiter, args)
+        if limited:
+            failures += check("llm", result, args)
+
+        limiter = registry.limiter(tavily_url, limits) if limited else None
+        search = CachedTavilySearch(
+            max_results=1,
+            tavily_api_key="mock",
+            api_base_url=tavily_url,
+            cache=SearchResultCache(),
+            limiter=limiter,
+        )
+
+        async def tavily(i: int) -> bool:
+            result = await search.ainvoke({"query": f"{suffix} query {i}"})
+            return "error" not in result
+
+        result = await load(f"tavily {suffix}", tavily, tavily_url, limiter, args)
+        if limited:
+            failures += check("tavily", result, args)
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=800)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--min-utilization", type=float, default=0.5)
+    parser.add_argument("--max-429-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    with ExitStack() as stack:
+        openai_url = stack.enter_context(
+            running_in_process(
+                MockOpenAIServer, latency=args.latency, max_concurrency=args.capacity
+            )
+        )
+        tavily_url = stack.enter_context(
+            running_in_process(
+                MockTavilyServer, latency=args.latency, max_concurrency=args.capacity
+            )
+        )
+        failures = asyncio.run(main_async(args, openai_url, tavily_url))
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
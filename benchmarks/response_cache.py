@@ -0,0 +1,95 @@
+"""
+Demo math agent runs against a local mock OpenAI server that answers with a tool call and then
+text: without a response cache, with the in-memory cache on repeated prompts, and replaying an
+on-disk recording after the server has been shut down.
+
+    python -m benchmarks.response_cache --prompts 20 --latency 0.2
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from langchain_core.messages import HumanMessage
+
+from agents.demo import langchain_agent
+from agents.demo.env import get_settings
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    agent_responder,
+    running_in_process,
+)
+from models.registry import get_model_registry
+
+
+def configure(base_url: str, mode: str = "", path: str = "") -> None:
+    """Point the demo agent's settings at `base_url` with the given response cache."""
+    os.environ.update(
+        OPENAI_API_KEY="mock",
+        OPENAI_BASE_URL=base_url,
+        LLM_CACHE_MODE=mode,
+        LLM_CACHE_PATH=path,
+    )
+    get_settings.cache_clear()
+    langchain_agent.get_model_config.cache_clear()
+
+
+def run(name: str, prompts: list[str]) -> list:
+    graph = langchain_agent.make_graph()
+    latencies, answers = [], []
+    for prompt in prompts:
+        start = time.perf_counter()
+        state = graph.invoke({"messages": [HumanMessage(content=prompt)]})
+        latencies.append((time.perf_counter() - start) * 1000)
+        answers.append(
+            [
+                (m.type, m.text, getattr(m, "tool_calls", None))
+                for m in state["messages"]
+            ]
+        )
+
+    config = langchain_agent.get_model_config()
+    stats = ""
+    if config.cache:
+        cache = get_model_registry().response_cache(config.cache).stats
+        stats = f" hits={cache.hits} misses={cache.misses} stored={cache.stores}"
+    print(
+        f"{name:<16} p50={statistics.median(latencies):7.1f}ms "
+        f"total={sum(latencies) / 1000:6.2f}s{stats}"
+    )
+    return answers
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    prompts = [f"Multiply {i} and {i + 1}" for i in range(args.prompts)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "responses.sqlite")
+        with running_in_process(
+            MockOpenAIServer, latency=args.latency, responder=agent_responder
+        ) as url:
+            configure(f"{url}/v1")
+            run("no cache", prompts)
+
+            configure(f"{url}/v1", "cache")
+            run("memory, cold", prompts)
+            run("memory, warm", prompts)
+
+            configure(f"{url}/v1", "record", path)
+            recorded = run("record", prompts)
+
+        # The server is gone, every model call has to be served from the recording
+        get_model_registry().clear()
+        configure(f"{url}/v1", "replay", path)
+        replayed = run("replay, offline", prompts)
+        print(f"replay matches recording: {replayed == recorded}")
+
+
+if __name__ == "__main__":
+    main()
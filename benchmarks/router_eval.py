@@ -0,0 +1,97 @@
+"""
+Offline evaluation of the local intent routers against a labeled JSONL file
+(`{"text": ..., "intent": ...}` per line). Reports how many turns the fast path decides,
+its accuracy on those turns, and per-turn routing latency.
+With `--embedding-model`, a local sentence-transformers model, the embedding centroid tier is
+trained on `--train` (defaults to the evaluation file itself, so use a separate file for honest
+numbers).
+
+The texts of NEGATIVE_EXAMPLES mention a word of a search rule in another sense. The fast path must
+either leave them to the LLM or route them correctly, otherwise the script exits with code 1.
+
+    python -m benchmarks.router_eval benchmarks/data/intents.jsonl --threshold 0.85
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+
+from agents.utils.router import (
+    EmbeddingCentroidRouter,
+    LocalEmbeddings,
+    RuleRouter,
+    TieredRouter,
+    load_labeled_examples,
+)
+
+NEGATIVE_EXAMPLES = [
+    ("Explain how electric current works", "chat"),
+    ("How do I compute the current through a resistor?", "chat"),
+    ("What is the score of a t-test?", "chat"),
+    ("How is the credit score calculated?", "chat"),
+    ("Write a poem about the latest fashion", "chat"),
+    ("Write a poem about today's weather", "chat"),
+    ("Tell me the recent history of Rome", "chat"),
+    ("Summarize this news article for me", "chat"),
+    ("What is a forecast model in statistics?", "chat"),
+    ("How are you today?", "chat"),
+    ("What should I cook tonight?", "chat"),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path")
+    parser.add_argument("--threshold", type=float, default=0.85)
+    parser.add_argument("--embedding-model")
+    parser.add_argument("--train")
+    args = parser.parse_args()
+
+    examples = load_labeled_examples(args.path) + NEGATIVE_EXAMPLES
+    tiers = [RuleRouter()]
+    if args.embedding_model:
+        tiers.append(
+            EmbeddingCentroidRouter(LocalEmbeddings(args.embedding_model)).fit(
+                load_labeled_examples(args.train or args.path)
+            )
+        )
+    router = TieredRouter(tiers, threshold=args.threshold)
+
+    decided, correct, latencies = Counter(), Counter(), []
+    errors = []
+    for text, intent in examples:
+        start = time.perf_counter()
+        decision = router.route(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        if decision is None:
+            continue
+        decided[decision.tier] += 1
+        if decision.intent == intent:
+            correct[decision.tier] += 1
+        else:
+            errors.append((text, intent, decision))
+
+    total_decided = sum(decided.values())
+    print(f"examples={len(examples)} threshold={args.threshold}")
+    print(
+        f"fast path coverage={total_decided / len(examples):.1%} "
+        f"accuracy={sum(correct.values()) / max(total_decided, 1):.1%} "
+        f"(remaining {len(examples) - total_decided} turns fall through to the LLM)"
+    )
+    for tier, count in decided.items():
+        print(f"  {tier}: decided={count} accuracy={correct[tier] / count:.1%}")
+    print(
+        f"latency p50={statistics.median(latencies):.3f}ms max={max(latencies):.3f}ms"
+    )
+    for text, intent, decision in errors:
+        print(f"  wrong: {text!r} expected={intent} got={decision}")
+    negative = dict(NEGATIVE_EXAMPLES)
+    if misrouted := [text for text, _, _ in errors if text in negative]:
+        print(f"FAIL: {len(misrouted)} negative examples misrouted")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""
+Upstream calls and latency of the cached Tavily tool against a local stub of the search API.
+Fires `--concurrency` identical queries at once (coalesced into one call), then repeats them (served from cache).
+
+Then checks that cancelling the lookup that started a coalesced fetch, or interrupting its thread,
+doesn't fail the lookups that joined it. The check fails with exit code 1 otherwise.
+
+    python -m benchmarks.search_cache --concurrency 50 --latency 0.3 --sqlite /tmp/search_cache.db
+"""
+
+import argparse
+import asyncio
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.utils.search_cache import (
+    CachedTavilySearch,
+    MemorySearchCacheBackend,
+    SearchResultCache,
+    SQLiteSearchCacheBackend,
+)
+from benchmarks.mock_servers import MockTavilyServer, running
+
+
+async def check_cancelled_leader(delay: float = 0.1) -> list[str]:
+    cache = SearchResultCache()
+
+    async def fetch() -> dict:
+        await asyncio.sleep(delay)
+        return {"results": []}
+
+    leader = asyncio.create_task(cache.aget_or_fetch("key", "query", fetch))
+    await asyncio.sleep(0)
+    followers = [
+        asyncio.create_task(cache.aget_or_fetch("key", "query", fetch))
+        for _ in range(4)
+    ]
+    await asyncio.sleep(delay / 2)
+    leader.cancel()
+    results = await asyncio.gather(*followers, return_exceptions=True)
+    return [
+        f"async: a follower of a cancelled leader got {r!r}"
+        for r in results
+        if r != {"results": []}
+    ]
+
+
+def check_interrupted_leader(delay: float = 0.1) -> list[str]:
+    cache = SearchResultCache()
+    started = threading.Event()
+
+    def interrupted() -> dict:
+        started.set()
+        time.sleep(delay)
+        raise KeyboardInterrupt
+
+    def leader():
+        try:
+            cache.get_or_fetch("key", "query", interrupted)
+        except KeyboardInterrupt:
+            pass
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    started.wait()
+    with ThreadPoolExecutor(4) as pool:
+        futures = [
+            pool.submit(cache.get_or_fetch, "key", "query", lambda: {"results": []})
+            for _ in range(4)
+        ]
+        errors = []
+        for future in futures:
+            try:
+                result = future.result(timeout=10)
+            except BaseException as e:
+                result = e
+            if result != {"results": []}:
+                errors.append(
+                    f"sync: a follower of an interrupted leader got {result!r}"
+                )
+    thread.join()
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.3)
+    parser.add_argument("--sqlite", help="Use a disk-backed cache at this path")
+    args = parser.parse_args()
+
+    server = MockTavilyServer(latency=args.latency)
+    with running(server) as base_url:
+        backend = (
+            SQLiteSearchCacheBackend(args.sqlite)
+            if args.sqlite
+            else MemorySearchCacheBackend()
+        )
+        tool = CachedTavilySearch(
+            max_results=5,
+            tavily_api_key="mock",
+            api_base_url=base_url,
+            cache=SearchResultCache(backend=backend),
+        )
+        queries = ["Weather in Taipei 2024-01-01"] * args.concurrency
+
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            for label in ("sync cold", "sync warm"):
+                start = time.perf_counter()
+                list(pool.map(lambda q: tool.invoke({"query": q}), queries))
+                print(
+                    f"{label:>10}: {time.perf_counter() - start:.3f}s "
+                    f"upstream_calls={server.request_count}"
+                )
+
+        async def run_async():
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(tool.ainvoke({"query": f"  {q.upper()} "}) for q in queries)
+            )
+            return time.perf_counter() - start
+
+        tool.cache.backend = MemorySearchCacheBackend()
+        print(
+            f"{'async cold':>10}: {asyncio.run(run_async()):.3f}s "
+            f"upstream_calls={server.request_count}"
+        )
+
+    cache = tool.cache
+    print(f"hits={cache.hits} misses={cache.misses} coalesced={cache.coalesced}")
+
+    errors = asyncio.run(check_cancelled_leader()) + check_interrupted_leader()
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
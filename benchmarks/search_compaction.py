@@ -0,0 +1,108 @@
+"""
+Search result tokens and answer latency of the web search graph with and without compaction, against
+local mock OpenAI and Tavily servers. The mock search returns `--results` articles per query, some of
+them near-duplicates, and the mock model spends `--prefill-tokens-per-second` on uncached prompt
+tokens so that the size of the search results shows up in the latency of the answer.
+
+    python -m benchmarks.search_compaction --turns 20 --max-tokens 1000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    MockTavilyServer,
+    ScriptedResponder,
+    running_in_process,
+)
+
+# One search with the user's message as the query, then a plain answer
+SCRIPT = [{"tool_calls": [{}]}]
+
+
+async def run(agent, turns: int, offset: int) -> tuple[float, float]:
+    """Median turn latency in milliseconds and mean prompt tokens per turn."""
+    latencies, usage = [], UsageMetadataCallbackHandler()
+    for i in range(turns):
+        message = {
+            "type": "human",
+            "content": f"What are the latest news about topic {offset + i}?",
+        }
+        start = time.perf_counter()
+        await agent.ainvoke({"messages": [message]}, {"callbacks": [usage]})
+        latencies.append((time.perf_counter() - start) * 1000)
+    prompt_tokens = sum(u["input_tokens"] for u in usage.usage_metadata.values())
+    return statistics.median(latencies), prompt_tokens / turns
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--max-tokens", type=int, default=1000)
+    parser.add_argument("--results", type=int, default=5)
+    parser.add_argument("--duplicates", type=int, default=1)
+    parser.add_argument("--content-size", type=int, default=4000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=20000)
+    args = parser.parse_args()
+
+    with (
+        running_in_process(
+            MockOpenAIServer,
+            latency=args.latency,
+            prefill_tokens_per_second=args.prefill_tokens_per_second,
+            responder=ScriptedResponder(SCRIPT),
+        ) as openai_url,
+        running_in_process(
+            MockTavilyServer,
+            content_size=args.content_size,
+            varied_content=True,
+            duplicate_results=args.duplicates,
+        ) as tavily_url,
+    ):
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{openai_url}/v1",
+            TAVILY_API_KEY="mock",
+            TAVILY_API_BASE_URL=tavily_url,
+        )
+        from agents.utils.search_compaction import SearchCompactor
+        from agents.web_search_agent import langchain_agent
+
+        # The tool is shared by every turn, so compaction is switched on the tool itself
+        tool = langchain_agent.get_search_tool()
+        compactor = SearchCompactor(max_tokens=args.max_tokens)
+        agent = langchain_agent.agent
+
+        async def compare():
+            # Warm up the clients and compile the inner agent
+            tool.compactor = None
+            await run(agent, 2, offset=-2)
+            off = await run(agent, args.turns, offset=0)
+            tool.compactor = compactor
+            on = await run(agent, args.turns, offset=args.turns)
+            return off, on
+
+        (off_ms, off_tokens), (on_ms, on_tokens) = asyncio.run(compare())
+
+    stats = compactor.stats
+    print(
+        f"search results: {stats.input_tokens / stats.searches:.0f} -> "
+        f"{stats.output_tokens / stats.searches:.0f} tokens per search "
+        f"({stats.saved_tokens / stats.input_tokens:.0%} saved), "
+        f"{stats.duplicates / stats.searches:.1f} duplicate results dropped per search"
+    )
+    print(
+        f"prompt tokens per turn: {off_tokens:.0f} without, {on_tokens:.0f} with compaction"
+    )
+    print(f"turn p50: {off_ms:.1f}ms without, {on_ms:.1f}ms with compaction")
+
+
+if __name__ == "__main__":
+    main()
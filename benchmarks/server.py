@@ -0,0 +1,221 @@
+"""
+Throughput of the serving entry point (`python -m server.main`) against a local mock OpenAI server:
+for each worker count, `--requests` demo runs at `--concurrency` through the invoke endpoint, then
+streamed runs for the time to the first server-sent event, then a burst beyond the worker's
+concurrency limit and queue to check that the excess is rejected with a 503 rather than queued.
+Runs carry a thread id and the graphs a memory checkpointer, so a thread that lands on a different
+worker loses its history; the second turn of every thread checks that routing is sticky.
+
+For each worker count, `--concurrency` threads then run at once: a first turn streamed as
+server-sent events, which has to arrive as text/event-stream and end with an `end` event, and a
+second turn whose state has to contain the first, half of the threads passing the thread id in
+`config.configurable`. The check fails (exit code 1) when either doesn't hold.
+
+Throughput with more workers is not checked: the mock model calls leave the worker idle, so with
+fewer cores than workers plus the gateway, two workers are slower than one.
+
+    python -m benchmarks.server --workers 1 2 --concurrency 32 --requests 256
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    agent_responder,
+    running_in_process,
+)
+from server.main import wait_until_ready
+
+
+def start_server(port: int, workers: int, max_concurrency: int, max_queue: int):
+    env = {
+        **os.environ,
+        "SERVER_PORT": str(port),
+        "SERVER_WORKERS": str(workers),
+        "SERVER_GRAPHS": '["demo"]',
+        "SERVER_MAX_CONCURRENCY": str(max_concurrency),
+        "SERVER_MAX_QUEUE": str(max_queue),
+        "SERVER_QUEUE_TIMEOUT": "0.5",
+        "CHECKPOINTER": "memory",
+    }
+    process = subprocess.Popen(
+        [sys.executable, "-m", "server.main"],
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    wait_until_ready(f"http://127.0.0.1:{port}")
+    return process
+
+
+def body(thread_id: str, i: int, configurable: bool = False) -> dict:
+    run = {"input": {"messages": [{"type": "human", "content": f"Multiply {i} and 2"}]}}
+    if configurable:
+        run["config"] = {"configurable": {"thread_id": thread_id}}
+    else:
+        run["thread_id"] = thread_id
+    return run
+
+
+async def invoke_load(url: str, concurrency: int, requests: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses, threads = [], [], {}
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+
+        async def run(i: int) -> None:
+            thread_id = uuid.uuid4().hex
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/agents/demo/invoke", json=body(thread_id, i)
+                )
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses.append(response.status_code)
+                if response.status_code == 200:
+                    threads[thread_id] = len(response.json()["messages"])
+
+        start = time.perf_counter()
+        await asyncio.gather(*(run(i) for i in range(requests)))
+        wall = time.perf_counter() - start
+
+        # Second turn of some threads: their history is only there on the worker of the first turn
+        async def second_turn(thread_id: str) -> bool:
+            response = await client.post("/agents/demo/invoke", json=body(thread_id, 0))
+            return len(response.json()["messages"]) > threads[thread_id]
+
+        sticky = await asyncio.gather(*(second_turn(t) for t in list(threads)[:32]))
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    return {
+        "throughput": statuses.count(200) / wall,
+        "p50_ms": quantiles[49],
+        "p95_ms": quantiles[94],
+        "errors": len(statuses) - statuses.count(200),
+        "sticky": sum(sticky) / len(sticky) if sticky else 0.0,
+    }
+
+
+async def first_event_ms(url: str, runs: int) -> float:
+    latencies = []
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        for i in range(runs):
+            start = time.perf_counter()
+            async with client.stream(
+                "POST", "/agents/demo/stream", json=body(uuid.uuid4().hex, i)
+            ) as response:
+                first = None
+                async for line in response.aiter_lines():
+                    if first is None and line.startswith("event:"):
+                        first = (time.perf_counter() - start) * 1000
+                latencies.append(first)
+    return statistics.median(latencies)
+
+
+async def check_threads(url: str, concurrency: int) -> list[str]:
+    """Stream the first turn and invoke the second of `concurrency` threads at once."""
+    failures = []
+
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+
+        async def thread(i: int) -> None:
+            thread_id, configurable = uuid.uuid4().hex, i % 2 == 1
+            async with client.stream(
+                "POST", "/agents/demo/stream", json=body(thread_id, i, configurable)
+            ) as response:
+                content_type = response.headers.get("content-type", "")
+                events = [
+                    line.removeprefix("event:").strip()
+                    async for line in response.aiter_lines()
+                    if line.startswith("event:")
+                ]
+            if not content_type.startswith("text/event-stream"):
+                failures.append(
+                    f"thread {i}: stream answered {response.status_code} with {content_type!r}"
+                )
+            elif not events or events[-1] != "end" or "error" in events:
+                failures.append(f"thread {i}: stream sent the events {events}")
+
+            response = await client.post(
+                "/agents/demo/invoke", json=body(thread_id, i + 1, configurable)
+            )
+            contents = [m["content"] for m in response.json().get("messages", [])]
+            if f"Multiply {i} and 2" not in contents:
+                failures.append(f"thread {i}: the second turn lost the first one")
+
+        await asyncio.gather(*(thread(i) for i in range(concurrency)))
+    return failures
+
+
+async def burst(url: str, requests: int) -> dict[int, int]:
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        responses = await asyncio.gather(
+            *(
+                client.post("/agents/demo/invoke", json=body(uuid.uuid4().hex, i))
+                for i in range(requests)
+            )
+        )
+    statuses: dict[int, int] = {}
+    for response in responses:
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return statuses
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--max-queue", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    print(f"cores={os.cpu_count()}")
+    failures = []
+    with running_in_process(
+        MockOpenAIServer, latency=args.latency, responder=agent_responder
+    ) as openai_url:
+        os.environ.update(OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{openai_url}/v1")
+        for workers in args.workers:
+            process = start_server(
+                args.port, workers, args.max_concurrency, args.max_queue
+            )
+            url = f"http://127.0.0.1:{args.port}"
+            try:
+                result = asyncio.run(invoke_load(url, args.concurrency, args.requests))
+                ttfe = asyncio.run(first_event_ms(url, 20))
+                failures += [
+                    f"workers={workers}: {failure}"
+                    for failure in asyncio.run(check_threads(url, args.concurrency))
+                ]
+                # Twice what all workers admit and queue at once
+                capacity = workers * (args.max_concurrency + args.max_queue)
+                statuses = asyncio.run(burst(url, capacity * 2))
+            finally:
+                process.terminate()
+                process.wait()
+            print(
+                f"workers={workers}: {result['throughput']:6.1f} runs/s "
+                f"p50={result['p50_ms']:7.1f}ms p95={result['p95_ms']:7.1f}ms "
+                f"errors={result['errors']} sticky={result['sticky']:.0%} "
+                f"first event={ttfe:6.1f}ms burst of {capacity * 2}: {statuses}"
+            )
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
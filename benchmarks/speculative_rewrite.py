@@ -0,0 +1,131 @@
+"""
+Turn latency of the web search graph with and without speculative query rewriting,
+for a mix of chat and search turns, against local mock OpenAI and Tavily servers.
+Search turns alternate between a query the rule router decides ("latest news") and one it
+abstains on, chat turns are all left to the model. Each turn is numbered, so that no turn is
+answered by the intent cache.
+
+Checks that turns the rule router decides don't speculate, and that speculation doesn't make the
+turns slower than running classification and rewriting in sequence (with 10% of slack). The check
+fails with exit code 1 otherwise.
+
+    python -m benchmarks.speculative_rewrite --turns 20 --chat-ratio 0.5 --latency 0.3
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    MockTavilyServer,
+    agent_responder,
+    running_in_process,
+)
+
+
+def intent_responder(request: dict) -> dict:
+    """Classify turns mentioning "news" as web_search and everything else as chat."""
+    response_format = request.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        last_message = request["messages"][-1]["content"]
+        intent = "web_search" if "news" in last_message else "chat"
+        return {"role": "assistant", "content": json.dumps({"intent": intent})}
+    return agent_responder(request)
+
+
+ROUTED_SEARCH = "latest news"
+SEARCH = "what do you make of the news about rust"
+CHAT = "hello there"
+
+
+async def compare(build_graph, prompts: list[str]) -> dict[bool, float]:
+    # One event loop for both runs, the model registry's async connection pool is bound to it.
+    totals = {}
+    for speculative in (False, True):
+        numbered = [
+            f"{prompt} (turn {i}, {speculative=})" for i, prompt in enumerate(prompts)
+        ]
+        latencies = await run_turns(build_graph(speculative), numbered)
+        totals[speculative] = sum(latencies)
+        print(
+            f"speculative={speculative!s:>5}: mean={statistics.mean(latencies):.3f}s "
+            f"total={sum(latencies):.2f}s"
+        )
+    return totals
+
+
+async def run_turns(agent, prompts: list[str]) -> list[float]:
+    latencies = []
+    for prompt in prompts:
+        start = time.perf_counter()
+        await agent.ainvoke({"messages": [{"type": "human", "content": prompt}]})
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--chat-ratio", type=float, default=0.5)
+    parser.add_argument("--latency", type=float, default=0.3)
+    args = parser.parse_args()
+
+    chat_turns = int(args.turns * args.chat_ratio)
+    prompts = [CHAT] * chat_turns + [
+        ROUTED_SEARCH if i % 2 == 0 else SEARCH for i in range(args.turns - chat_turns)
+    ]
+
+    with (
+        running_in_process(
+            MockOpenAIServer, latency=args.latency, responder=intent_responder
+        ) as openai_url,
+        running_in_process(MockTavilyServer, latency=args.latency) as tavily_url,
+    ):
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{openai_url}/v1",
+            TAVILY_API_KEY="mock",
+            TAVILY_API_BASE_URL=tavily_url,
+        )
+        from agents.web_search_agent.langchain_agent import (
+            build_graph,
+            speculation_stats,
+        )
+
+        totals = asyncio.run(compare(build_graph, prompts))
+
+    stats = speculation_stats
+    print(
+        f"routed_turns={stats.routed_turns} | search_turns={stats.search_turns} "
+        f"saved={stats.saved_seconds:.2f}s | wasted_rewrites={stats.wasted_rewrites} "
+        f"wasted={stats.wasted_rewrite_seconds:.2f}s chat_join_wait={stats.chat_join_wait_seconds:.2f}s"
+    )
+
+    errors = []
+    routed = prompts.count(ROUTED_SEARCH)
+    if stats.routed_turns != routed or stats.search_turns != prompts.count(SEARCH):
+        errors.append(
+            f"{stats.routed_turns} routed and {stats.search_turns} speculative search turns, "
+            f"expected {routed} and {prompts.count(SEARCH)}"
+        )
+    if stats.chat_turns != chat_turns:
+        errors.append(
+            f"{stats.chat_turns} speculative chat turns, expected {chat_turns}"
+        )
+    if totals[True] > totals[False] * 1.1:
+        errors.append(
+            f"speculative turns took {totals[True]:.2f}s, sequential ones {totals[False]:.2f}s"
+        )
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Cold start budget of the graph modules referenced by `agents/*/langgraph.json`.
+Each module is imported in a fresh interpreter with `-X importtime`. The check fails (exit code 1)
+when the import takes longer than the budget, pulls in a module that must stay lazy or reads the
+agent's settings, which are only read on first use.
+The graph factory is timed separately, it runs when the server handles the first request.
+
+    python -m benchmarks.startup --budget-ms 1500
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+GRAPH_MODULES = (
+    "agents.demo.langchain_agent",
+    "agents.web_search_agent.langchain_agent",
+)
+
+# Top-level packages that importing a graph module must not load: providers, clients and NumPy
+# are imported on first use, and the UI and tracing dependencies only by the deprecated app.
+LAZY_PACKAGES = (
+    "aiohttp",
+    "langchain_openai",
+    "langchain_tavily",
+    "langfuse",
+    "numpy",
+    "openai",
+    "pydantic_ai",
+    "streamlit",
+    "tavily",
+    "tiktoken",
+)
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def run_python(code: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    # Placeholder keys, the clients are built but never called
+    env = {
+        "OPENAI_API_KEY": "sk-startup",
+        "TAVILY_API_KEY": "tvly-startup",
+        **os.environ,
+    }
+    args = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", code]
+    return subprocess.run(args, capture_output=True, text=True, env=env, check=True)
+
+
+def measure_import(module: str) -> tuple[float, list[tuple[float, str]]]:
+    """Return the total import time in ms and the (self ms, module) pairs of one cold import."""
+    total, modules = 0.0, []
+    for line in run_python(f"import {module}", importtime=True).stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match is None:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        modules.append((int(self_us) / 1000, name))
+        # Only top-level entries, nested imports are part of their cumulative time
+        if len(indent) == 1:
+            total += int(cumulative_us) / 1000
+    return total, modules
+
+
+def reads_settings_on_import(module: str) -> bool:
+    env_module = module.rsplit(".", 1)[0] + ".env"
+    code = f"import {module}, {env_module} as e\nprint(e.get_settings.cache_info().currsize)"
+    return run_python(code).stdout.strip() != "0"
+
+
+def measure_factory(module: str) -> float:
+    code = (
+        f"import time, {module} as m\n"
+        "start = time.perf_counter()\n"
+        "m.make_graph()\n"
+        "print((time.perf_counter() - start) * 1000)"
+    )
+    return float(run_python(code).stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=1500)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    args = parser.parse_args()
+
+    failures = []
+    for module in GRAPH_MODULES:
+        # The fastest of a few runs, the slower ones are mostly noise from the machine
+        runs = [measure_import(module) for _ in range(args.repeat)]
+        total, modules = min(runs, key=lambda run: run[0])
+        loaded = {name.split(".")[0] for _, name in modules}
+        eager = sorted(loaded.intersection(LAZY_PACKAGES))
+        factory_ms = measure_factory(module)
+
+        print(
+            f"{module}: import={total:.0f}ms (budget {args.budget_ms:.0f}ms) "
+            f"make_graph={factory_ms:.0f}ms"
+        )
+        for self_ms, name in sorted(modules, reverse=True)[: args.top]:
+            print(f"  {self_ms:8.1f}ms  {name}")
+
+        if total > args.budget_ms:
+            failures.append(f"{module} imports in {total:.0f}ms")
+        if eager:
+            failures.append(f"{module} eagerly imports {', '.join(eager)}")
+        if reads_settings_on_import(module):
+            failures.append(f"{module} reads its settings on import")
+
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Memory growth of graph state over many turns, with the accumulating `operator.add` messages
+reducer versus the bounded windowed reducer in `agents.utils.state`.
+Each turn appends a human and an AI message through a one-node graph, no LLM involved.
+With `--checkpointer`, turns go through an in-memory checkpointer like a server thread would,
+which makes the accumulating state grow quadratically, so use fewer turns.
+
+    python -m benchmarks.state_memory --turns 10000
+    python -m benchmarks.state_memory --turns 1000 --checkpointer
+
+The archive of evicted messages keeps at most MAX_CHUNKS chunks, the script exits with code 1 if
+it holds more.
+"""
+
+import argparse
+import operator
+import sys
+import time
+import tracemalloc
+
+from langchain.messages import AIMessage, AnyMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, START, StateGraph
+from typing_extensions import Annotated, TypedDict
+
+from agents.utils.state import MessageArchive, windowed_messages_reducer
+
+MAX_CHUNKS = 8
+archive = MessageArchive(max_chunks=MAX_CHUNKS)
+
+
+class AccumulatingState(TypedDict):
+    messages: Annotated[list[AnyMessage], operator.add]
+
+
+class WindowedState(TypedDict):
+    messages: Annotated[
+        list[AnyMessage], windowed_messages_reducer(max_messages=200, archive=archive)
+    ]
+
+
+def echo_node(state: dict):
+    return {"messages": [AIMessage(content="Echo: " + "details " * 30)]}
+
+
+def build(state_schema, checkpointer):
+    builder = StateGraph(state_schema)
+    builder.add_node("echo", echo_node)
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def run(state_schema, turns: int, report_every: int, checkpointer: bool) -> None:
+    graph = build(state_schema, InMemorySaver() if checkpointer else None)
+    config = {"configurable": {"thread_id": "benchmark"}}
+    messages: list = []
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for turn in range(1, turns + 1):
+        question = HumanMessage(content=f"Question {turn}")
+        if checkpointer:
+            state = graph.invoke({"messages": [question]}, config)
+        else:
+            # Carry the state over between turns, like a checkpointer restoring it
+            state = graph.invoke({"messages": messages + [question]})
+        messages = state["messages"]
+        if turn % report_every == 0:
+            current, peak = tracemalloc.get_traced_memory()
+            print(
+                f"  turn={turn:>6} state_messages={len(messages):>6} "
+                f"traced={current / 2**20:8.1f}MiB peak={peak / 2**20:8.1f}MiB "
+                f"elapsed={time.perf_counter() - start:6.1f}s"
+            )
+    tracemalloc.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=10000)
+    parser.add_argument("--checkpointer", action="store_true")
+    args = parser.parse_args()
+
+    report_every = max(1, args.turns // 5)
+    for name, schema in (
+        ("operator.add", AccumulatingState),
+        ("windowed", WindowedState),
+    ):
+        print(name)
+        run(schema, args.turns, report_every, args.checkpointer)
+    print(
+        f"archived chunks={len(archive.store)} bytes={sum(map(len, archive.store.values()))}"
+    )
+    if len(archive.store) > MAX_CHUNKS:
+        print(f"FAIL: {len(archive.store)} archived chunks, more than {MAX_CHUNKS}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+End-to-end benchmark suite: the compiled demo and web search graphs (`agent` of their modules,
+as langgraph.json loads them) driven through `ainvoke` at each concurrency level against local
+mock OpenAI and Tavily servers. Reports p50/p95/p99 turn latency, throughput, model and search
+calls per turn and peak RSS, and saves them as JSON to compare against an earlier run.
+
+    python -m benchmarks.suite --concurrency 1 8 32 --turns 64 --output results.json
+    python -m benchmarks.suite --compare results.json
+
+Web search turns alternate between search questions and small talk, every turn and level asks
+something new so that the intent and search caches only help within a turn. The mock model makes
+one tool call per turn and then answers, `--script` replaces that with a `ScriptedResponder`
+JSON script.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+from contextlib import ExitStack
+from typing import Optional
+
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    MockTavilyServer,
+    ScriptedResponder,
+    running_in_process,
+)
+from models.registry import get_model_registry
+from models.schema import ConnectionPoolConfig
+
+GRAPHS = ("demo", "web_search")
+# One tool call with the user's message as its string arguments, then a plain answer
+DEFAULT_SCRIPT = [{"tool_calls": [{}]}]
+# Relative change beyond which a metric is flagged in the comparison
+REGRESSION_THRESHOLD = 0.1
+
+
+def prompt(graph: str, i: int) -> str:
+    if graph == "demo":
+        return f"Multiply {i} and {i + 1}"
+    if i % 2:
+        return f"Hi there, how has your day been? ({i})"
+    return f"What are the latest news about topic {i}?"
+
+
+def server_requests(url: str) -> int:
+    with urllib.request.urlopen(f"{url}/stats") as response:
+        return json.load(response)["requests"]
+
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return rss / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_level(
+    graph: str,
+    agent,
+    concurrency: int,
+    turns: int,
+    urls: dict[str, str],
+    offset: int = 0,
+) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, errors = [], 0
+
+    async def turn(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                message = {"type": "human", "content": prompt(graph, offset + i)}
+                await agent.ainvoke({"messages": [message]})
+            except Exception:
+                errors += 1
+                return
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    before = {name: server_requests(url) for name, url in urls.items()}
+    start = time.perf_counter()
+    await asyncio.gather(*(turn(i) for i in range(turns)))
+    wall = time.perf_counter() - start
+    calls = {name: server_requests(url) - before[name] for name, url in urls.items()}
+
+    quantiles = (
+        statistics.quantiles(latencies, n=100) if len(latencies) > 1 else [0.0] * 99
+    )
+    return {
+        "graph": graph,
+        "concurrency": concurrency,
+        "turns": turns,
+        "errors": errors,
+        "p50_ms": round(quantiles[49], 2),
+        "p95_ms": round(quantiles[94], 2),
+        "p99_ms": round(quantiles[98], 2),
+        "throughput": round(len(latencies) / wall, 2),
+        "llm_calls_per_turn": round(calls["openai"] / turns, 2),
+        "search_calls_per_turn": round(calls["tavily"] / turns, 2),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+async def run_suite(args, urls: dict[str, str]) -> list[dict]:
+    from agents.demo import langchain_agent as demo
+    from agents.web_search_agent import langchain_agent as web_search
+
+    agents = {"demo": demo.agent, "web_search": web_search.agent}
+    results = []
+    for graph in args.graphs:
+        # One untimed turn builds the clients and compiles the inner agent
+        await agents[graph].ainvoke(
+            {"messages": [{"type": "human", "content": prompt(graph, -1)}]}
+        )
+        for level, concurrency in enumerate(args.concurrency):
+            result = await run_level(
+                graph,
+                agents[graph],
+                concurrency,
+                args.turns,
+                urls,
+                offset=level * args.turns,
+            )
+            results.append(result)
+            print(
+                f"{graph:<10} c={concurrency:<4} p50={result['p50_ms']:8.1f}ms "
+                f"p95={result['p95_ms']:8.1f}ms p99={result['p99_ms']:8.1f}ms "
+                f"throughput={result['throughput']:7.1f}/s "
+                f"llm/turn={result['llm_calls_per_turn']:4.2f} "
+                f"search/turn={result['search_calls_per_turn']:4.2f} "
+                f"rss={result['peak_rss_mb']:6.1f}MB errors={result['errors']}"
+            )
+    return results
+
+
+def compare(results: list[dict], path: str) -> None:
+    """Print the change of each metric against the results saved at `path`."""
+    with open(path) as f:
+        baseline = json.load(f)
+    previous = {(r["graph"], r["concurrency"]): r for r in baseline["results"]}
+    print(f"\nCompared with {path} (commit {baseline.get('commit')}):")
+    # Higher is better for throughput, lower for everything else
+    metrics = (
+        "p50_ms",
+        "p95_ms",
+        "p99_ms",
+        "throughput",
+        "llm_calls_per_turn",
+        "peak_rss_mb",
+    )
+    for result in results:
+        old = previous.get((result["graph"], result["concurrency"]))
+        if old is None:
+            continue
+        changes = []
+        for metric in metrics:
+            if not old[metric]:
+                continue
+            change = (result[metric] - old[metric]) / old[metric]
+            worse = -change if metric == "throughput" else change
+            flag = " REGRESSION" if worse > REGRESSION_THRESHOLD else ""
+            changes.append(f"{metric}={change:+.0%}{flag}")
+        label = f"{result['graph']:<10} c={result['concurrency']:<4}"
+        print(f"{label} {' '.join(changes)}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--graphs", nargs="+", choices=GRAPHS, default=list(GRAPHS))
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--turns", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--tokens-per-second", type=float, default=None)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--script", help="JSON tool-call script for the mock model")
+    parser.add_argument("--output", help="Save the results as JSON")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    args = parser.parse_args()
+
+    # Size the shared connection pool for the highest concurrency level before any model is created
+    connections = max(args.concurrency) * 2
+    get_model_registry().configure(
+        ConnectionPoolConfig(
+            max_connections=connections, max_keepalive_connections=connections
+        )
+    )
+
+    responder = (
+        ScriptedResponder.from_file(args.script)
+        if args.script
+        else ScriptedResponder(DEFAULT_SCRIPT)
+    )
+    with ExitStack() as stack:
+        openai_url = stack.enter_context(
+            running_in_process(
+                MockOpenAIServer,
+                latency=args.latency,
+                tokens_per_second=args.tokens_per_second,
+                responder=responder,
+            )
+        )
+        tavily_url = stack.enter_context(
+            running_in_process(MockTavilyServer, latency=args.search_latency)
+        )
+        # The graph modules read their settings on first use
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{openai_url}/v1",
+            TAVILY_API_KEY="mock",
+            TAVILY_API_BASE_URL=tavily_url,
+        )
+        results = asyncio.run(
+            run_suite(args, {"openai": openai_url, "tavily": tavily_url})
+        )
+
+    if args.compare:
+        compare(results, args.compare)
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "args": vars(args),
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+Prompt tokens and turn latency of a long demo thread with and without background summarization,
+against a local mock OpenAI server whose latency grows with the uncached prompt tokens
+(`--prefill-tokens-per-second`). Summaries are computed by worker threads between turns, so they
+only show up in the turn latency through the shorter prompts.
+
+The summarizer keeps only the latest summary of a thread, the script exits with code 1 if its store
+holds more than one after the thread.
+
+    python -m benchmarks.summarization --turns 40 --trigger-tokens 2000 --keep-tokens 600
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from langchain_core.messages import HumanMessage
+
+from agents.demo import langchain_agent
+from agents.demo.env import get_settings
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    default_responder,
+    running_in_process,
+)
+
+WORDS = (
+    "the quarterly budget lists rent travel salaries and hardware for each team".split()
+)
+
+
+def user_message(turn: int, words: int) -> str:
+    body = " ".join(WORDS[(turn + i) % len(WORDS)] for i in range(words))
+    return f"Turn {turn}: {body}. What is {turn} times 3?"
+
+
+def run_thread(args, summarization: bool) -> tuple[list[float], list[int]]:
+    """Latency in milliseconds and prompt tokens of every turn of one thread."""
+    os.environ["SUMMARIZATION"] = str(summarization).lower()
+    get_settings.cache_clear()
+    langchain_agent.get_summarizer.cache_clear()
+    langchain_agent.build_graph.cache_clear()
+    graph = langchain_agent.make_graph()
+    config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+
+    latencies, prompt_tokens = [], []
+    for turn in range(args.turns):
+        usage = UsageMetadataCallbackHandler()
+        message = HumanMessage(content=user_message(turn, args.words))
+        start = time.perf_counter()
+        graph.invoke({"messages": [message]}, {**config, "callbacks": [usage]})
+        latencies.append((time.perf_counter() - start) * 1000)
+        prompt_tokens.append(
+            sum(u["input_tokens"] for u in usage.usage_metadata.values())
+        )
+        # The user takes a moment to reply, which is when summaries are computed
+        time.sleep(args.think_time)
+    if (summarizer := langchain_agent.get_summarizer()) is not None:
+        summarizer.flush()
+    return latencies, prompt_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=40)
+    parser.add_argument("--words", type=int, default=60)
+    parser.add_argument("--trigger-tokens", type=int, default=2000)
+    parser.add_argument("--keep-tokens", type=int, default=600)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=20000)
+    parser.add_argument("--think-time", type=float, default=0.1)
+    args = parser.parse_args()
+
+    with running_in_process(
+        MockOpenAIServer,
+        latency=args.latency,
+        prefill_tokens_per_second=args.prefill_tokens_per_second,
+        responder=default_responder,
+    ) as url:
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{url}/v1",
+            CHECKPOINTER="memory",
+            SUMMARY_TRIGGER_TOKENS=str(args.trigger_tokens),
+            SUMMARY_KEEP_TOKENS=str(args.keep_tokens),
+        )
+        off_ms, off_tokens = run_thread(args, summarization=False)
+        on_ms, on_tokens = run_thread(args, summarization=True)
+        summarizer = langchain_agent.get_summarizer()
+        stats = summarizer.stats
+
+    # The second half of the thread, after the first summaries
+    half = args.turns // 2
+    print(
+        f"prompt tokens per turn, turns {half}-{args.turns}: "
+        f"{statistics.mean(off_tokens[half:]):.0f} without, "
+        f"{statistics.mean(on_tokens[half:]):.0f} with summarization "
+        f"(last turn {off_tokens[-1]} vs {on_tokens[-1]})"
+    )
+    print(
+        f"turn p50: {statistics.median(off_ms):.1f}ms without, "
+        f"{statistics.median(on_ms):.1f}ms with summarization, "
+        f"last {half} turns {statistics.median(off_ms[half:]):.1f}ms vs "
+        f"{statistics.median(on_ms[half:]):.1f}ms"
+    )
+    print(
+        f"background: {stats.summaries} summaries of {stats.input_tokens} tokens into "
+        f"{stats.summary_tokens}, {stats.seconds * 1000 / max(1, stats.summaries):.1f}ms each, "
+        f"errors={stats.errors}"
+    )
+    if len(summarizer.store) > 1:
+        print(f"FAIL: {len(summarizer.store)} summaries stored for one thread")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Cost of trimming chat history to the 5000-token window per turn, recounting the whole thread
+with `trim_messages` versus walking back over token counts cached when messages were appended.
+
+    python -m benchmarks.token_counting --sizes 1000 10000 --counter tiktoken
+"""
+
+import argparse
+import statistics
+import time
+
+from langchain.messages import AIMessage, HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately, trim_messages
+
+from agents.utils.tokens import (
+    get_token_counter,
+    token_counting_reducer,
+    trim_messages_by_cached_tokens,
+)
+
+
+def build_thread(size: int, reducer) -> list:
+    messages = []
+    for i in range(0, size, 2):
+        messages = reducer(
+            messages,
+            [
+                HumanMessage(content=f"Question {i} about the weather and the news."),
+                AIMessage(content=f"Answer {i}. " + "Some details. " * 20),
+            ],
+        )
+    return messages
+
+
+def measure(trim, messages, repeats: int) -> float:
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        trim(messages)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--counter", default="approximate")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    counter = get_token_counter(args.counter)
+    reducer = token_counting_reducer(counter)
+
+    for size in args.sizes:
+        messages = build_thread(size, reducer)
+        full = measure(
+            lambda m: trim_messages(
+                m,
+                strategy="last",
+                max_tokens=5000,
+                token_counter=count_tokens_approximately,
+                start_on="human",
+                end_on=("human", "tool"),
+            ),
+            messages,
+            args.repeats,
+        )
+        cached = measure(
+            lambda m: trim_messages_by_cached_tokens(m, 5000, counter),
+            messages,
+            args.repeats,
+        )
+        print(f"messages={size:>6}: trim_messages={full:.2f}ms cached={cached:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Wall-clock time of executing parallel tool calls one after another versus with `ToolExecutor`,
+using artificially slow sync and async stub tools.
+
+Both `execute` and `aexecute` are checked: all calls have to finish within twice the time of the
+slowest wave of `--max-concurrency` calls (2 x delay when they all fit), and each result has to
+come back in the position of its call. With a timeout a little longer than one call, no call
+waiting for a slot behind `--max-concurrency` others may time out either. The check fails with exit
+code 1 otherwise.
+
+    python -m benchmarks.tool_executor --calls 8 --delay 0.2
+"""
+
+import argparse
+import asyncio
+import math
+import sys
+import time
+
+from langchain_core.tools import StructuredTool, tool
+
+from agents.utils.tool_executor import ToolExecutor
+
+
+def make_tools(delay: float):
+    @tool
+    def slow_lookup(key: str) -> str:
+        """Look up `key` in a slow sync service."""
+        time.sleep(delay)
+        return f"value of {key}"
+
+    async def slow_fetch(url: str) -> str:
+        """Fetch `url` from a slow async service."""
+        await asyncio.sleep(delay)
+        return f"content of {url}"
+
+    return [slow_lookup, StructuredTool.from_function(coroutine=slow_fetch)]
+
+
+def expected_content(call: dict) -> str:
+    if call["name"] == "slow_lookup":
+        return f"value of {call['args']['key']}"
+    return f"content of {call['args']['url']}"
+
+
+def check(
+    name: str, messages: list, calls: list[dict], wall: float, budget: float
+) -> list[str]:
+    errors = []
+    if wall > budget:
+        errors.append(f"{name} took {wall:.3f}s, more than {budget:.3f}s")
+    if [m.tool_call_id for m in messages] != [c["id"] for c in calls]:
+        errors.append(f"{name} returned the results out of call order")
+    elif [m.content for m in messages] != [expected_content(c) for c in calls]:
+        errors.append(f"{name} returned a result for the wrong call")
+    return errors
+
+
+def make_calls(count: int) -> list[dict]:
+    calls = []
+    for i in range(count):
+        if i % 2 == 0:
+            name, args = "slow_lookup", {"key": f"k{i}"}
+        else:
+            name, args = "slow_fetch", {"url": f"u{i}"}
+        calls.append(
+            {"name": name, "args": args, "id": f"call_{i}", "type": "tool_call"}
+        )
+    return calls
+
+
+def check_queued_timeouts(tools: list, delay: float) -> list[str]:
+    """Calls that wait for a slot have all of their timeout once they run."""
+    executor = ToolExecutor(tools, max_concurrency=2, timeout=delay * 1.5)
+    calls = make_calls(4)
+    errors = []
+    for name, messages in (
+        ("execute", executor.execute(calls)),
+        ("aexecute", asyncio.run(executor.aexecute(calls))),
+    ):
+        if timed_out := [m.tool_call_id for m in messages if m.status == "error"]:
+            errors.append(f"{name} timed out the queued calls {timed_out}")
+    return errors
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=8)
+    parser.add_argument("--delay", type=float, default=0.2)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    tools = make_tools(args.delay)
+    tools_by_name = {t.name: t for t in tools}
+    executor = ToolExecutor(tools, max_concurrency=args.max_concurrency)
+    calls = make_calls(args.calls)
+
+    start = time.perf_counter()
+    for call in calls:
+        asyncio.run(tools_by_name[call["name"]].ainvoke(call["args"]))
+    print(f"sequential: {time.perf_counter() - start:.3f}s")
+
+    # Calls run in waves of max_concurrency, twice their sleep leaves room for the overhead
+    budget = 2 * args.delay * math.ceil(args.calls / args.max_concurrency)
+    errors = []
+
+    start = time.perf_counter()
+    messages = executor.execute(calls)
+    wall = time.perf_counter() - start
+    print(f"   execute: {wall:.3f}s")
+    errors += check("execute", messages, calls, wall, budget)
+
+    start = time.perf_counter()
+    messages = asyncio.run(executor.aexecute(calls))
+    wall = time.perf_counter() - start
+    print(f"  aexecute: {wall:.3f}s")
+    errors += check("aexecute", messages, calls, wall, budget)
+    errors += check_queued_timeouts(tools, args.delay)
+
+    for error in errors:
+        print(f"FAIL: {error}")
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Demo math agent on multi-step arithmetic prompts against a local mock OpenAI server, step by
+step (one model round trip per level of the expression, independent operations as parallel
+tool calls) and in planner mode (the whole calculation as one `evaluate_plan` call).
+
+    python -m benchmarks.tool_plan --prompts 20 --latency 0.2
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage
+
+from agents.demo import langchain_agent
+from agents.demo.env import get_settings
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    arithmetic_responder,
+    running_in_process,
+)
+
+
+def expression(depth: int, rng: random.Random) -> str:
+    """A balanced expression of additions and multiplications `depth` levels deep."""
+    if depth == 0:
+        return str(rng.randint(1, 9))
+    op = rng.choice("+*")
+    return f"({expression(depth - 1, rng)} {op} {expression(depth - 1, rng)})"
+
+
+def run(name: str, prompts: list[tuple[str, float]], planner: bool) -> None:
+    os.environ["PLANNER_MODE"] = str(planner).lower()
+    get_settings.cache_clear()
+    graph = langchain_agent.make_graph()
+    latencies, llm_calls, wrong = [], [], 0
+    for prompt, expected in prompts:
+        start = time.perf_counter()
+        state = graph.invoke({"messages": [HumanMessage(content=prompt)]})
+        latencies.append((time.perf_counter() - start) * 1000)
+        llm_calls.append(state["llm_calls"])
+        wrong += f"The result is {expected}." != state["messages"][-1].text.strip()
+    print(
+        f"{name:<8} llm_calls/turn={statistics.mean(llm_calls):4.1f} "
+        f"p50={statistics.median(latencies):7.1f}ms max={max(latencies):7.1f}ms "
+        f"total={sum(latencies) / 1000:6.2f}s wrong={wrong}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--prompts", type=int, default=20)
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    prompts = []
+    for i in range(args.prompts):
+        # 4 to 16 operations, 3 to 5 levels deep
+        text = f"{expression(2 + i % 3, rng)} / {rng.randint(1, 9)}"
+        prompts.append((f"Evaluate {text}", eval(text)))
+
+    with running_in_process(
+        MockOpenAIServer, latency=args.latency, responder=arithmetic_responder
+    ) as url:
+        os.environ.update(OPENAI_API_KEY="mock", OPENAI_BASE_URL=f"{url}/v1")
+        run("steps", prompts, planner=False)
+        run("planner", prompts, planner=True)
+
+
+if __name__ == "__main__":
+    main()
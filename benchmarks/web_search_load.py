@@ -0,0 +1,79 @@
+"""
+Concurrent-session load test for the web search agent against local mock OpenAI and Tavily servers.
+Every session runs one search turn (classify, rewrite, inner agent with one tool call) through `agent.ainvoke`.
+
+    python -m benchmarks.web_search_load --concurrency 1 10 50 200 --latency 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from benchmarks.mock_servers import (
+    MockOpenAIServer,
+    MockTavilyServer,
+    agent_responder,
+    running_in_process,
+)
+from models.registry import get_model_registry
+from models.schema import ConnectionPoolConfig
+
+
+async def run_sessions(agent, concurrency: int) -> list[float]:
+    async def session(i: int) -> float:
+        start = time.perf_counter()
+        await agent.ainvoke(
+            {"messages": [{"type": "human", "content": f"latest news {i}"}]}
+        )
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(session(i) for i in range(concurrency)))
+
+
+async def measure(agent, levels: list[int]) -> None:
+    for concurrency in levels:
+        start = time.perf_counter()
+        latencies = await run_sessions(agent, concurrency)
+        wall = time.perf_counter() - start
+        print(
+            f"concurrency={concurrency:>4} wall={wall:.2f}s "
+            f"throughput={concurrency / wall:.1f} sessions/s "
+            f"p50={statistics.median(latencies):.2f}s max={max(latencies):.2f}s"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 50, 200])
+    parser.add_argument("--latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    # Size the shared connection pool for the highest concurrency level before any model is created.
+    get_model_registry().configure(
+        ConnectionPoolConfig(
+            max_connections=max(args.concurrency) * 2,
+            max_keepalive_connections=max(args.concurrency) * 2,
+        )
+    )
+
+    with (
+        running_in_process(
+            MockOpenAIServer, latency=args.latency, responder=agent_responder
+        ) as openai_url,
+        running_in_process(MockTavilyServer, latency=args.latency) as tavily_url,
+    ):
+        os.environ.update(
+            OPENAI_API_KEY="mock",
+            OPENAI_BASE_URL=f"{openai_url}/v1",
+            TAVILY_API_KEY="mock",
+            TAVILY_API_BASE_URL=tavily_url,
+        )
+        from agents.web_search_agent.langchain_agent import agent
+
+        asyncio.run(measure(agent, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,374 @@
+import asyncio
+import html
+import threading
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Generic, Optional, Sequence, TypeVar
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AnyMessage,
+    HumanMessage,
+    SystemMessage,
+    convert_to_messages,
+)
+from langchain_core.runnables import Runnable, RunnableConfig, RunnableLambda
+from pydantic import BaseModel, Field, create_model
+
+I = TypeVar("I")
+O = TypeVar("O")
+
+BatchFn = Callable[[list[I]], list[Any]]
+AsyncBatchFn = Callable[[list[I]], Awaitable[list[Any]]]
+
+
+@dataclass
+class BatchStats:
+    batches: int = 0
+    items: int = 0
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+
+@dataclass
+class _SyncPending:
+    item: Any
+    done: threading.Event = field(default_factory=threading.Event)
+    result: Any = None
+
+
+@dataclass
+class _LoopPending:
+    items: list = field(default_factory=list)
+    futures: list = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+
+
+def _checked(results: Sequence[Any], count: int) -> list[Any]:
+    # Results can't be matched to items by position when some are missing, and callers
+    # without one would wait forever
+    results = list(results)
+    if len(results) != count:
+        raise ValueError(
+            f"The batch function returned {len(results)} results for {count} items"
+        )
+    return results
+
+
+class MicroBatcher(Generic[I, O]):
+    """
+    Collect concurrent requests for up to `max_wait` seconds, or until `max_batch_size` are
+    waiting, and run them as one batch. Each caller gets its own result back.
+
+    `batch_fn` and `abatch_fn` take a list of items and return one result per item, in order.
+    A result that is an exception is raised to its caller only, an exception raised by the batch
+    function itself, or a wrong number of results, is raised to every caller of the batch.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Optional[BatchFn] = None,
+        abatch_fn: Optional[AsyncBatchFn] = None,
+        max_batch_size: int = 16,
+        max_wait: float = 0.005,
+    ):
+        self.batch_fn = batch_fn
+        self.abatch_fn = abatch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = BatchStats()
+        self._lock = threading.Lock()
+        self._sync_pending: list[_SyncPending] = []
+        self._timer: Optional[threading.Timer] = None
+        # Futures are bound to their event loop, so async requests are batched per loop
+        self._loops: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, _LoopPending
+        ] = weakref.WeakKeyDictionary()
+        # The event loop only keeps weak references to tasks, running batches are kept here
+        self._tasks: set[asyncio.Task] = set()
+
+    def _record(self, size: int) -> None:
+        with self._lock:
+            self.stats.batches += 1
+            self.stats.items += size
+
+    def submit(self, item: I) -> O:
+        """Add `item` to the current batch and block until its result is available."""
+        if self.batch_fn is None:
+            raise NotImplementedError("This batcher has no sync batch function")
+        pending = _SyncPending(item)
+        batch = None
+        with self._lock:
+            self._sync_pending.append(pending)
+            if len(self._sync_pending) >= self.max_batch_size:
+                batch = self._take_sync_batch()
+            elif len(self._sync_pending) == 1:
+                self._timer = threading.Timer(self.max_wait, self._flush_sync)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch:
+            self._run_sync(batch)
+        pending.done.wait()
+        if isinstance(pending.result, BaseException):
+            raise pending.result
+        return pending.result
+
+    def _take_sync_batch(self) -> list[_SyncPending]:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch = self._sync_pending[: self.max_batch_size]
+        self._sync_pending = self._sync_pending[self.max_batch_size :]
+        return batch
+
+    def _flush_sync(self) -> None:
+        with self._lock:
+            batch = self._take_sync_batch()
+        if batch:
+            self._run_sync(batch)
+
+    def _run_sync(self, batch: list[_SyncPending]) -> None:
+        self._record(len(batch))
+        try:
+            results = _checked(self.batch_fn([p.item for p in batch]), len(batch))
+        except Exception as e:
+            results = [e] * len(batch)
+        for pending, result in zip(batch, results):
+            pending.result = result
+            pending.done.set()
+
+    async def asubmit(self, item: I) -> O:
+        """Add `item` to the current batch of the running event loop and wait for its result."""
+        if self.abatch_fn is None:
+            raise NotImplementedError("This batcher has no async batch function")
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        pending = self._loops.setdefault(loop, _LoopPending())
+        pending.items.append(item)
+        pending.futures.append(future)
+        if len(pending.items) >= self.max_batch_size:
+            self._flush_async(loop)
+        elif len(pending.items) == 1:
+            pending.timer = loop.call_later(self.max_wait, self._flush_async, loop)
+        return await future
+
+    def _flush_async(self, loop: asyncio.AbstractEventLoop) -> None:
+        pending = self._loops.get(loop)
+        if pending is None or not pending.items:
+            return
+        if pending.timer is not None:
+            pending.timer.cancel()
+        items, futures = (
+            pending.items[: self.max_batch_size],
+            pending.futures[: self.max_batch_size],
+        )
+        pending.items = pending.items[self.max_batch_size :]
+        pending.futures = pending.futures[self.max_batch_size :]
+        pending.timer = None
+        if pending.items:
+            pending.timer = loop.call_later(self.max_wait, self._flush_async, loop)
+        task = loop.create_task(self._run_async(items, futures))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_async(self, items: list, futures: list[asyncio.Future]) -> None:
+        self._record(len(items))
+        try:
+            results = _checked(await self.abatch_fn(items), len(items))
+        except Exception as e:
+            results = [e] * len(items)
+        for future, result in zip(futures, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+class ConcurrencyLimit:
+    """
+    At most `max_concurrency` calls in flight at once across all runnables wrapped by `wrap` and
+    all batches run through them, where `batch(config={"max_concurrency": ...})` only bounds each
+    batch on its own. Async calls are limited per event loop.
+    """
+
+    def __init__(self, max_concurrency: Optional[int]):
+        self.max_concurrency = max_concurrency
+        self._semaphore = (
+            threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        )
+        # asyncio semaphores are bound to the event loop they are first used on
+        self._loops: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, asyncio.Semaphore
+        ] = weakref.WeakKeyDictionary()
+
+    def wrap(self, runnable: Runnable) -> Runnable:
+        if self._semaphore is None:
+            return runnable
+
+        def invoke(item: Any, config: RunnableConfig) -> Any:
+            with self._semaphore:
+                return runnable.invoke(item, config)
+
+        async def ainvoke(item: Any, config: RunnableConfig) -> Any:
+            semaphore = self._loops.setdefault(
+                asyncio.get_running_loop(), asyncio.Semaphore(self.max_concurrency)
+            )
+            async with semaphore:
+                return await runnable.ainvoke(item, config)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=runnable.get_name())
+
+
+def runnable_batcher(
+    runnable: Runnable,
+    max_batch_size: int = 16,
+    max_wait: float = 0.005,
+    max_concurrency: Optional[int] = None,
+) -> MicroBatcher:
+    """
+    Batch calls to `runnable` through `batch`/`abatch`, with at most `max_concurrency` requests in
+    flight across all batches. This bounds the load on the provider, but every item is still its
+    own request, so it doesn't raise throughput: that is capped at `max_concurrency` divided by
+    the request latency.
+    """
+    runnable = ConcurrencyLimit(max_concurrency).wrap(runnable)
+    return MicroBatcher(
+        batch_fn=lambda items: runnable.batch(items, return_exceptions=True),
+        abatch_fn=lambda items: runnable.abatch(items, return_exceptions=True),
+        max_batch_size=max_batch_size,
+        max_wait=max_wait,
+    )
+
+
+MULTI_ITEM_INSTRUCTIONS = """
+The input contains {count} independent requests, each inside <request id="..."> tags, with <, >
+and & inside a request escaped as &lt;, &gt; and &amp;. Apply the instructions above to each
+request on its own, and return exactly {count} results, each with the id of its request.
+"""
+
+
+def _render_request(index: int, messages: Sequence[AnyMessage]) -> str:
+    # Escaped, so that a request can't close its tag and pose as another one
+    lines = [
+        f"{m.type}: {html.escape(m.text, quote=False)}"
+        for m in convert_to_messages(messages)
+    ]
+    return f'<request id="{index}">\n' + "\n".join(lines) + "\n</request>"
+
+
+class StructuredBatch:
+    """
+    Answer several independent structured-output requests with one model call.
+
+    Each item is a conversation (a list of messages) that would otherwise be sent after
+    `system_prompt` on its own. The conversations are rendered into a single prompt and the
+    model returns a list of `schema` instances, each with the id of its request. Unless the ids are
+    exactly those of the requests, the batch falls back to one call per item. At most
+    `max_concurrency` model calls of all batches are in flight at once.
+
+    Results have the shape of `with_structured_output(schema, include_raw=True)`. The batch's
+    model message is attached to the first result only, so its token usage is counted once.
+    """
+
+    def __init__(
+        self,
+        model: BaseChatModel,
+        schema: type[BaseModel],
+        system_prompt: str,
+        max_concurrency: Optional[int] = None,
+    ):
+        self.system_prompt = system_prompt
+        self.max_concurrency = max_concurrency
+        self.schema = schema
+        item_schema = create_model(
+            f"{schema.__name__}Item",
+            __base__=schema,
+            id=(int, Field(description="Id of the request this result answers")),
+        )
+        batch_schema = create_model(
+            f"{schema.__name__}Batch", results=(list[item_schema], ...)
+        )
+        limit = ConcurrencyLimit(max_concurrency)
+        self.batch_model = limit.wrap(
+            model.with_structured_output(batch_schema, include_raw=True)
+        )
+        self.item_model = limit.wrap(
+            model.with_structured_output(schema, include_raw=True)
+        )
+
+    def _prompt(self, items: list[Sequence[AnyMessage]]) -> list[AnyMessage]:
+        return [
+            SystemMessage(
+                content=self.system_prompt
+                + "\n"
+                + MULTI_ITEM_INSTRUCTIONS.format(count=len(items))
+            ),
+            HumanMessage(
+                content="\n\n".join(
+                    _render_request(i, messages) for i, messages in enumerate(items)
+                )
+            ),
+        ]
+
+    def _single_prompt(self, messages: Sequence[AnyMessage]) -> list[AnyMessage]:
+        return [SystemMessage(content=self.system_prompt), *messages]
+
+    def _split(self, output: dict, count: int) -> Optional[list[dict]]:
+        parsed = output["parsed"]
+        if parsed is None:
+            return None
+        by_id = {result.id: result for result in parsed.results}
+        if len(parsed.results) != count or by_id.keys() != set(range(count)):
+            return None
+        return [
+            {
+                "raw": output["raw"] if i == 0 else None,
+                "parsed": self.schema.model_validate(
+                    by_id[i].model_dump(exclude={"id"})
+                ),
+                "parsing_error": None,
+            }
+            for i in range(count)
+        ]
+
+    def batch(self, items: list[Sequence[AnyMessage]]) -> list[Any]:
+        if len(items) > 1:
+            output = self.batch_model.invoke(self._prompt(items))
+            results = self._split(output, len(items))
+            if results is not None:
+                return results
+        return self.item_model.batch(
+            [self._single_prompt(m) for m in items], return_exceptions=True
+        )
+
+    async def abatch(self, items: list[Sequence[AnyMessage]]) -> list[Any]:
+        if len(items) > 1:
+            output = await self.batch_model.ainvoke(self._prompt(items))
+            results = self._split(output, len(items))
+            if results is not None:
+                return results
+        return await self.item_model.abatch(
+            [self._single_prompt(m) for m in items], return_exceptions=True
+        )
+
+
+def structured_batcher(
+    model: BaseChatModel,
+    schema: type[BaseModel],
+    system_prompt: str,
+    max_batch_size: int = 16,
+    max_wait: float = 0.005,
+    max_concurrency: Optional[int] = None,
+) -> MicroBatcher:
+    """Micro-batch structured-output requests into single multi-item prompts, see `StructuredBatch`."""
+    batch = StructuredBatch(model, schema, system_prompt, max_concurrency)
+    return MicroBatcher(
+        batch_fn=batch.batch,
+        abatch_fn=batch.abatch,
+        max_batch_size=max_batch_size,
+        max_wait=max_wait,
+    )
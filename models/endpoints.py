@@ -0,0 +1,356 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import httpx
+
+from .schema import Endpoint, RoutingConfig
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    failures: int = 0
+    # Hedged duplicates sent to this endpoint, and how many of them answered first
+    hedges: int = 0
+    hedge_wins: int = 0
+
+
+class EndpointState:
+    """Latency window and circuit breaker of one endpoint."""
+
+    def __init__(self, endpoint: Endpoint, routing: RoutingConfig):
+        self.endpoint = endpoint
+        self.base_url = endpoint.base_url.rstrip("/")
+        self.url = httpx.URL(self.base_url)
+        self.latencies: deque[float] = deque(maxlen=routing.latency_window)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.open_until = 0.0
+        self.trial_in_flight = False
+        self.stats = EndpointStats()
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class EndpointPool:
+    """
+    Pick endpoints by weight, skipping the ones whose circuit breaker is open.
+
+    An endpoint's breaker opens after `failure_threshold` consecutive failures. Once
+    `reset_timeout` has passed, one trial request is let through (half open): its success
+    closes the breaker, its failure opens it again. When every breaker is open, requests still
+    go to the endpoint that will be retried soonest rather than failing outright.
+    """
+
+    def __init__(
+        self,
+        endpoints: Sequence[Endpoint],
+        base_url: str,
+        routing: Optional[RoutingConfig] = None,
+    ):
+        if not endpoints:
+            raise ValueError("At least one endpoint is required")
+        self.routing = routing or RoutingConfig()
+        self.base_url = base_url.rstrip("/")
+        self.states = [EndpointState(e, self.routing) for e in endpoints]
+        self._lock = threading.Lock()
+        self._random = random.Random()
+
+    def _eligible(self, state: EndpointState, now: float) -> bool:
+        if state.state == CLOSED:
+            return True
+        return now >= state.open_until and not state.trial_in_flight
+
+    def choose(
+        self, exclude: Sequence[EndpointState] = (), hedge: bool = False
+    ) -> Optional[EndpointState]:
+        """Pick an endpoint not in `exclude` by weight, or None when all are excluded."""
+        now = time.monotonic()
+        with self._lock:
+            candidates = [s for s in self.states if s not in exclude]
+            if not candidates:
+                return None
+            eligible = [s for s in candidates if self._eligible(s, now)]
+            weighted = [s for s in eligible if s.endpoint.weight > 0]
+            if weighted:
+                state = self._random.choices(
+                    weighted, weights=[s.endpoint.weight for s in weighted]
+                )[0]
+            elif eligible:
+                state = self._random.choice(eligible)
+            else:
+                state = min(candidates, key=lambda s: s.open_until)
+            if state.state != CLOSED:
+                state.state = HALF_OPEN
+                state.trial_in_flight = True
+            state.stats.requests += 1
+            state.stats.hedges += hedge
+            return state
+
+    def record_hedge_win(self, state: EndpointState) -> None:
+        with self._lock:
+            state.stats.hedge_wins += 1
+
+    def release(self, state: EndpointState) -> None:
+        """Forget a request that was cancelled before it completed."""
+        with self._lock:
+            state.trial_in_flight = False
+
+    def finish(
+        self, state: EndpointState, outcome: Optional[tuple[float, bool]]
+    ) -> None:
+        """
+        Record the (latency, ok) outcome of a request to `state`, or release it when it has none.
+        Called in a `finally`, so that a half-open endpoint never waits for its trial forever.
+        """
+        if outcome is None:
+            self.release(state)
+        else:
+            self.record(state, outcome[0], ok=outcome[1])
+
+    def record(self, state: EndpointState, latency: float, ok: bool) -> None:
+        with self._lock:
+            state.trial_in_flight = False
+            if ok:
+                state.latencies.append(latency)
+                state.consecutive_failures = 0
+                state.state = CLOSED
+                return
+            state.stats.failures += 1
+            state.consecutive_failures += 1
+            if (
+                state.state == HALF_OPEN
+                or state.consecutive_failures >= self.routing.failure_threshold
+            ):
+                state.state = OPEN
+                state.open_until = time.monotonic() + self.routing.reset_timeout
+
+    def hedge_delay(self, state: EndpointState) -> Optional[float]:
+        """Seconds to wait for `state` before hedging, None to not hedge."""
+        if not self.routing.hedge or len(self.states) < 2:
+            return None
+        if self.routing.hedge_after is not None:
+            return self.routing.hedge_after
+        with self._lock:
+            if len(state.latencies) < self.routing.hedge_min_samples:
+                return None
+            return state.percentile(self.routing.hedge_percentile)
+
+    def failed(self, response: httpx.Response) -> bool:
+        return response.status_code in self.routing.failover_status_codes
+
+    def rewrite(self, request: httpx.Request, state: EndpointState) -> httpx.Request:
+        """Copy of `request` addressed to `state`'s endpoint instead of the client's base URL."""
+        url = str(request.url)
+        if url.startswith(self.base_url):
+            url = state.base_url + url[len(self.base_url) :]
+        headers = request.headers.copy()
+        headers["Host"] = state.url.netloc.decode("ascii")
+        if state.endpoint.api_key:
+            headers["Authorization"] = f"Bearer {state.endpoint.api_key}"
+        return httpx.Request(
+            request.method,
+            url,
+            headers=headers,
+            content=request.content,
+            extensions=request.extensions,
+        )
+
+
+class BalancedTransport(httpx.BaseTransport):
+    """
+    Send each request to an endpoint of `pool` through `transport`, which holds the connections.
+
+    If the endpoint has not answered after its hedge delay, a duplicate goes to a second endpoint
+    and the first response wins, the other one is closed. Connection errors and failover status
+    codes are retried on the endpoints that have not been tried yet. Latency is measured up to the
+    response headers, so streamed responses are hedged on their first byte.
+    """
+
+    def __init__(
+        self, pool: EndpointPool, transport: httpx.BaseTransport, max_workers: int = 32
+    ):
+        self.pool = pool
+        self.transport = transport
+        # Sync hedging needs both requests in flight at once, so they run on worker threads
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="hedge"
+        )
+
+    def _send(self, request: httpx.Request, state: EndpointState) -> httpx.Response:
+        start, outcome = time.perf_counter(), None
+        try:
+            response = self.transport.handle_request(self.pool.rewrite(request, state))
+            outcome = (time.perf_counter() - start, not self.pool.failed(response))
+            return response
+        except httpx.TransportError:
+            outcome = (0.0, False)
+            raise
+        finally:
+            # Cancelled or failed otherwise, the trial ended without an outcome
+            self.pool.finish(state, outcome)
+
+    def _hedged(
+        self, request: httpx.Request, primary: EndpointState, tried: list
+    ) -> httpx.Response:
+        delay = self.pool.hedge_delay(primary)
+        if delay is None:
+            return self._send(request, primary)
+        first = self._executor.submit(self._send, request, primary)
+        done, _ = wait([first], timeout=delay)
+        hedge = None if done else self.pool.choose(exclude=tried, hedge=True)
+        if hedge is None:
+            return first.result()
+        tried.append(hedge)
+        second = self._executor.submit(self._send, request, hedge)
+
+        pending, outcome = {first, second}, None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if outcome is None or (not self._ok(outcome) and self._ok(future)):
+                    if outcome is not None:
+                        _close(outcome)
+                    outcome = future
+                else:
+                    _close(future)
+            if self._ok(outcome):
+                break
+        # A slower response that is still in flight is closed once it arrives
+        for future in pending:
+            future.add_done_callback(_close)
+        if outcome is second and self._ok(second):
+            self.pool.record_hedge_win(hedge)
+        return outcome.result()
+
+    def _ok(self, future: Future) -> bool:
+        return future.exception() is None and not self.pool.failed(future.result())
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        tried: list[EndpointState] = []
+        while True:
+            state = self.pool.choose(exclude=tried)
+            tried.append(state)
+            try:
+                response = self._hedged(request, state, tried)
+            except httpx.TransportError:
+                if len(tried) >= len(self.pool.states):
+                    raise
+                continue
+            if not self.pool.failed(response) or len(tried) >= len(self.pool.states):
+                return response
+            response.close()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self.transport.close()
+
+
+class AsyncBalancedTransport(httpx.AsyncBaseTransport):
+    """The async counterpart of `BalancedTransport`, losing hedged requests are cancelled."""
+
+    def __init__(self, pool: EndpointPool, transport: httpx.AsyncBaseTransport):
+        self.pool = pool
+        self.transport = transport
+
+    async def _send(
+        self, request: httpx.Request, state: EndpointState
+    ) -> httpx.Response:
+        start, outcome = time.perf_counter(), None
+        try:
+            response = await self.transport.handle_async_request(
+                self.pool.rewrite(request, state)
+            )
+            outcome = (time.perf_counter() - start, not self.pool.failed(response))
+            return response
+        except httpx.TransportError:
+            outcome = (0.0, False)
+            raise
+        finally:
+            # Cancelled or failed otherwise, the trial ended without an outcome
+            self.pool.finish(state, outcome)
+
+    def _ok(self, task: asyncio.Task) -> bool:
+        return task.exception() is None and not self.pool.failed(task.result())
+
+    async def _hedged(
+        self, request: httpx.Request, primary: EndpointState, tried: list
+    ) -> httpx.Response:
+        delay = self.pool.hedge_delay(primary)
+        if delay is None:
+            return await self._send(request, primary)
+        first = asyncio.ensure_future(self._send(request, primary))
+        pending = {first}
+        try:
+            done, _ = await asyncio.wait(pending, timeout=delay)
+            hedge = None if done else self.pool.choose(exclude=tried, hedge=True)
+            if hedge is None:
+                return await first
+            tried.append(hedge)
+            second = asyncio.ensure_future(self._send(request, hedge))
+            pending.add(second)
+
+            outcome = None
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if outcome is None or (not self._ok(outcome) and self._ok(task)):
+                        if outcome is not None:
+                            await _aclose(outcome)
+                        outcome = task
+                    else:
+                        await _aclose(task)
+                if self._ok(outcome):
+                    break
+            if outcome is second and self._ok(second):
+                self.pool.record_hedge_win(hedge)
+            return outcome.result()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        await request.aread()
+        tried: list[EndpointState] = []
+        while True:
+            state = self.pool.choose(exclude=tried)
+            tried.append(state)
+            try:
+                response = await self._hedged(request, state, tried)
+            except httpx.TransportError:
+                if len(tried) >= len(self.pool.states):
+                    raise
+                continue
+            if not self.pool.failed(response) or len(tried) >= len(self.pool.states):
+                return response
+            await response.aclose()
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def _close(future: Future) -> None:
+    if future.exception() is None:
+        future.result().close()
+
+
+async def _aclose(task: asyncio.Task) -> None:
+    if task.exception() is None:
+        await task.result().aclose()
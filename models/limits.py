@@ -0,0 +1,391 @@
+import asyncio
+import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Mapping, Optional, Union
+
+import httpx
+
+from .schema import RateLimitConfig
+
+THROTTLED_STATUS_CODES = (429, 503)
+
+
+@dataclass
+class LimiterStats:
+    calls: int = 0
+    throttled: int = 0
+    retries: int = 0
+    # Total seconds calls waited for budget or a concurrency slot
+    wait_time: float = 0.0
+
+
+class TokenBucket:
+    """
+    Budget of `rate` units per minute, of which `burst_seconds` worth can be spent at once.
+
+    `reserve` takes the units right away and returns how long the caller has to wait for them,
+    so callers are served in order and a reservation larger than the bucket still goes through.
+    """
+
+    def __init__(self, rate: float, burst_seconds: float = 10.0):
+        self.rate = rate / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float = 1.0) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= amount
+            return max(0.0, -self.tokens / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Concurrency limit adjusted by additive increase, multiplicative decrease (AIMD).
+
+    Each successful call raises the limit by 1/limit, about one per round of `limit` calls, a
+    throttled call multiplies it by `backoff`. Only calls that started after the last decrease
+    can decrease it again, so one burst of 429s counts once. Sync and async callers on any
+    event loop share the limit and are admitted in order.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.limit = float(
+            config.initial_concurrency if config.adaptive else config.max_concurrency
+        )
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._lock = threading.Lock()
+        self._waiters: deque[
+            Union[threading.Event, tuple[asyncio.AbstractEventLoop, asyncio.Future]]
+        ] = deque()
+
+    def _admit(self) -> bool:
+        if not self._waiters and self.in_flight < int(self.limit):
+            self.in_flight += 1
+            return True
+        return False
+
+    def acquire(self) -> float:
+        """Wait for a slot, return the start time to pass to `release`."""
+        with self._lock:
+            if self._admit():
+                return time.monotonic()
+            event = threading.Event()
+            self._waiters.append(event)
+        # The releasing caller counts the slot as taken before it wakes us
+        event.wait()
+        return time.monotonic()
+
+    async def aacquire(self) -> float:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._admit():
+                return time.monotonic()
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                handed_over = (loop, future) not in self._waiters
+                if not handed_over:
+                    self._waiters.remove((loop, future))
+            # A slot handed over before the cancellation is returned here, one handed over
+            # after it by `_hand_over`
+            if handed_over and future.done() and not future.cancelled():
+                self.release(None)
+            raise
+        return time.monotonic()
+
+    def _hand_over(self, future: asyncio.Future) -> None:
+        if future.cancelled():
+            self.release(None)
+        else:
+            future.set_result(None)
+
+    def release(self, started: Optional[float], throttled: bool = False) -> None:
+        with self._lock:
+            self.in_flight -= 1
+            if started is not None and self.config.adaptive:
+                if not throttled:
+                    self.limit = min(
+                        self.config.max_concurrency, self.limit + 1 / self.limit
+                    )
+                elif started >= self._last_decrease:
+                    self.limit = max(
+                        self.config.min_concurrency, self.limit * self.config.backoff
+                    )
+                    self._last_decrease = time.monotonic()
+            woken = []
+            while self._waiters and self.in_flight < int(self.limit):
+                self.in_flight += 1
+                woken.append(self._waiters.popleft())
+        for waiter in woken:
+            if isinstance(waiter, threading.Event):
+                waiter.set()
+            else:
+                loop, future = waiter
+                loop.call_soon_threadsafe(self._hand_over, future)
+
+
+@dataclass
+class Permit:
+    started: float
+
+
+class OutboundLimiter:
+    """
+    Request (RPM) and token (TPM) budgets plus an adaptive concurrency limit for one endpoint.
+    Wrap each call in `acquire`/`release`, or `aacquire`/`release`, and report whether the
+    endpoint throttled it.
+    """
+
+    def __init__(self, config: RateLimitConfig):
+        self.config = config
+        self.requests = (
+            TokenBucket(config.rpm, config.burst_seconds) if config.rpm else None
+        )
+        self.tokens = (
+            TokenBucket(config.tpm, config.burst_seconds) if config.tpm else None
+        )
+        self.concurrency = AdaptiveConcurrencyLimiter(config)
+        self.stats = LimiterStats()
+        self._lock = threading.Lock()
+
+    def _reserve(self, tokens: float) -> float:
+        delay = self.requests.reserve() if self.requests else 0.0
+        if self.tokens and tokens:
+            delay = max(delay, self.tokens.reserve(tokens))
+        return delay
+
+    def _record(self, wait: float = 0.0, **counts: int) -> None:
+        with self._lock:
+            self.stats.wait_time += wait
+            for name, count in counts.items():
+                setattr(self.stats, name, getattr(self.stats, name) + count)
+
+    def acquire(self, tokens: float = 0) -> Permit:
+        start = time.monotonic()
+        if delay := self._reserve(tokens):
+            time.sleep(delay)
+        started = self.concurrency.acquire()
+        self._record(time.monotonic() - start, calls=1)
+        return Permit(started)
+
+    async def aacquire(self, tokens: float = 0) -> Permit:
+        start = time.monotonic()
+        if delay := self._reserve(tokens):
+            await asyncio.sleep(delay)
+        started = await self.concurrency.aacquire()
+        self._record(time.monotonic() - start, calls=1)
+        return Permit(started)
+
+    def release(self, permit: Permit, throttled: bool = False) -> None:
+        self.concurrency.release(permit.started, throttled)
+        if throttled:
+            self._record(throttled=1)
+
+    def retry_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before retrying a throttled call, with jitter when the endpoint gave no hint."""
+        if retry_after is None:
+            retry_after = 0.1 * 2**attempt * (0.5 + random.random())
+        self._record(retries=1)
+        return min(retry_after, self.config.max_retry_delay)
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """
+    Tokens a chat completion request counts against a TPM budget: the prompt estimated at four
+    characters per token, like `count_tokens_approximately`, plus the requested completion tokens.
+    """
+    content = request.content
+    tokens = len(content) // 4
+    if b'"max_tokens"' in content or b'"max_completion_tokens"' in content:
+        try:
+            body = json.loads(content)
+        except ValueError:
+            return tokens
+        tokens += body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return tokens
+
+
+def retry_after(response: httpx.Response) -> Optional[float]:
+    if value := response.headers.get("retry-after-ms"):
+        return float(value) / 1000
+    if value := response.headers.get("retry-after"):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+class _ReleasingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Response body that returns the concurrency slot once it has been read or closed."""
+
+    def __init__(self, stream, release):
+        self.stream = stream
+        self._release = release
+
+    def __iter__(self):
+        yield from self.stream
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    def close(self) -> None:
+        try:
+            self.stream.close()
+        finally:
+            self._done()
+
+    async def aclose(self) -> None:
+        try:
+            await self.stream.aclose()
+        finally:
+            self._done()
+
+    def _done(self) -> None:
+        if self._release is not None:
+            release, self._release = self._release, None
+            release()
+
+
+def _with_release(response: httpx.Response, release) -> httpx.Response:
+    return httpx.Response(
+        response.status_code,
+        headers=response.headers,
+        stream=_ReleasingStream(response.stream, release),
+        extensions=response.extensions,
+    )
+
+
+class _Limited:
+    def __init__(self, limiters: Mapping[str, OutboundLimiter]):
+        # Longest base URL first, so the most specific endpoint wins
+        self.limiters = sorted(
+            ((url.rstrip("/"), limiter) for url, limiter in limiters.items()),
+            key=lambda item: -len(item[0]),
+        )
+
+    def limiter(self, request: httpx.Request) -> Optional[OutboundLimiter]:
+        url = str(request.url)
+        for base_url, limiter in self.limiters:
+            if url.startswith(base_url):
+                return limiter
+        return None
+
+
+class LimitedTransport(_Limited, httpx.BaseTransport):
+    """
+    Pass requests through the `OutboundLimiter` of their endpoint, keyed by base URL.
+    Throttled responses (429, 503) shrink the endpoint's concurrency limit and are retried here
+    after the endpoint's Retry-After, so the client's exponential backoff rarely kicks in.
+    With `retry_throttled=False`, e.g. under a `BalancedTransport` that can fail over to another
+    endpoint, they are returned right away instead. The concurrency slot is held until the
+    response body is closed, streams included.
+    """
+
+    def __init__(
+        self,
+        transport: httpx.BaseTransport,
+        limiters: Mapping[str, OutboundLimiter],
+        retry_throttled: bool = True,
+    ):
+        super().__init__(limiters)
+        self.transport = transport
+        self.retry_throttled = retry_throttled
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter(request)
+        if limiter is None:
+            return self.transport.handle_request(request)
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            permit = limiter.acquire(tokens)
+            try:
+                response = self.transport.handle_request(request)
+            except BaseException:
+                limiter.release(permit)
+                raise
+            if response.status_code not in THROTTLED_STATUS_CODES:
+                return _with_release(response, lambda: limiter.release(permit))
+            limiter.release(permit, throttled=True)
+            if not self.retry_throttled or attempt == limiter.config.max_retries:
+                return response
+            response.read()
+            response.close()
+            time.sleep(limiter.retry_delay(attempt, retry_after(response)))
+            attempt += 1
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncLimitedTransport(_Limited, httpx.AsyncBaseTransport):
+    """The async counterpart of `LimitedTransport`."""
+
+    def __init__(
+        self,
+        transport: httpx.AsyncBaseTransport,
+        limiters: Mapping[str, OutboundLimiter],
+        retry_throttled: bool = True,
+    ):
+        super().__init__(limiters)
+        self.transport = transport
+        self.retry_throttled = retry_throttled
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = self.limiter(request)
+        if limiter is None:
+            return await self.transport.handle_async_request(request)
+        tokens = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            permit = await limiter.aacquire(tokens)
+            try:
+                response = await self.transport.handle_async_request(request)
+            except BaseException:
+                limiter.release(permit)
+                raise
+            if response.status_code not in THROTTLED_STATUS_CODES:
+                return _with_release(response, lambda: limiter.release(permit))
+            limiter.release(permit, throttled=True)
+            if not self.retry_throttled or attempt == limiter.config.max_retries:
+                return response
+            await response.aread()
+            await response.aclose()
+            await asyncio.sleep(limiter.retry_delay(attempt, retry_after(response)))
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+def rate_limits(
+    rpm: Optional[float] = None,
+    tpm: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+) -> Optional[RateLimitConfig]:
+    """Build a `RateLimitConfig` from settings, None when no budget is set."""
+    if rpm is None and tpm is None and max_concurrency is None:
+        return None
+    config = RateLimitConfig(rpm=rpm, tpm=tpm)
+    if max_concurrency is not None:
+        config.max_concurrency = max_concurrency
+        config.initial_concurrency = min(config.initial_concurrency, max_concurrency)
+    return config
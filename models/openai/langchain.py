@@ -1,16 +1,47 @@
+from typing import Any, Sequence
+
 from langchain.chat_models import BaseChatModel, init_chat_model
+from langchain_core.language_models import LanguageModelInput
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import Runnable
 
+from ..registry import base_url, get_model_registry
 from ..schema import OpenAIModelConfig
 
 
 def create_openai_model(config: OpenAIModelConfig, **kwargs) -> BaseChatModel:
     """
     Create an OpenAI chat model using LangChain's init_chat_model function.
+    Models are cached in the process-wide model registry and share its connection pool.
+    With `config.endpoints`, requests are balanced and hedged across the endpoints.
+    """
+    registry = get_model_registry()
+    key = registry.key("openai", config, **kwargs)
+
+    def factory() -> BaseChatModel:
+        http_client, http_async_client = registry.http_clients(config)
+        kwargs.setdefault("http_client", http_client)
+        kwargs.setdefault("http_async_client", http_async_client)
+        return init_chat_model(
+            model_provider="openai",
+            model=config.model_name,
+            api_key=config.api_key,
+            base_url=base_url(config),
+            **kwargs,
+        )
+
+    return registry.get_or_create(key, factory)
+
+
+def create_openai_model_with_tools(
+    config: OpenAIModelConfig, tools: Sequence[Any], **kwargs
+) -> Runnable[LanguageModelInput, AIMessage]:
+    """
+    Create an OpenAI chat model with `tools` bound to it.
+    The bound model is cached in the model registry, so `bind_tools` only runs once per tool set.
     """
-    return init_chat_model(
-        model_provider="openai",
-        model=config.model_name,
-        api_key=config.api_key,
-        base_url=config.base_url,
-        **kwargs,
+    registry = get_model_registry()
+    key = registry.key("openai", config, tools=tools, **kwargs)
+    return registry.get_or_create(
+        key, lambda: create_openai_model(config, **kwargs).bind_tools(tools=tools)
     )
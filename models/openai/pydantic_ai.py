@@ -2,6 +2,7 @@ from openai import AsyncOpenAI
 from pydantic_ai.models.openai import OpenAIChatModel
 from pydantic_ai.providers.openai import OpenAIProvider
 
+from ..registry import base_url, get_model_registry
 from ..schema import OpenAIModelConfig
 
 
@@ -9,15 +10,24 @@ def create_openai_model(config: OpenAIModelConfig, **kwargs) -> OpenAIChatModel:
     """
     Create an OpenAIChatModel instance based on the provided configuration.
     Can use any OpenAI-compatible endpoint by specifying the base_url.
+    Models are cached in the process-wide model registry and share its connection pool.
+    With `config.endpoints`, requests are balanced and hedged across the endpoints.
     See https://ai.pydantic.dev/models/openai/ for more details.
     """
-    return OpenAIChatModel(
-        config.model_name,
-        provider=OpenAIProvider(
-            openai_client=AsyncOpenAI(
-                api_key=config.api_key,
-                base_url=config.base_url,
-                **kwargs,
-            )
-        ),
-    )
+    registry = get_model_registry()
+    key = registry.key("pydantic_ai", config, **kwargs)
+
+    def factory() -> OpenAIChatModel:
+        kwargs.setdefault("http_client", registry.http_clients(config)[1])
+        return OpenAIChatModel(
+            config.model_name,
+            provider=OpenAIProvider(
+                openai_client=AsyncOpenAI(
+                    api_key=config.api_key,
+                    base_url=base_url(config),
+                    **kwargs,
+                )
+            ),
+        )
+
+    return registry.get_or_create(key, factory)
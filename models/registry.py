@@ -0,0 +1,307 @@
+import asyncio
+import hashlib
+import json
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, Optional, Sequence, TypeVar
+
+import httpx
+
+from .endpoints import AsyncBalancedTransport, BalancedTransport, EndpointPool
+from .limits import AsyncLimitedTransport, LimitedTransport, OutboundLimiter
+from .response_cache import AsyncCachingTransport, CachingTransport, ResponseCache
+from .schema import (
+    ConnectionPoolConfig,
+    Endpoint,
+    OpenAIModelConfig,
+    RateLimitConfig,
+    ResponseCacheConfig,
+)
+
+# The OpenAI client's default, used to key the limiter of models without a base URL
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+T = TypeVar("T")
+
+
+@dataclass
+class RegistryStats:
+    hits: int = 0
+    misses: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+def hash_api_key(api_key: Optional[str]) -> str:
+    """Hash the API key so it can be part of a cache key without being kept in memory twice."""
+    return hashlib.sha256((api_key or "").encode()).hexdigest()[:16]
+
+
+def tools_key(tools: Optional[Sequence[Any]]) -> tuple:
+    """
+    Build a hashable key for a list of tools.
+    Tools are identified by name and description, which is what ends up in the tool schema sent to the model.
+    """
+    return tuple(
+        (
+            getattr(t, "name", None) or getattr(t, "__name__", repr(t)),
+            getattr(t, "description", None) or getattr(t, "__doc__", None) or "",
+        )
+        for t in tools or ()
+    )
+
+
+def base_url(config: OpenAIModelConfig) -> Optional[str]:
+    """The URL the OpenAI client is built with, the first endpoint's when the model has several."""
+    if config.base_url or not config.endpoints:
+        return config.base_url
+    return config.endpoints[0].base_url
+
+
+def endpoints_key(config: OpenAIModelConfig) -> tuple:
+    return (
+        config.base_url,
+        tuple(
+            (
+                e.base_url,
+                e.weight,
+                hash_api_key(e.api_key),
+                e.limits.model_dump_json() if e.limits else None,
+            )
+            for e in config.endpoints
+        ),
+        config.routing.model_dump_json(),
+        config.limits.model_dump_json() if config.limits else None,
+        config.cache.model_dump_json() if config.cache else None,
+    )
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of model instances.
+    All models created through the registry share one keep-alive httpx connection pool
+    (one sync and one async transport), so graph steps reuse connections instead of paying
+    for a new pool and TLS handshake every time.
+    Models with several endpoints get clients that balance requests across them on top of
+    the same pool, see `http_clients`.
+
+    The async client is bound to the event loop it is first used on, which is fine for
+    the LangGraph server. Call `configure` to reset the pool, e.g. between `asyncio.run` calls.
+    """
+
+    def __init__(self, pool: Optional[ConnectionPoolConfig] = None):
+        self._pool = pool or ConnectionPoolConfig()
+        self._lock = threading.Lock()
+        self._models: dict[tuple, Any] = {}
+        self._transport: Optional[httpx.HTTPTransport] = None
+        self._async_transport: Optional[httpx.AsyncHTTPTransport] = None
+        self._http_client: Optional[httpx.Client] = None
+        self._http_async_client: Optional[httpx.AsyncClient] = None
+        self._limiters: dict[str, OutboundLimiter] = {}
+        # Tasks closing async clients that were dropped while an event loop was running
+        self._closing: set[asyncio.Task] = set()
+        self.stats = RegistryStats()
+
+    @property
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self._pool.max_connections,
+            max_keepalive_connections=self._pool.max_keepalive_connections,
+            keepalive_expiry=self._pool.keepalive_expiry,
+        )
+
+    @property
+    def transport(self) -> httpx.HTTPTransport:
+        with self._lock:
+            if self._transport is None:
+                self._transport = httpx.HTTPTransport(limits=self.limits)
+            return self._transport
+
+    @property
+    def async_transport(self) -> httpx.AsyncHTTPTransport:
+        with self._lock:
+            if self._async_transport is None:
+                self._async_transport = httpx.AsyncHTTPTransport(limits=self.limits)
+            return self._async_transport
+
+    @property
+    def http_client(self) -> httpx.Client:
+        transport = self.transport
+        with self._lock:
+            if self._http_client is None:
+                self._http_client = httpx.Client(transport=transport)
+            return self._http_client
+
+    @property
+    def http_async_client(self) -> httpx.AsyncClient:
+        transport = self.async_transport
+        with self._lock:
+            if self._http_async_client is None:
+                self._http_async_client = httpx.AsyncClient(transport=transport)
+            return self._http_async_client
+
+    def http_clients(
+        self, config: OpenAIModelConfig
+    ) -> tuple[httpx.Client, httpx.AsyncClient]:
+        """
+        The sync and async http clients for a model with `config`.
+        With `config.endpoints`, the clients send each request to one of the endpoints. Models
+        with the same endpoints share one `EndpointPool`, so latency windows and circuit
+        breakers see all of their traffic. With rate limits, requests to each endpoint go
+        through its `OutboundLimiter`, which retries throttled requests only when there is no
+        other endpoint to fail over to. With a response cache, hits are served before any of that.
+        """
+        if not config.endpoints and not config.limits and not config.cache:
+            return self.http_client, self.http_async_client
+        _, http_client, http_async_client = self._routed(config)
+        return http_client, http_async_client
+
+    def endpoint_pool(self, config: OpenAIModelConfig) -> Optional[EndpointPool]:
+        """The endpoint pool of models with `config`, with their per-endpoint stats."""
+        return self._routed(config)[0] if config.endpoints else None
+
+    def limiter(self, url: str, limits: RateLimitConfig) -> OutboundLimiter:
+        """
+        The limiter of the endpoint at `url`, shared by every model and tool that calls it.
+        It keeps the limits it was first created with.
+        """
+        url = url.rstrip("/")
+        with self._lock:
+            if url not in self._limiters:
+                self._limiters[url] = OutboundLimiter(limits)
+            return self._limiters[url]
+
+    def response_cache(self, config: ResponseCacheConfig) -> ResponseCache:
+        """The response cache for `config`, shared by every model configured with it."""
+        key = ("response_cache", config.model_dump_json())
+        return self.get_or_create(key, lambda: ResponseCache.from_config(config))
+
+    def _routed(
+        self, config: OpenAIModelConfig
+    ) -> tuple[Optional[EndpointPool], httpx.Client, httpx.AsyncClient]:
+        def factory() -> tuple[Optional[EndpointPool], httpx.Client, httpx.AsyncClient]:
+            endpoints = config.endpoints or [
+                Endpoint(base_url=base_url(config) or OPENAI_BASE_URL)
+            ]
+            limiters = {
+                e.base_url: self.limiter(e.base_url, e.limits or config.limits)
+                for e in endpoints
+                if e.limits or config.limits
+            }
+            transport, async_transport = self.transport, self.async_transport
+            if limiters:
+                # With other endpoints to fail over to, the balancer handles throttling
+                retry = len(endpoints) < 2
+                transport = LimitedTransport(transport, limiters, retry)
+                async_transport = AsyncLimitedTransport(
+                    async_transport, limiters, retry
+                )
+            pool = None
+            if config.endpoints:
+                pool = EndpointPool(endpoints, base_url(config), routing=config.routing)
+                transport = BalancedTransport(pool, transport)
+                async_transport = AsyncBalancedTransport(pool, async_transport)
+            if config.cache:
+                cache = self.response_cache(config.cache)
+                transport = CachingTransport(transport, cache)
+                async_transport = AsyncCachingTransport(async_transport, cache)
+            return (
+                pool,
+                httpx.Client(transport=transport),
+                httpx.AsyncClient(transport=async_transport),
+            )
+
+        return self.get_or_create(("http", *endpoints_key(config)), factory)
+
+    def key(
+        self,
+        provider: str,
+        config: OpenAIModelConfig,
+        tools: Optional[Sequence[Any]] = None,
+        **kwargs,
+    ) -> tuple:
+        return (
+            provider,
+            config.model_name,
+            endpoints_key(config),
+            hash_api_key(config.api_key),
+            tools_key(tools),
+            json.dumps(kwargs, sort_keys=True, default=repr),
+        )
+
+    def get_or_create(self, key: tuple, factory: Callable[[], T]) -> T:
+        """Return the cached instance for `key`, building it with `factory` on a miss."""
+        with self._lock:
+            if key in self._models:
+                self.stats.hits += 1
+                return self._models[key]
+
+        # Build outside the lock, factories may need the shared http clients.
+        instance = factory()
+        with self._lock:
+            if key in self._models:
+                self.stats.hits += 1
+                return self._models[key]
+            self.stats.misses += 1
+            self._models[key] = instance
+            return instance
+
+    def configure(self, pool: ConnectionPoolConfig) -> None:
+        """Replace the connection pool limits. Cached models are dropped so they pick up the new pool."""
+        self.clear()
+        with self._lock:
+            self._pool = pool
+
+    def clear(self) -> None:
+        """
+        Drop all cached models and close the http clients: the shared ones and those of models
+        with endpoints, limits or a cache, with their transports and hedging threads.
+        Async clients are closed on the running event loop, or on a new one outside of a loop.
+        """
+        with self._lock:
+            models, self._models = self._models, {}
+            self._limiters.clear()
+            clients = [self._http_client, self._transport]
+            async_clients = [self._http_async_client, self._async_transport]
+            self._transport = self._async_transport = None
+            self._http_client = self._http_async_client = None
+            self.stats = RegistryStats()
+        for key, value in models.items():
+            if key[0] == "http":
+                _, http_client, http_async_client = value
+                clients.append(http_client)
+                async_clients.append(http_async_client)
+        for client in clients:
+            if client is not None:
+                client.close()
+        async_clients = [client for client in async_clients if client is not None]
+        if not async_clients:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(_aclose(async_clients))
+        else:
+            task = loop.create_task(_aclose(async_clients))
+            self._closing.add(task)
+            task.add_done_callback(self._closing.discard)
+
+
+async def _aclose(clients: list) -> None:
+    for client in clients:
+        try:
+            await client.aclose()
+        except RuntimeError:
+            # Connections opened on an event loop that has since been closed can't be closed
+            # from another one, their sockets are released when they are collected
+            pass
+
+
+registry = ModelRegistry()
+
+
+def get_model_registry() -> ModelRegistry:
+    return registry
@@ -0,0 +1,269 @@
+import hashlib
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator, Optional, Protocol, Union
+
+import httpx
+
+from .schema import ResponseCacheConfig
+
+# Request fields that do not change the completion
+IGNORED_FIELDS = ("user", "metadata", "store")
+# Response headers needed to decode a stored body, which is kept as it came off the wire
+STORED_HEADERS = ("content-type", "content-encoding")
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    status_code: int
+    headers: dict[str, str]
+    body: bytes
+
+
+@dataclass
+class ResponseCacheStats:
+    hits: int = 0
+    misses: int = 0
+    stores: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class ResponseCacheBackend(Protocol):
+    def get(self, key: str) -> Optional[CachedResponse]: ...
+
+    def set(self, key: str, value: CachedResponse) -> None: ...
+
+
+class MemoryResponseCacheBackend:
+    """In-process LRU backend."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+class SQLiteResponseCacheBackend:
+    """Disk-backed backend, a recording that can be committed and replayed in CI."""
+
+    def __init__(self, path: Union[str, Path]):
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, "
+            "status_code INTEGER NOT NULL, headers TEXT NOT NULL, body BLOB NOT NULL)"
+        )
+        self._conn.commit()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status_code, headers, body FROM responses WHERE key = ?",
+                (key,),
+            ).fetchone()
+        return CachedResponse(row[0], json.loads(row[1]), row[2]) if row else None
+
+    def set(self, key: str, value: CachedResponse) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, value.status_code, json.dumps(value.headers), value.body),
+            )
+            self._conn.commit()
+
+
+def request_key(request: httpx.Request) -> str:
+    """
+    Content address of a request: its path and JSON body, which carries the model, messages,
+    tool schemas and sampling parameters. Host and headers are left out, so recordings are
+    independent of the endpoint and API key they were made with.
+    """
+    body = request.content
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        for field in IGNORED_FIELDS:
+            payload.pop(field, None)
+        body = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+    digest = hashlib.sha256(f"{request.method} {request.url.path}\n".encode())
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class ResponseCache:
+    """
+    Complete model responses by request key, see `ResponseCacheConfig` for the modes.
+    A replay miss is answered with a 404 error response, so the client fails at once instead
+    of retrying.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[ResponseCacheBackend] = None,
+        mode: str = "cache",
+    ):
+        self.backend = backend or MemoryResponseCacheBackend()
+        self.mode = mode
+        self.stats = ResponseCacheStats()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config: ResponseCacheConfig) -> "ResponseCache":
+        backend = (
+            SQLiteResponseCacheBackend(config.path)
+            if config.path
+            else MemoryResponseCacheBackend(config.max_entries)
+        )
+        return cls(backend, config.mode)
+
+    def lookup(self, key: str) -> Optional[httpx.Response]:
+        cached = None if self.mode == "record" else self.backend.get(key)
+        with self._lock:
+            if cached is None:
+                self.stats.misses += 1
+            else:
+                self.stats.hits += 1
+        if cached is not None:
+            return httpx.Response(
+                cached.status_code, headers=cached.headers, content=cached.body
+            )
+        if self.mode == "replay":
+            return httpx.Response(
+                404,
+                json={
+                    "error": {
+                        "message": f"No recorded response for request {key} in replay mode",
+                        "type": "replay_miss",
+                    }
+                },
+            )
+        return None
+
+    def store(self, key: str, response: httpx.Response, body: bytes) -> None:
+        self.backend.set(
+            key,
+            CachedResponse(
+                response.status_code,
+                {
+                    h: response.headers[h]
+                    for h in STORED_HEADERS
+                    if h in response.headers
+                },
+                body,
+            ),
+        )
+        with self._lock:
+            self.stats.stores += 1
+
+
+class _RecordingStream(httpx.SyncByteStream, httpx.AsyncByteStream):
+    """Response body that is passed through and handed to `on_complete` once read to the end."""
+
+    def __init__(self, stream, on_complete: Callable[[bytes], None]):
+        self.stream = stream
+        self.on_complete = on_complete
+        self.chunks: list[bytes] = []
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self.stream:
+            self.chunks.append(chunk)
+            yield chunk
+        self.on_complete(b"".join(self.chunks))
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.stream:
+            self.chunks.append(chunk)
+            yield chunk
+        self.on_complete(b"".join(self.chunks))
+
+    def close(self) -> None:
+        self.stream.close()
+
+    async def aclose(self) -> None:
+        await self.stream.aclose()
+
+
+def _recording(
+    cache: ResponseCache, key: str, response: httpx.Response
+) -> httpx.Response:
+    # Only successful responses are stored, and only once their body, streamed or not, is complete
+    if response.status_code != 200:
+        return response
+    return httpx.Response(
+        response.status_code,
+        headers=response.headers,
+        stream=_RecordingStream(
+            response.stream, lambda body: cache.store(key, response, body)
+        ),
+        extensions=response.extensions,
+    )
+
+
+class CachingTransport(httpx.BaseTransport):
+    """
+    Serve POST requests from a `ResponseCache` before they reach `transport`.
+    Streamed responses are cached as their raw event stream and replayed in one piece.
+    """
+
+    def __init__(self, transport: httpx.BaseTransport, cache: ResponseCache):
+        self.transport = transport
+        self.cache = cache
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST":
+            return self.transport.handle_request(request)
+        request.read()
+        key = request_key(request)
+        if (cached := self.cache.lookup(key)) is not None:
+            return cached
+        return _recording(self.cache, key, self.transport.handle_request(request))
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """The async counterpart of `CachingTransport`."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, cache: ResponseCache):
+        self.transport = transport
+        self.cache = cache
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "POST":
+            return await self.transport.handle_async_request(request)
+        await request.aread()
+        key = request_key(request)
+        if (cached := self.cache.lookup(key)) is not None:
+            return cached
+        return _recording(
+            self.cache, key, await self.transport.handle_async_request(request)
+        )
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
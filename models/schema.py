@@ -1,9 +1,86 @@
-from typing import Optional
+from typing import Literal, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+
+
+class RateLimitConfig(BaseModel):
+    """Request and token budgets and adaptive concurrency for the calls to one endpoint."""
+
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    # Seconds of the per-minute budgets that can be spent in one burst
+    burst_seconds: float = 10.0
+    # AIMD: the concurrency limit grows by one per `limit` successful calls and is multiplied by
+    # `backoff` when the endpoint throttles, between `min_concurrency` and `max_concurrency`.
+    # With `adaptive=False` the limit stays at `max_concurrency`.
+    adaptive: bool = True
+    initial_concurrency: int = 8
+    min_concurrency: int = 1
+    max_concurrency: int = 64
+    backoff: float = 0.5
+    # Throttled calls are retried after the endpoint's Retry-After, at most `max_retries` times
+    max_retries: int = 3
+    max_retry_delay: float = 10.0
+
+
+class ResponseCacheConfig(BaseModel):
+    """
+    Cache of complete model responses, keyed by the request.
+    "cache" serves hits and stores misses, "record" always calls the model and stores the
+    response, "replay" only serves recorded responses and fails on a miss.
+    """
+
+    mode: Literal["cache", "record", "replay"] = "cache"
+    # SQLite file, an in-memory LRU of `max_entries` responses when unset
+    path: Optional[str] = None
+    max_entries: int = 1024
+
+
+class Endpoint(BaseModel):
+    """
+    An OpenAI-compatible endpoint, `api_key` overrides the model's key for this endpoint
+    and `limits` the model's rate limits.
+    """
+
+    base_url: str
+    # An endpoint of weight 0 only gets requests when no endpoint with a weight can take them
+    weight: float = Field(default=1.0, ge=0)
+    api_key: Optional[str] = None
+    limits: Optional[RateLimitConfig] = None
+
+
+class RoutingConfig(BaseModel):
+    """Load balancing, hedging and circuit breaking across the endpoints of a model."""
+
+    # Send a duplicate request to a second endpoint when the first has not answered after
+    # `hedge_after` seconds, or after the endpoint's `hedge_percentile` latency when unset.
+    hedge: bool = True
+    hedge_after: Optional[float] = None
+    hedge_percentile: float = 0.95
+    hedge_min_samples: int = 20
+    latency_window: int = 200
+    # Responses with these status codes are retried on another endpoint and count as failures
+    failover_status_codes: tuple[int, ...] = (429, 500, 502, 503, 504)
+    # Consecutive failures that take an endpoint out of rotation for `reset_timeout` seconds
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
 
 
 class OpenAIModelConfig(BaseModel):
     model_name: str
     api_key: str
     base_url: Optional[str] = None
+    # Several endpoints serving the same model, requests are balanced across them by weight
+    endpoints: list[Endpoint] = []
+    routing: RoutingConfig = RoutingConfig()
+    # Budgets of each endpoint, shared by all models that call it
+    limits: Optional[RateLimitConfig] = None
+    cache: Optional[ResponseCacheConfig] = None
+
+
+class ConnectionPoolConfig(BaseModel):
+    """Limits for the keep-alive HTTP connection pool shared by all models."""
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
@@ -0,0 +1,238 @@
+"""
+FastAPI app serving the compiled graphs of agents/*/langchain_agent.py, one app per worker process.
+
+    POST /agents/{name}/invoke   run to completion, returns the final state as JSON
+    POST /agents/{name}/stream   run as server-sent events, one event per chunk named by its mode
+    GET  /health                 served graphs and the worker's concurrency
+    GET  /metrics                the process's metrics in the Prometheus text format
+
+Both run endpoints take a `RunRequest`. Runs with a `thread_id` continue that thread when the graph
+has a checkpointer (CHECKPOINTER in the agent's .env).
+"""
+
+import asyncio
+import importlib
+import json
+import time
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from fastapi import FastAPI, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+from starlette.background import BackgroundTask
+
+from agents.utils.instrumentation import QUEUE_BUCKETS
+from agents.utils.metrics import metrics
+from server.env import ServerSettings, get_settings
+
+AGENTS_DIR = Path(__file__).resolve().parent.parent / "agents"
+
+request_duration = metrics.histogram(
+    "server_request_seconds", "Wall time of a run, by graph, endpoint and status"
+)
+queue_time = metrics.histogram(
+    "server_queue_seconds",
+    "Time a run waited for a concurrency slot of the worker, by graph",
+    buckets=QUEUE_BUCKETS,
+)
+rejected = metrics.counter(
+    "server_rejected_total", "Runs rejected because the worker was saturated, by graph"
+)
+
+
+def discover_graphs(names: Optional[list[str]] = None) -> dict[str, str]:
+    """Graph factories by agent directory name, e.g. {"demo": "agents.demo.langchain_agent:make_graph"}."""
+    graphs = {
+        path.parent.name: f"agents.{path.parent.name}.langchain_agent:make_graph"
+        for path in sorted(AGENTS_DIR.glob("*/langchain_agent.py"))
+    }
+    if names is None:
+        return graphs
+    unknown = set(names) - graphs.keys()
+    if unknown:
+        raise ValueError(f"Unknown graphs: {', '.join(sorted(unknown))}")
+    return {name: graphs[name] for name in names}
+
+
+def load_graph(target: str):
+    module, _, factory = target.partition(":")
+    return getattr(importlib.import_module(module), factory)()
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ConcurrencyGate:
+    """
+    Bounded admission for the runs of one worker: at most `max_concurrency` run at once, at most
+    `max_queue` wait for a slot, each for at most `queue_timeout` seconds. Runs that can't be
+    admitted raise `Overloaded` instead of piling up on the event loop.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def acquire(self) -> None:
+        if self._semaphore.locked() and self.waiting >= self.max_queue:
+            raise Overloaded
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+        except TimeoutError:
+            raise Overloaded from None
+        finally:
+            self.waiting -= 1
+        self.active += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()
+
+
+class RunRequest(BaseModel):
+    input: dict[str, Any]
+    thread_id: Optional[str] = None
+    config: dict[str, Any] = {}
+    # LangGraph stream modes of the stream endpoint, e.g. "messages" for model tokens
+    stream_mode: Union[str, list[str]] = "updates"
+
+    def runnable_config(self) -> dict[str, Any]:
+        config = dict(self.config)
+        if self.thread_id is not None:
+            config["configurable"] = {
+                **config.get("configurable", {}),
+                "thread_id": self.thread_id,
+            }
+        return config
+
+
+def sse_event(event: str, data: Any) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data))}\n\n".encode()
+
+
+def create_app(settings: Optional[ServerSettings] = None) -> FastAPI:
+    settings = settings or get_settings()
+    targets = discover_graphs(settings.SERVER_GRAPHS)
+    gate = ConcurrencyGate(
+        settings.SERVER_MAX_CONCURRENCY,
+        settings.SERVER_MAX_QUEUE,
+        settings.SERVER_QUEUE_TIMEOUT,
+    )
+    graphs: dict[str, Any] = {}
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Compile every graph once per worker, before it accepts requests
+        graphs.update((name, load_graph(target)) for name, target in targets.items())
+        yield
+
+    app = FastAPI(title="Agents", lifespan=lifespan)
+    app.state.gate = gate
+
+    def get_graph(name: str):
+        graph = graphs.get(name)
+        if graph is None:
+            raise HTTPException(404, f"Unknown graph: {name}")
+        return graph
+
+    async def admit(name: str) -> None:
+        start = time.perf_counter()
+        try:
+            await gate.acquire()
+        except Overloaded:
+            rejected.inc(graph=name)
+            raise HTTPException(
+                503,
+                "The server is at capacity",
+                headers={
+                    "Retry-After": str(max(1, round(settings.SERVER_QUEUE_TIMEOUT)))
+                },
+            ) from None
+        queue_time.observe(time.perf_counter() - start, graph=name)
+
+    @app.post("/agents/{name}/invoke")
+    async def invoke(name: str, run: RunRequest) -> Any:
+        graph = get_graph(name)
+        await admit(name)
+        start, status = time.perf_counter(), "error"
+        try:
+            output = await graph.ainvoke(run.input, run.runnable_config())
+            status = "ok"
+        finally:
+            gate.release()
+            request_duration.observe(
+                time.perf_counter() - start,
+                graph=name,
+                endpoint="invoke",
+                status=status,
+            )
+        return jsonable_encoder(output)
+
+    @app.post("/agents/{name}/stream")
+    async def stream(name: str, run: RunRequest) -> StreamingResponse:
+        graph = get_graph(name)
+        await admit(name)
+        modes = (
+            [run.stream_mode] if isinstance(run.stream_mode, str) else run.stream_mode
+        )
+        start, released = time.perf_counter(), False
+        status = "error"
+
+        def release() -> None:
+            # From the generator, or the background task when the client left before it started
+            nonlocal released
+            if not released:
+                released = True
+                gate.release()
+                request_duration.observe(
+                    time.perf_counter() - start,
+                    graph=name,
+                    endpoint="stream",
+                    status=status,
+                )
+
+        async def events():
+            nonlocal status
+            try:
+                async for mode, chunk in graph.astream(
+                    run.input, run.runnable_config(), stream_mode=modes
+                ):
+                    yield sse_event(mode, chunk)
+                status = "ok"
+                yield sse_event("end", None)
+            except Exception as e:
+                # The status line is already sent, so errors are reported as an event
+                yield sse_event("error", {"error": type(e).__name__, "message": str(e)})
+            finally:
+                release()
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache"},
+            background=BackgroundTask(release),
+        )
+
+    @app.get("/health")
+    async def health() -> dict[str, Any]:
+        return {
+            "graphs": sorted(graphs),
+            "active": gate.active,
+            "waiting": gate.waiting,
+            "max_concurrency": gate.max_concurrency,
+        }
+
+    @app.get("/metrics")
+    async def prometheus_metrics() -> PlainTextResponse:
+        return PlainTextResponse(metrics.render())
+
+    return app
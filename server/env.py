@@ -0,0 +1,34 @@
+from functools import cache
+from pathlib import Path
+from typing import Optional
+
+from pydantic_settings import BaseSettings
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+class ServerSettings(BaseSettings):
+    SERVER_HOST: str = "127.0.0.1"
+    SERVER_PORT: int = 8000
+    # Graphs to serve by agent directory name, e.g. ["demo"], all of agents/*/langchain_agent.py
+    # when unset. Each agent reads its own settings from its directory's .env.
+    SERVER_GRAPHS: Optional[list[str]] = None
+    # Worker processes, each loading the graphs once. With SERVER_STICKY, a gateway on SERVER_PORT
+    # routes the runs of a thread to the same worker, so in-process checkpointers and caches see
+    # the whole conversation; otherwise uvicorn's workers share the port. More workers isolate
+    # runs, they only add throughput with CPU-bound graphs and a spare core per worker.
+    SERVER_WORKERS: int = 1
+    SERVER_STICKY: bool = True
+    # Backpressure per worker: runs beyond SERVER_MAX_CONCURRENCY wait for at most
+    # SERVER_QUEUE_TIMEOUT seconds in a queue of SERVER_MAX_QUEUE, runs beyond that get a 503
+    SERVER_MAX_CONCURRENCY: int = 32
+    SERVER_MAX_QUEUE: int = 64
+    SERVER_QUEUE_TIMEOUT: float = 5.0
+
+    class Config:
+        env_file = BASE_DIR / ".env"
+
+
+@cache
+def get_settings() -> ServerSettings:
+    return ServerSettings()
@@ -0,0 +1,114 @@
+"""
+Gateway in front of the worker processes of `server.app`. The runs of a thread always go to the same
+worker, chosen by a hash of the thread id of the request body (`thread_id`, else
+`config.configurable.thread_id`, the same precedence as `RunRequest`), so that in-process
+checkpointers and caches see the whole conversation. Runs without a thread go to the worker with
+the fewest runs in flight. Responses, server-sent events included, are relayed as they arrive.
+"""
+
+import hashlib
+import json
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+
+# Seconds a worker keeps an idle connection open, the gateway drops its own idle connections
+# well before, or it can send a request on a connection the worker is closing and answer 502
+WORKER_KEEP_ALIVE = 5.0
+
+# Connection-specific headers are not forwarded
+HOP_BY_HOP = {"connection", "keep-alive", "transfer-encoding", "host", "content-length"}
+
+
+class StickyRouter:
+    def __init__(self, workers: list[str]):
+        self.workers = workers
+        self.in_flight = [0] * len(workers)
+
+    def pick(self, thread_id: Optional[str]) -> int:
+        if thread_id:
+            digest = hashlib.blake2b(thread_id.encode(), digest_size=8).digest()
+            return int.from_bytes(digest) % len(self.workers)
+        return min(range(len(self.workers)), key=self.in_flight.__getitem__)
+
+
+def thread_id_of(body: bytes) -> Optional[str]:
+    try:
+        payload = json.loads(body) if body else None
+    except ValueError:
+        # Forwarded as is, the worker rejects it
+        return None
+    if not isinstance(payload, dict):
+        return None
+    thread_id = payload.get("thread_id")
+    if thread_id is None:
+        config = payload.get("config")
+        configurable = config.get("configurable") if isinstance(config, dict) else None
+        if isinstance(configurable, dict):
+            thread_id = configurable.get("thread_id")
+    return str(thread_id) if thread_id is not None else None
+
+
+def create_gateway(workers: list[str]) -> FastAPI:
+    """Gateway app relaying every request to one of the `workers` base URLs."""
+    router = StickyRouter(workers)
+    # No read timeout: streamed runs last as long as the graph, backpressure is up to the workers
+    client = httpx.AsyncClient(
+        timeout=httpx.Timeout(None, connect=5.0),
+        limits=httpx.Limits(
+            max_connections=None,
+            max_keepalive_connections=256,
+            keepalive_expiry=WORKER_KEEP_ALIVE / 2,
+        ),
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        yield
+        await client.aclose()
+
+    app = FastAPI(title="Agents gateway", lifespan=lifespan)
+
+    @app.get("/gateway/health")
+    async def health() -> dict:
+        return {"workers": workers, "in_flight": router.in_flight}
+
+    @app.api_route("/{path:path}", methods=["GET", "POST"])
+    async def relay(path: str, request: Request):
+        body = await request.body()
+        worker = router.pick(thread_id_of(body))
+        headers = {
+            k: v for k, v in request.headers.items() if k.lower() not in HOP_BY_HOP
+        }
+        upstream = client.build_request(
+            request.method,
+            f"{workers[worker]}/{path}",
+            params=request.query_params,
+            headers=headers,
+            content=body,
+        )
+        router.in_flight[worker] += 1
+        try:
+            response = await client.send(upstream, stream=True)
+        except httpx.HTTPError as e:
+            router.in_flight[worker] -= 1
+            return JSONResponse({"detail": f"Worker unavailable: {e}"}, status_code=502)
+
+        async def done() -> None:
+            router.in_flight[worker] -= 1
+            await response.aclose()
+
+        return StreamingResponse(
+            response.aiter_raw(),
+            status_code=response.status_code,
+            headers={
+                k: v for k, v in response.headers.items() if k.lower() not in HOP_BY_HOP
+            },
+            background=BackgroundTask(done),
+        )
+
+    return app
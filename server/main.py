@@ -0,0 +1,106 @@
+"""
+Serve the agents, configured by server/.env (see server/.env.example):
+
+    python -m server.main
+
+With SERVER_WORKERS above one, each worker is a separate process with its own event loop and
+graphs. With SERVER_STICKY, the workers listen on the ports after SERVER_PORT and a gateway on
+SERVER_PORT routes each thread to its worker; otherwise uvicorn's workers share SERVER_PORT and a
+thread's runs land on any of them, which only suits graphs without an in-process checkpointer.
+
+More workers isolate runs from each other rather than add throughput: runs mostly wait on the
+model, which one worker's event loop overlaps. Workers only help when graph code keeps a core busy
+and there are spare cores, and the gateway relays every byte through one more process. With a
+single worker there is no gateway.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import httpx
+import uvicorn
+
+from server.env import get_settings
+
+
+def exit_with_parent(parent: int, interval: float = 1.0) -> None:
+    # uvicorn re-raises the signal it stopped on, so the gateway can die without a chance to
+    # terminate its workers
+    def watch():
+        while os.getppid() == parent:
+            time.sleep(interval)
+        os.kill(os.getpid(), signal.SIGTERM)
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def serve_worker(host: str, port: int, parent: int) -> None:
+    from server.app import create_app
+    from server.gateway import WORKER_KEEP_ALIVE
+
+    exit_with_parent(parent)
+    uvicorn.run(
+        create_app(),
+        host=host,
+        port=port,
+        log_level="warning",
+        timeout_keep_alive=WORKER_KEEP_ALIVE,
+    )
+
+
+def wait_until_ready(url: str, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            if httpx.get(f"{url}/health").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Worker at {url} did not start within {timeout}s")
+        time.sleep(0.1)
+
+
+def main():
+    settings = get_settings()
+    host, port, workers = (
+        settings.SERVER_HOST,
+        settings.SERVER_PORT,
+        settings.SERVER_WORKERS,
+    )
+    if workers <= 1 or not settings.SERVER_STICKY:
+        uvicorn.run(
+            "server.app:create_app", factory=True, host=host, port=port, workers=workers
+        )
+        return
+
+    from server.gateway import create_gateway
+
+    context = multiprocessing.get_context("spawn")
+    urls = [f"http://127.0.0.1:{port + 1 + i}" for i in range(workers)]
+    processes = [
+        context.Process(
+            target=serve_worker,
+            args=("127.0.0.1", port + 1 + i, os.getpid()),
+            daemon=True,
+        )
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for url in urls:
+            wait_until_ready(url)
+        uvicorn.run(create_gateway(urls), host=host, port=port)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+
+
+if __name__ == "__main__":
+    main()
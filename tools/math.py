@@ -1,3 +1,7 @@
+import json
+from typing import Union
+
+
 def multiply(a: int, b: int) -> int:
     """Multiply `a` and `b`.
 
@@ -29,3 +33,61 @@ def divide(a: int, b: int) -> float:
 
 
 tools = [multiply, add, divide]
+
+
+# Batch versions take whole vectors, so element-wise operations over lists of numbers take one
+# tool call instead of one per pair. NumPy is imported on the first call. Results are returned as a
+# JSON array, a tool message's content has to be a single string for the provider.
+Vector = Union[list[float], float]
+
+
+def _operands(a: Vector, b: Vector):
+    import numpy as np
+
+    return np.atleast_1d(
+        np.asarray(a, dtype=np.float64), np.asarray(b, dtype=np.float64)
+    )
+
+
+def batch_multiply(a: Vector, b: Vector) -> str:
+    """Multiply `a` and `b` element-wise, covering whole vectors in one call.
+
+    Args:
+        a: List of numbers, or one number applied to every element of `b`
+        b: List of numbers of the same length as `a`, or one number
+    """
+    x, y = _operands(a, b)
+    return json.dumps((x * y).tolist())
+
+
+def batch_add(a: Vector, b: Vector) -> str:
+    """Add `a` and `b` element-wise, covering whole vectors in one call.
+
+    Args:
+        a: List of numbers, or one number applied to every element of `b`
+        b: List of numbers of the same length as `a`, or one number
+    """
+    x, y = _operands(a, b)
+    return json.dumps((x + y).tolist())
+
+
+def batch_divide(a: Vector, b: Vector) -> str:
+    """Divide `a` by `b` element-wise, covering whole vectors in one call.
+    Division by zero gives null for that element instead of failing the call.
+
+    Args:
+        a: List of numbers, or one number applied to every element of `b`
+        b: List of numbers of the same length as `a`, or one number
+    """
+    import numpy as np
+
+    x, y = _operands(a, b)
+    x, y = np.broadcast_arrays(x, y)
+    zero = y == 0
+    result = np.divide(x, y, out=np.zeros_like(x), where=~zero).tolist()
+    for i in np.flatnonzero(zero).tolist():
+        result[i] = None
+    return json.dumps(result)
+
+
+batch_tools = [batch_multiply, batch_add, batch_divide]